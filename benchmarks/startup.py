@@ -0,0 +1,75 @@
+"""
+Measures the startup costs of the client: `import quartzbio` (in fresh
+interpreters) and the construction of QuartzBioClient instances.
+
+Usage:
+
+    python benchmarks/startup.py [--repeat 20] [--clients 1000]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import quartzbio
+print(time.perf_counter() - start)
+"""
+
+
+def time_import(repeat):
+    """Returns the times of `import quartzbio` in fresh interpreters"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    times = []
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, "-c", IMPORT_SCRIPT], env=env, cwd=ROOT
+        )
+        times.append(float(output.decode().strip().splitlines()[-1]))
+    return times
+
+
+def time_clients(number):
+    """Returns the time of constructing a client and using a resource"""
+    sys.path.insert(0, ROOT)
+    from quartzbio import QuartzBioClient
+
+    def construct():
+        return QuartzBioClient(host="https://api.example.com", token="abc")
+
+    def construct_and_bind():
+        return construct().Object
+
+    return (
+        timeit.timeit(construct, number=number) / number,
+        timeit.timeit(construct_and_bind, number=number) / number,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=1000)
+    args = parser.parse_args()
+
+    times = time_import(args.repeat)
+    print(
+        "import quartzbio:           median {:.1f} ms, min {:.1f} ms".format(
+            statistics.median(times) * 1000, min(times) * 1000
+        )
+    )
+
+    construct, bind = time_clients(args.clients)
+    print("QuartzBioClient():          {:.1f} us".format(construct * 1e6))
+    print("QuartzBioClient().Object:   {:.1f} us".format(bind * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,10 @@ __docformat__ = "restructuredtext"
 
 import os as _os
 import errno
+import importlib as _importlib
 import logging as _logging
+import sys as _sys
+import types as _types
 from typing import Literal
 
 # Capture warnings (specifically from urllib3)
@@ -24,6 +27,26 @@ except:
     pass
 
 
+class _LogFileHandler(_logging.FileHandler):
+    """Creates the log file (and its directory) when the first record is logged"""
+
+    def __init__(self, filename):
+        super(_LogFileHandler, self).__init__(filename, delay=True)
+
+    def _open(self):
+        logdir = _os.path.dirname(self.baseFilename)
+        if not _os.path.isdir(logdir):
+            # Handle a race condition here when running
+            # multiple services that import this package.
+            try:
+                _os.makedirs(logdir)
+            except OSError as err:
+                # Re-raise anything other than 'File exists'.
+                if err.errno != errno.EEXIST:
+                    raise err
+        return super(_LogFileHandler, self)._open()
+
+
 def _init_logging():
     loglevel_base = _os.environ.get("QUARTZBIO_LOGLEVEL", None) or _os.environ.get(
         "QUARTZBIO_LOGLEVEL", "WARN"
@@ -53,20 +76,8 @@ def _init_logging():
         base_logger.addHandler(stream_handler)
 
     if logfile:
-        logfile_path = _os.path.expanduser(logfile)
-        logdir = _os.path.dirname(logfile_path)
-
-        if not _os.path.isdir(logdir):
-            # Handle a race condition here when running
-            # multiple services that import this package.
-            try:
-                _os.makedirs(logdir)
-            except OSError as err:
-                # Re-raise anything other than 'File exists'.
-                if err.errno != errno.EEXIST:
-                    raise err
-
-        file_handler = _logging.FileHandler(logfile_path)
+        # The log file is only opened (and created) once something is logged
+        file_handler = _LogFileHandler(_os.path.expanduser(logfile))
         file_handler.setLevel(loglevel_file)
         file_fmt = _logging.Formatter(
             "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -87,10 +98,10 @@ def _init_logging():
 _init_logging()
 
 """
-This is a cached value of client._host, and is kept in for backwards compatibility
-Use this with caution, as you should prefer relying on get_api_host() instead
+api_host is a cached value of client._host, and is kept in for backwards compatibility
+Use this with caution, as you should prefer relying on get_api_host() instead.
+It is set when the default client is created (see __getattr__).
 """
-api_host = None
 
 
 def _set_cached_api_host(host):
@@ -100,35 +111,88 @@ def _set_cached_api_host(host):
 
 from .version import VERSION  # noqa
 from .errors import QuartzBioError
-from .query import Query, BatchQuery, Filter, GenomicFilter
-from .global_search import GlobalSearch
-from .annotate import Annotator, Expression
-from .client import client, QuartzBioClient
-from .resource import (
-    Application,
-    Beacon,
-    BeaconSet,
-    Dataset,
-    DatasetCommit,
-    DatasetExport,
-    DatasetField,
-    DatasetImport,
-    DatasetMigration,
-    DatasetTemplate,
-    DatasetRestoreTask,
-    DatasetSnapshotTask,
-    Group,
-    Manifest,
-    Object,
-    User,
-    Vault,
-    VaultSyncTask,
-    ObjectCopyTask,
-    SavedQuery,
-    Task,
+
+# The rest of the package is imported on first access (see __getattr__),
+# so that `import quartzbio` does not import requests, read credentials
+# or create the default client
+_LAZY_ATTRIBUTES = {
+    "Query": "query",
+    "BatchQuery": "query",
+    "Filter": "query",
+    "GenomicFilter": "query",
+    "GlobalSearch": "global_search",
+    "Annotator": "annotate",
+    "Expression": "annotate",
+    "client": "client",
+    "QuartzBioClient": "client",
+    "AsyncQuartzBioClient": "async_client",
+}
+_LAZY_ATTRIBUTES.update(
+    (name, "resource")
+    for name in [
+        "Application",
+        "Beacon",
+        "BeaconSet",
+        "Dataset",
+        "DatasetCommit",
+        "DatasetExport",
+        "DatasetField",
+        "DatasetImport",
+        "DatasetMigration",
+        "DatasetTemplate",
+        "DatasetRestoreTask",
+        "DatasetSnapshotTask",
+        "Group",
+        "Manifest",
+        "Object",
+        "User",
+        "Vault",
+        "VaultSyncTask",
+        "ObjectCopyTask",
+        "SavedQuery",
+        "Task",
+    ]
 )
 
 
+def __getattr__(name):
+    if name == "api_host":
+        # Creating the default client sets api_host
+        return __getattr__("client")._host
+
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        # Submodules, e.g. quartzbio.utils
+        try:
+            return _importlib.import_module("." + name, __name__)
+        except ModuleNotFoundError as err:
+            if err.name != "{}.{}".format(__name__, name):
+                raise
+            raise AttributeError(
+                "module {!r} has no attribute {!r}".format(__name__, name)
+            )
+
+    value = getattr(_importlib.import_module("." + module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(["api_host"]))
+
+
+class _QuartzBioModule(_types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing the quartzbio.client submodule sets it as an attribute
+        # of the package: quartzbio.client is the default client instead.
+        if name == "client" and isinstance(value, _types.ModuleType):
+            value = value.client
+        super(_QuartzBioModule, self).__setattr__(name, value)
+
+
+_sys.modules[__name__].__class__ = _QuartzBioModule
+
+
 def login(
     api_host: str = None,
     access_token: str = None,
@@ -160,6 +224,8 @@ def login(
                 api_host="https://quartzbio.api.az.aws.quartz.bio",
             )
     """
+    from .client import client
+
     token_type: Literal["Bearer", "Token"] = None
     token: str = None
 
@@ -176,6 +242,8 @@ def login(
 
 
 def whoami():
+    from .client import client
+
     try:
         user = client.whoami()
     except Exception as e:
@@ -185,18 +253,18 @@ def whoami():
 
 
 def get_api_host():
+    from .client import client
+
     global api_host
     api_host = client._host
 
     return client._host
 
 
-get_api_host()
-
-
 __all__ = [
     "Annotator",
     "Application",
+    "AsyncQuartzBioClient",
     "Expression",
     "BatchQuery",
     "Beacon",
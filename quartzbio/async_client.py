@@ -0,0 +1,455 @@
+# -*- coding: utf-8 -*-
+"""
+An asyncio client for the QuartzBio API, built on aiohttp.
+
+Requires: pip install aiohttp
+
+Example:
+
+    import asyncio
+    from quartzbio import AsyncQuartzBioClient
+
+    async def main():
+        async with AsyncQuartzBioClient() as client:
+            objects = await asyncio.gather(
+                *[client.retrieve_object(i) for i in object_ids]
+            )
+            async for record in client.query(dataset_id, limit=1000):
+                print(record)
+
+    asyncio.run(main())
+"""
+
+import asyncio
+import json
+import logging
+import platform
+import textwrap
+
+from urllib.parse import urljoin
+
+from .auth import authenticate
+from .client import QuartzBioClient, _handle_api_error
+from .errors import QuartzBioError, NotFoundError
+from .query import Query
+from .utils.request_limiter import RequestLimiter
+from .version import VERSION
+
+logger = logging.getLogger("quartzbio")
+
+
+class _Response(object):
+    """
+    A read response, with the attributes of a requests.Response
+    that QuartzBioError and the client use.
+    """
+
+    def __init__(self, response, content):
+        self.status_code = response.status
+        self.url = str(response.url)
+        self.headers = response.headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncQuartzBioClient(object):
+    """
+    An aiohttp-based HTTP client for QuartzBio API resources.
+
+    Uses the same credentials, retry policy and 429 handling as
+    QuartzBioClient. Resources returned by the async methods are bound to
+    an equivalent synchronous client (see `sync_client`).
+    """
+
+    # The same policy as the urllib3 Retry of QuartzBioClient
+    MAX_RETRIES = 5
+    BACKOFF_FACTOR = 2
+    BACKOFF_MAX = 120
+    RETRY_STATUSES = (502, 503, 504)
+    RETRY_METHODS = frozenset(["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE"])
+
+    def __init__(
+        self,
+        host=None,
+        token=None,
+        token_type="Bearer",
+        retry_all=None,
+        max_connections=100,
+    ):
+        self._host, self._auth = authenticate(
+            host, token, token_type, raise_on_missing=False
+        )
+        self.retry_all = bool(retry_all)
+        self.max_connections = max_connections
+        self._session = None
+        self._sync_client = None
+        self._user = None
+        # Shared with sync_client, so that both pause after a 429
+        self.request_limiter = RequestLimiter()
+
+        self._headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip,deflate",
+        }
+        self.set_user_agent()
+
+    def set_user_agent(self, name=None, version=None):
+        ua = "quartzbio-python-client/{} aiohttp {}/{}".format(
+            VERSION,
+            platform.python_implementation(),
+            platform.python_version(),
+        )
+
+        if name:
+            name = name.replace(" ", "-")
+            if version:
+                ua = "{}/{} {}".format(name, version, ua)
+            else:
+                ua = "{} {}".format(name, ua)
+
+        self._headers["User-Agent"] = ua
+
+    def is_logged_in(self):
+        return bool(self._host and self._auth and self._auth.token)
+
+    @property
+    def sync_client(self):
+        """A QuartzBioClient with the same credentials"""
+        if self._sync_client is None:
+            self._sync_client = QuartzBioClient(
+                host=self._host,
+                token=self._auth.token,
+                token_type=self._auth.token_type,
+                retry_all=self.retry_all,
+            )
+            self._sync_client._headers["User-Agent"] = self._headers["User-Agent"]
+            self._sync_client.request_limiter = self.request_limiter
+        return self._sync_client
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            try:
+                import aiohttp
+            except ImportError:
+                raise ImportError(
+                    "aiohttp is required for the async client: pip install aiohttp"
+                )
+
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def whoami(self):
+        return await self.get("/v1/user", {})
+
+    async def get(self, url, params, **kwargs):
+        kwargs["params"] = params
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, data, **kwargs):
+        kwargs["data"] = data
+        return await self.request("POST", url, **kwargs)
+
+    async def delete(self, url, data, **kwargs):
+        kwargs["data"] = data
+        return await self.request("DELETE", url, **kwargs)
+
+    def _backoff(self, retries):
+        if retries <= 1:
+            return 0
+        return min(self.BACKOFF_MAX, self.BACKOFF_FACTOR * (2 ** (retries - 1)))
+
+    async def _send(self, method, url, headers, params, data, timeout):
+        import aiohttp
+
+        session = self._get_session()
+        async with session.request(
+            method,
+            url,
+            headers=headers,
+            params=params,
+            data=data,
+            timeout=aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            content = await response.read()
+            return _Response(response, content)
+
+    async def request(self, method, url, **kwargs):
+        """
+        Issues an HTTP request, with the same parameters as
+        QuartzBioClient.request(): params, data, headers, timeout and raw.
+
+        Returns the JSON-decoded response, or the read response
+        (status_code, headers, content, json()) if raw is True.
+        """
+        if not self.is_logged_in():
+            raise QuartzBioError("HTTP request: client is not logged in!")
+
+        method = method.upper()
+        raw = kwargs.pop("raw", False)
+        headers = dict(self._headers)
+        headers.update(kwargs.get("headers") or {})
+        headers["Authorization"] = "{0} {1}".format(
+            self._auth.token_type, self._auth.token
+        )
+        params = _encode_params(kwargs.get("params"))
+        data = json.dumps(kwargs.get("data") or {})
+        timeout = kwargs.get("timeout", 80)
+
+        if not url.startswith(self._host):
+            url = urljoin(self._host, url)
+
+        logger.debug("API %s Request: %s" % (method, url))
+
+        can_retry = self.retry_all or method in self.RETRY_METHODS
+        retries = 0
+        rate_limit_retries = 0
+        while True:
+            # The limiter books a time for the request without blocking the loop
+            delay = self.request_limiter.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                response = await self._send(method, url, headers, params, data, timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                retries += 1
+                if not can_retry or retries > self.MAX_RETRIES:
+                    _handle_async_request_error(e)
+                await asyncio.sleep(self._backoff(retries))
+                continue
+
+            delay = self.request_limiter.update(response, rate_limit_retries)
+            if delay is not None:
+                rate_limit_retries += 1
+                logger.warning("Too many requests. Retrying in {0:g}s.".format(delay))
+                continue
+
+            if (
+                can_retry
+                and response.status_code in self.RETRY_STATUSES
+                and retries < self.MAX_RETRIES
+            ):
+                retries += 1
+                await asyncio.sleep(self._backoff(retries))
+                continue
+
+            break
+
+        if not (200 <= response.status_code < 400):
+            _handle_api_error(response)
+
+        if raw or response.status_code in [204, 301, 302]:
+            return response
+
+        try:
+            return response.json()
+        except Exception:
+            raise QuartzBioError(
+                "Could not parse JSON response: {}".format(response.content)
+            )
+
+    def _convert(self, response):
+        from .resource.quartzbio_object import convert_to_quartzbio_object
+
+        return convert_to_quartzbio_object(response, client=self.sync_client)
+
+    async def retrieve(self, resource_class, id, **params):
+        """Retrieves an API resource by ID, e.g. retrieve(Dataset, id)"""
+        instance = resource_class(id, client=self.sync_client)
+        response = await self.get(instance.instance_url(), params)
+        instance.refresh_from(response)
+        return instance
+
+    async def retrieve_object(self, id):
+        """The async version of Object.retrieve()"""
+        from .resource.object import Object
+
+        return await self.retrieve(Object, id)
+
+    async def get_user(self):
+        """Returns the current user (cached)"""
+        if self._user is None:
+            self._user = await self.whoami()
+        return self._user
+
+    async def get_object_by_full_path(self, full_path, **params):
+        """The async version of Object.get_by_full_path()"""
+        from .resource.object import Object
+
+        user = await self.get_user()
+        # Path defaults (domain, personal vault) are resolved from the cached user
+        full_path, _ = Object.validate_full_path(full_path, client=_UserClient(user))
+        assert_type = params.pop("assert_type", None)
+        params.update({"full_path": full_path})
+
+        objects = self._convert(await self.get(Object.class_url(), params)).data
+        if len(objects) > 1:
+            raise Exception(
+                'Multiple objects found with full_path "{0}"'.format(full_path)
+            )
+        if not objects:
+            raise NotFoundError(
+                'No object found with full_path "{0}"'.format(full_path)
+            )
+
+        obj = objects[0]
+        if assert_type and obj["object_type"] != assert_type:
+            raise QuartzBioError(
+                "Expected a {} but found a {} at {}".format(
+                    assert_type, obj["object_type"], full_path
+                )
+            )
+        return obj
+
+    async def follow_task(self, task, sleep_seconds=None, timeout=None):
+        """
+        The async version of Task.follow(): waits until the task
+        (a Task or any task resource, or a Task ID) is no longer
+        queued or running, and returns it.
+        """
+        from .resource.task import Task
+
+        if sleep_seconds is None:
+            sleep_seconds = Task.SLEEP_WAIT_DEFAULT
+        if not hasattr(task, "instance_url"):
+            task = await self.retrieve(Task, task)
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        while task.status in ["queued", "running"]:
+            if timeout is not None and loop.time() - started > timeout:
+                raise QuartzBioError(
+                    "Timed out waiting for task {0} ({1})".format(task.id, task.status)
+                )
+            logger.info("Task {0} is {1}".format(task.id, task.status))
+            await asyncio.sleep(sleep_seconds)
+            task.refresh_from(await self.get(task.instance_url(), {}))
+
+        return task
+
+    def query(self, dataset_id, **params):
+        """Returns an AsyncQuery on the dataset (see Query for parameters)"""
+        return AsyncQuery(self, dataset_id, **params)
+
+    def __repr__(self):
+        return "<AsyncQuartzBioClient {0} {1}>".format(self._host, self._auth)
+
+
+class _UserClient(object):
+    """Answers the /v1/user request of Object.validate_full_path()"""
+
+    def __init__(self, user):
+        self._user = user
+
+    def get(self, url, params, **kwargs):
+        return self._user
+
+    def get_user(self):
+        return self._user
+
+
+def _encode_params(params):
+    """Encodes query parameters like requests does (aiohttp only takes strings)"""
+    encoded = []
+    for key, value in (params or {}).items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for v in values:
+            if v is None:
+                continue
+            encoded.append((key, str(v)))
+    return encoded
+
+
+def _handle_async_request_error(e):
+    msg = textwrap.fill(QuartzBioError.default_message)
+    err = "%s: %s" % (type(e).__name__, str(e))
+    raise QuartzBioError(message=msg + "\n\n(Network error: %s)" % (err,))
+
+
+class AsyncQuery(object):
+    """
+    The async version of Query, for `async for` iteration:
+
+        async for record in client.query(dataset_id, filters=...):
+            ...
+
+    Query parameters are the same as Query (prefetch is not supported,
+    use asyncio.gather() on execute() instead). Records are returned as
+    instances of `result_class` (dict by default).
+    """
+
+    def __init__(self, client, dataset_id, **params):
+        self._client = client
+        params.pop("client", None)
+        self._query = Query(dataset_id, client=client.sync_client, **params)
+        self._response = None
+
+    def filter(self, *filters, **kwargs):
+        """Returns a new AsyncQuery with additional filters (see Query.filter)"""
+        new = AsyncQuery.__new__(AsyncQuery)
+        new._client = self._client
+        new._query = self._query.filter(*filters, **kwargs)
+        new._response = None
+        return new
+
+    async def execute(self, offset=0, limit=None):
+        """Requests one page of results and returns the raw response"""
+        query = self._query
+        if limit is None:
+            limit = query._page_size
+        params = query._build_query(offset=offset, limit=limit)
+        response = await self._client.post(query._data_url, params)
+        if offset == 0 or self._response is None:
+            self._response = response
+        return response
+
+    async def count(self):
+        """Returns the total number of results, independent of any limit"""
+        if self._response is None:
+            await self.execute(0, limit=0)
+        return self._response["total"]
+
+    async def pages(self):
+        """Iterates through the results one page at a time"""
+        query = self._query
+        result_class = query._result_class
+        offset = 0
+
+        while offset < query._limit:
+            limit = min(query._page_size, query._limit - offset)
+            response = await self.execute(offset, limit=int(limit))
+            results = response["results"][:int(limit)]
+            if not results:
+                return
+            if result_class is not dict:
+                results = [result_class(record) for record in results]
+            yield results
+            offset += len(results)
+            if offset >= response["total"]:
+                return
+
+    async def __aiter__(self):
+        async for page in self.pages():
+            for record in page:
+                yield record
@@ -12,6 +12,8 @@ from fnmatch import fnmatch
 from collections import defaultdict
 import multiprocessing
 import signal
+import threading
+from queue import Queue
 
 import quartzbio
 
@@ -22,13 +24,20 @@ from quartzbio import Dataset
 from quartzbio import DatasetImport
 from quartzbio import DatasetTemplate
 from quartzbio import GlobalSearch
+from quartzbio.resource import ListObject
 from quartzbio.utils.files import check_gzip_path, edp_path_join, edp_path
-from quartzbio.utils.md5sum import md5sum
+from quartzbio.utils.sync_index import get_sync_index
+from quartzbio.utils.transfer_limiter import TransferLimiter
+from quartzbio.utils.download import partial_download_target
 from quartzbio.errors import QuartzBioError
 from quartzbio.errors import NotFoundError
 from quartzbio.client import QuartzBioClient
+from quartzbio.client import DEFAULT_POOL_MAXSIZE
 from quartzbio.client import client as global_client
 
+# Number of concurrent requests used to retrieve object metadata
+METADATA_WORKERS = 16
+
 
 def should_exclude(path, exclude_paths, dry_run=False, print_logs=True):
     if not exclude_paths:
@@ -62,6 +71,24 @@ def should_exclude(path, exclude_paths, dry_run=False, print_logs=True):
     return False
 
 
+def _size_connection_pool(num_workers):
+    """Keeps enough pooled connections alive for all worker threads"""
+    global_client.set_pool_size(max(num_workers or 1, DEFAULT_POOL_MAXSIZE))
+
+
+def _retrieve_objects(object_ids, max_workers=METADATA_WORKERS):
+    """
+    Retrieves objects by ID with concurrent requests on a
+    bounded pool of threads. Returns the objects in order.
+    """
+    if not object_ids:
+        return []
+    max_workers = min(max_workers, len(object_ids))
+    _size_connection_pool(max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(Object.retrieve, object_ids))
+
+
 def _check_uploaded_folders(
     base_remote_path, local_start, all_folders, follow_shortcuts=False
 ):
@@ -92,6 +119,51 @@ def _check_uploaded_folders(
     return {f for f in all_folders if f not in remote_folders_existing}
 
 
+def _create_folders(vault, folder_paths, max_workers=METADATA_WORKERS):
+    """Creates remote folders (if they do not exist) level by level.
+
+    Folders must be created after their parent, so that parent_object_id
+    can be populated: all the folders at one depth are created
+    concurrently, with the IDs of their parents taken from the folders
+    created at the previous depth instead of being looked up again.
+
+    Args:
+        vault: The Vault to create the folders in.
+        folder_paths: Full paths of the folders to create.
+        max_workers: Maximum number of folders created concurrently.
+    Returns:
+        folder_ids (dict): The ID of each folder, keyed by validated full path.
+
+    """
+    levels = defaultdict(list)
+    for folder_path in folder_paths:
+        full_path, path_dict = Object.validate_full_path(folder_path)
+        levels[len(path_dict["path"].split("/"))].append((full_path, path_dict))
+
+    folder_ids = {}
+
+    def _create(folder):
+        full_path, path_dict = folder
+        kwargs = {}
+        if path_dict["parent_path"] == "/":
+            kwargs["parent_object_id"] = None
+        elif path_dict["parent_full_path"] in folder_ids:
+            kwargs["parent_object_id"] = folder_ids[path_dict["parent_full_path"]]
+        return Object.create_folder(vault, full_path, **kwargs)
+
+    if folder_paths:
+        _size_connection_pool(max_workers)
+    for depth in sorted(levels):
+        folders = levels[depth]
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(folders))
+        ) as executor:
+            for (full_path, _), folder in zip(folders, executor.map(_create, folders)):
+                folder_ids[full_path] = folder.id
+
+    return folder_ids
+
+
 def _upload_folder(
     domain,
     vault,
@@ -104,9 +176,21 @@ def _upload_folder(
     archive_folder=None,
     follow_shortcuts=False,
     max_retries=3,
+    resumable=False,
+    engine="process",
+    max_bytes_in_flight=None,
+    adaptive=False,
 ):
     all_folders = []
     all_files = []
+    # Pass global client auth parameters to each worker to avoid using default globals
+    client_auth = (
+        global_client._host,
+        global_client._auth.token,
+        global_client._auth.token_type,
+    )
+    # The bandwidth limit of the upload (see set_rate_limit)
+    rate_limit = global_client.rate_limiter and global_client.rate_limiter.rate
 
     # Create the upload root folder if it does not exist on the remote
     try:
@@ -153,12 +237,6 @@ def _upload_folder(
             all_folders.append((vault, remote_path))
 
         # Upload the files that do not yet exist on the remote
-        # Pass global client auth parameters to each worker to avoid using default globals
-        client_auth = (
-            global_client._host,
-            global_client._auth.token,
-            global_client._auth.token_type,
-        )
         for f in files:
             local_file_path = os.path.join(abs_local_parent_path, f)
             if should_exclude(local_file_path, exclude_paths, dry_run=dry_run):
@@ -173,6 +251,7 @@ def _upload_folder(
                     client_auth,
                     follow_shortcuts,
                     max_retries,
+                    resumable,
                 )
             )
 
@@ -183,12 +262,9 @@ def _upload_folder(
         )
     else:
         all_folder_parts = set([x[1] for x in all_folders])
-    # Create folders serially since these require
-    # previous folders to be created so that parent_object_id can
-    # be populated
     all_folder_parts = sorted(all_folder_parts, key=lambda x: len(x.split("/")))
-    for folder in all_folder_parts:
-        if dry_run:
+    if dry_run:
+        for folder in all_folder_parts:
             try:
                 f = Object.get_by_full_path(folder)
                 if not f.is_folder:
@@ -197,13 +273,32 @@ def _upload_folder(
                     print("[Dry Run] Folder {} already exists - skipping creation".format(folder))
             except NotFoundError:
                 print("[Dry Run] Creating folder {}".format(folder))
-        else:
-            Object.create_folder(vault, folder)
+        folder_ids = {}
+    else:
+        folder_ids = _create_folders(vault, all_folder_parts)
+
+    if engine == "thread":
+        _upload_files_threaded(
+            all_files,
+            num_processes,
+            client_auth,
+            folder_ids,
+            max_bytes_in_flight,
+            adaptive=adaptive,
+            rate_limit=rate_limit,
+        )
+        return
 
     # Create files in parallel
     # Signal handling allows for graceful exit upon KeyboardInterrupt
     original_sigint_handler = signal.signal(signal.SIGINT, signal.SIG_IGN)
-    pool = multiprocessing.Pool(num_processes)
+    pool = multiprocessing.Pool(
+        num_processes,
+        initializer=_init_upload_worker,
+        # Each worker process has its own client: they get an equal
+        # share of the bandwidth limit
+        initargs=(client_auth, folder_ids, rate_limit and rate_limit / num_processes),
+    )
     signal.signal(signal.SIGINT, original_sigint_handler)
     try:
         for result in pool.imap_unordered(_create_file_job, all_files):
@@ -217,9 +312,141 @@ def _upload_folder(
         pool.close()
 
 
-def _create_file_job(args):
+def _upload_files_threaded(
+    all_files,
+    num_threads,
+    client_auth,
+    folder_ids,
+    max_bytes_in_flight=None,
+    adaptive=False,
+    rate_limit=None,
+):
+    """Uploads files with a pool of threads instead of processes.
+
+    Whole files and the parts of multipart files share one limit of
+    num_threads concurrent transfers, and one limit on the bytes of
+    parts being uploaded at once (see TransferLimiter). The part-upload
+    threads of each file are scaled down by the number of files uploaded
+    at once, so that there are about 2 * num_threads threads in total.
+
+    Args:
+        all_files: The _create_file_job argument tuples of the files.
+        num_threads: Number of files uploaded concurrently, and maximum
+            number of concurrent transfers.
+        client_auth: Tuple containing API host, token, and token type.
+        folder_ids: Remote folder IDs created by _upload_folder, by full path.
+        max_bytes_in_flight: Maximum bytes of parts uploaded at once.
+        adaptive: Adapt the number of parts of each multipart file
+            uploaded at once to the measured throughput.
+        rate_limit: Bandwidth limit (bytes/second) shared by all the threads.
+
+    """
+    _init_upload_worker(client_auth, folder_ids, rate_limit)
+    _upload_worker.client.set_pool_size(max(num_threads, DEFAULT_POOL_MAXSIZE))
+    limiter = TransferLimiter(num_threads, max_bytes_in_flight)
+    part_workers = max(1, num_threads // max(1, min(num_threads, len(all_files))))
+
+    executor = ThreadPoolExecutor(max_workers=num_threads)
+    futures = [
+        executor.submit(_create_file_job, args, limiter, adaptive, part_workers)
+        for args in all_files
+    ]
+    try:
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            # Check if an exception was raised by the upload
+            if isinstance(result, Exception):
+                raise result
+    except KeyboardInterrupt:
+        print("Caught KeyboardInterrupt, cancelling upload.")
+        # Don't wait for the uploads in flight
+        _cancel_executor(executor, futures, wait=False)
+        raise
+    except BaseException:
+        _cancel_executor(executor, futures)
+        raise
+    executor.shutdown()
+
+
+def _cancel_executor(executor, futures, wait=True):
+    """Cancels the pending futures of an executor and shuts it down"""
+    if sys.version_info >= (3, 9):
+        executor.shutdown(wait=wait, cancel_futures=True)
+        return
+    for future in futures:
+        future.cancel()
+    executor.shutdown(wait=wait)
+
+
+class _UploadWorker(object):
+    """
+    The client of an upload worker process, and the remote folders and
+    vaults it has looked up, shared by all the files it uploads.
+    """
+
+    def __init__(self, client_auth, folder_ids=None, rate_limit=None):
+        self.client_auth = client_auth
+        self.client = QuartzBioClient(*client_auth, rate_limit=rate_limit)
+        # Folders created by _upload_folder, by validated full path
+        self.folder_ids = dict(folder_ids or {})
+        self._folders = {}
+        self._vaults = {}
+
+    def _get_vault(self, key, get):
+        if key not in self._vaults:
+            self._vaults[key] = get()
+        return self._vaults[key]
+
+    def get_folder(self, folder_full_path, follow_shortcuts=False):
+        """Returns the path, vault and ID of a remote folder, looked up once"""
+        key = (folder_full_path, follow_shortcuts)
+        if key not in self._folders:
+            full_path, path_dict = Object.validate_full_path(
+                folder_full_path, client=self.client
+            )
+            if full_path in self.folder_ids:
+                vault_full_path = path_dict["vault_full_path"]
+                vault = self._get_vault(
+                    vault_full_path,
+                    lambda: Vault.get_by_full_path(vault_full_path, client=self.client),
+                )
+                folder = (path_dict["path"], vault, self.folder_ids[full_path])
+            else:
+                remote_parent = Object.get_by_full_path(
+                    full_path,
+                    assert_type="folder",
+                    follow_shortcuts=follow_shortcuts,
+                    client=self.client,
+                )
+                vault = self._get_vault(
+                    remote_parent.vault_id, lambda: remote_parent.vault
+                )
+                folder = (remote_parent.path, vault, remote_parent.id)
+            self._folders[key] = folder
+        return self._folders[key]
+
+
+# The _UploadWorker of the current process
+_upload_worker = None
+
+
+def _init_upload_worker(client_auth, folder_ids=None, rate_limit=None):
+    """Initializes an upload worker process (see _UploadWorker)"""
+    global _upload_worker
+    _upload_worker = _UploadWorker(client_auth, folder_ids, rate_limit)
+
+
+def _get_upload_worker(client_auth):
+    if _upload_worker is None or _upload_worker.client_auth != client_auth:
+        _init_upload_worker(client_auth)
+    return _upload_worker
+
+
+def _create_file_job(args, limiter=None, adaptive=False, part_workers=None):
     """Uploads a single file from local storage to EDP. Args are
     packed into a single tuple to facilitate multiprocessing.
+    With the thread engine, the parts of multipart files are uploaded
+    concurrently within the limits of the shared limiter.
 
     Args:
         args[0] (local_file_path): Path to local file.
@@ -230,6 +457,12 @@ def _create_file_job(args):
         args[5] (client_auth): Tuple containing API host, token, and token type
         args[6] (follow_shortcuts): Boolean to follow shortcuts on the remote_folder_path
         args[7] (max_retries): Maximum number of retries per upload part
+        args[8] (resumable): Whether multipart uploads can be resumed
+        limiter: The TransferLimiter of a threaded upload
+        adaptive: Whether the number of parts uploaded at once adapts
+            to the measured throughput (with a limiter)
+        part_workers: The number of part-upload threads of a multipart
+            file (with a limiter, the limiter's concurrency by default)
     Returns:
         None or Exception if exception is raised.
     """
@@ -243,6 +476,7 @@ def _create_file_job(args):
             client_auth,
             follow_shortcuts,
             max_retries,
+            resumable,
         ) = args
         if dry_run:
             print(
@@ -251,39 +485,28 @@ def _create_file_job(args):
                 )
             )
             return
-        # Provides the global host, token, token_type
-        client = QuartzBioClient(*client_auth)
-
-        remote_parent = None
-        try:
-            remote_parent = Object.get_by_full_path(
-                remote_folder_full_path,
-                assert_type="folder",
-                follow_shortcuts=follow_shortcuts,
-                client=client
-            )
-        except NotFoundError as e:
-            if not dry_run:
-                raise e
-
-        if dry_run:
-            if not _object_exists(remote_parent, local_file_path, client):
-                print("[Dry Run] Uploading {} to {}".format(
-                    local_file_path, remote_folder_full_path))
-                return
-            else:
-                print("[Dry Run] File {} already exists at {} - skipping upload".format(
-                    local_file_path, remote_folder_full_path))
-                return
+        # Provides the global host, token, token_type,
+        # and the remote folders and vaults already looked up by this worker
+        worker = _get_upload_worker(client_auth)
+        client = worker.client
+        folder_path, vault, folder_id = worker.get_folder(
+            remote_folder_full_path, follow_shortcuts=follow_shortcuts
+        )
 
         Object.upload_file(
             local_file_path,
-            remote_parent.path,
-            remote_parent.vault.full_path,
+            folder_path,
+            vault.full_path,
+            vault=vault,
+            parent_object_id=folder_id,
             archive_folder=archive_folder,
             follow_shortcuts=follow_shortcuts,
-            num_processes=1,  # Default for single file uploads in parallel processing
+            # Default for single file uploads in parallel processing
+            num_processes=part_workers or (limiter.max_concurrency if limiter else 1),
             max_retries=max_retries,
+            resumable=resumable,
+            limiter=limiter,
+            adaptive=adaptive,
             client=client,
         )
         return
@@ -293,27 +516,6 @@ def _create_file_job(args):
         return e
 
 
-def _object_exists(remote_parent, local_path, _client):
-    if remote_parent is None:
-        return False
-    full_path, path_dict = Object.validate_full_path(os.path.join('{}:{}'.format(
-        remote_parent.vault.full_path, remote_parent.path), os.path.basename(local_path)), client=_client)
-    try:
-        obj = Object.get_by_full_path(full_path, client=_client)
-        if not obj.is_file:
-            return False
-        else:
-            # Check if the md5sum matches
-            local_md5 = md5sum(local_path)[0]
-            remote_md5 = obj.get("md5")
-            if remote_md5 and remote_md5 == local_md5:
-                return True
-            else:
-                return False
-    except NotFoundError:
-        return False
-
-
 def _create_template_from_file(template_file, dry_run=False):
     mode = "r"
     fopen = open
@@ -454,6 +656,9 @@ def upload(args):
     within it, skipping ones that already exist on the remote.
     """
 
+    _size_connection_pool(args.num_processes)
+    if args.limit_rate:
+        global_client.set_rate_limit(args.limit_rate)
     base_remote_path, path_dict = Object.validate_full_path(args.full_path)
 
     # Assert the vault exists and is accessible
@@ -525,6 +730,10 @@ def upload(args):
                 archive_folder=args.archive_folder,
                 follow_shortcuts=follow_shortcuts,
                 max_retries=args.max_retries,
+                resumable=args.resumable,
+                engine=args.engine,
+                max_bytes_in_flight=args.max_memory and args.max_memory * 1024 * 1024,
+                adaptive=args.adaptive,
             )
         else:
             if args.dry_run:
@@ -539,6 +748,8 @@ def upload(args):
                     archive_folder=args.archive_folder,
                     num_processes=args.num_processes,
                     max_retries=args.max_retries,
+                    resumable=args.resumable,
+                    adaptive=args.adaptive,
                 )
 
 
@@ -669,6 +880,8 @@ def download(args):
     Given a folder or file, download all the files contained
     within it (not recursive).
     """
+    if args.limit_rate:
+        global_client.set_rate_limit(args.limit_rate)
     return _download(
         args.full_path,
         args.local_path,
@@ -679,6 +892,9 @@ def download(args):
         delete=args.delete,
         follow_shortcuts=args.follow_shortcuts,
         num_processes=args.num_processes,
+        num_connections=args.num_connections,
+        verify_md5=args.verify_md5,
+        resume=False if args.no_resume else None,
     )
 
 
@@ -692,11 +908,18 @@ def _download(
     delete=False,
     follow_shortcuts=False,
     num_processes=None,
+    num_connections=1,
+    verify_md5=False,
+    resume=None,
 ):
     """
     Given a folder or file, download all the files contained
     within it.
     """
+    download_kwargs = dict(
+        num_connections=num_connections, verify_md5=verify_md5, resume=resume
+    )
+    _size_connection_pool(num_connections)
     if dry_run:
         print("Running in dry run mode. Not downloading any files.")
 
@@ -717,6 +940,7 @@ def _download(
             delete,
             follow_shortcuts,
             num_processes,
+            **download_kwargs
         )
         return
 
@@ -732,7 +956,7 @@ def _download(
 
     for file_ in files:
         if not dry_run:
-            file_.download(local_folder_path)
+            file_.download(local_folder_path, **download_kwargs)
 
         print(
             "Downloaded: {} to {}/{}".format(
@@ -759,7 +983,7 @@ def _download(
             if not target:
                 continue
             target.filename = shortcut_.filename
-            target.download(local_folder_path)
+            target.download(local_folder_path, **download_kwargs)
             print(
                 "Downloaded from shortcut: {} to {}/{}".format(
                     shortcut_.full_path, local_folder_path, shortcut_.filename
@@ -776,6 +1000,7 @@ def _download_recursive(
     delete=False,
     follow_shortcuts=False,
     num_processes=None,
+    **download_kwargs
 ):
     if "**" in full_path:
         raise Exception(
@@ -810,19 +1035,23 @@ def _download_recursive(
 
     remote_objects = []
     for file_obj in results:
-        depth = len(file_obj.path.split("/"))
-        file_obj.depth = depth
-        # MD5 not retrieved by GlobalSearch so
-        # separate API call is needed
         if file_obj.class_name() == "Vault" or file_obj.is_shortcut:
             continue
-        if file_obj.is_file and not file_obj.get("md5"):
-            file_object = Object.retrieve(file_obj.id)
-            file_object.path = file_obj.path
-            file_obj = file_object
-        file_obj.depth = depth
+        file_obj.depth = len(file_obj.path.split("/"))
         remote_objects.append(file_obj)
 
+    # MD5 not retrieved by GlobalSearch so
+    # separate API calls are needed
+    missing_md5 = [
+        i for i, x in enumerate(remote_objects) if x.is_file and not x.get("md5")
+    ]
+    if missing_md5:
+        retrieved = _retrieve_objects([remote_objects[i].id for i in missing_md5])
+        for i, file_object in zip(missing_md5, retrieved):
+            file_object.path = remote_objects[i].path
+            file_object.depth = remote_objects[i].depth
+            remote_objects[i] = file_object
+
     min_depth = min([x.depth for x in remote_objects])
     num_at_min_depth = len([x for x in remote_objects if x.depth == min_depth])
     if num_at_min_depth == 1 and not _is_single_file(remote_objects):
@@ -851,9 +1080,10 @@ def _download_recursive(
         downloaded_files.add(os.path.abspath(local_path))
 
         # Skip over files that match remote md5 checksum
+        # (unchanged files are not hashed again, see SyncIndex)
         if os.path.exists(local_path):
             remote_md5 = remote_file.get("md5")
-            if remote_md5 and remote_md5 == md5sum(local_path)[0]:
+            if remote_md5 and remote_md5 == get_sync_index().md5sum(local_path):
                 print("Skipping {} already in sync".format(local_path))
                 continue
 
@@ -868,10 +1098,10 @@ def _download_recursive(
                 file = {"path": local_path, "file": remote_file}
                 files_to_download.append(file)
             else:
-                remote_file.download(local_path)
+                remote_file.download(local_path, **download_kwargs)
 
     if num_processes is not None:
-        _download_in_parallel(files_to_download, num_processes)
+        _download_in_parallel(files_to_download, num_processes, **download_kwargs)
 
     if not delete:
         return
@@ -881,6 +1111,9 @@ def _download_recursive(
             local_abs_path = os.path.abspath(os.path.join(root, file_))
             if local_abs_path in downloaded_files:
                 continue
+            # Keep partial downloads of remote files so they can be resumed
+            if partial_download_target(local_abs_path) in downloaded_files:
+                continue
             print(
                 "{}Deleting file {}".format(
                     "[Dry run] " if dry_run else "", local_abs_path
@@ -900,11 +1133,11 @@ def _download_recursive(
                 os.rmdir(local_abs_path)
 
 
-def _download_in_parallel(files_to_download, num_processes):
+def _download_in_parallel(files_to_download, num_processes, **download_kwargs):
     def _download_worker(file_info):
         try:
             print("downloading to: " + file_info["path"])
-            file_info.get("file").download(file_info.get("path"))
+            file_info.get("file").download(file_info.get("path"), **download_kwargs)
         except Exception as e:
             print(
                 "Error occurred while downloading file: ({}).".format(
@@ -922,6 +1155,7 @@ def _download_in_parallel(files_to_download, num_processes):
         )
 
     print("Downloading in parallel with {} processes.".format(num_processes))
+    _size_connection_pool(num_processes * download_kwargs.get("num_connections", 1))
 
     with ThreadPoolExecutor(max_workers=num_processes) as executor:
         try:
@@ -946,8 +1180,6 @@ def _resolve_shortcuts_and_get_files(
     if not download_path.endswith("/"):
         download_path += "/"
 
-    results = GlobalSearch().filter(path__prefix=full_path)
-
     if full_path.endswith("/*"):
         print(
             "Folder names ending with '/*' are not supported with "
@@ -956,69 +1188,173 @@ def _resolve_shortcuts_and_get_files(
         return set()
 
     if not follow_shortcuts:
+        results = GlobalSearch().filter(path__prefix=full_path)
         return [r for r in results if r.class_name() != "Vault" and not r.is_shortcut]
 
-    files = []
-    for x in results:
-        x.path = download_path + _get_relative_download_path(
-            base_path=full_path, path_to_object=x.full_path, filename=x.name
-        )
-        files.append(x)
+    return ShortcutResolver().resolve(full_path, download_path)
 
-    shortcuts = [o for o in files if o.class_name() != "Vault" and o.is_shortcut]
 
-    resolved_shortcuts = []
-    for shortcut in shortcuts:
+def _copy_object(obj):
+    """Returns a copy of an API object, which can be given a different path"""
+    return type(obj).construct_from(dict(obj), client=obj._client)
+
+
+def _path_key(full_path):
+    return full_path if full_path.endswith("/") else full_path + "/"
+
+
+class ShortcutResolver(object):
+    """
+    Lists the objects under a path, following shortcuts to files,
+    folders and vaults (as `download --recursive --follow-shortcuts`).
+
+    Shortcuts and their targets are cached by object ID, and folder
+    listings by path, so each is requested once however many shortcuts
+    lead to it. The shortcuts of a listing are resolved concurrently.
+    A shortcut to a folder or vault that contains the shortcut itself
+    is skipped instead of being followed forever.
+    """
+
+    # Cached result of targets that do not exist (or are not accessible)
+    NOT_FOUND = object()
+
+    def __init__(self, max_workers=METADATA_WORKERS):
+        self.max_workers = max_workers
+        self._shortcuts = {}
+        self._targets = {}
+        self._listings = {}
+        self._lock = threading.Lock()
+
+    def _map(self, func, items):
+        if len(items) <= 1:
+            return [func(item) for item in items]
+        max_workers = min(self.max_workers, len(items))
+        _size_connection_pool(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
+
+    def _list(self, full_path):
+        if full_path not in self._listings:
+            self._listings[full_path] = list(
+                GlobalSearch().filter(path__prefix=full_path)
+            )
+        # Copies, as each listing of a folder gets its own download paths
+        return [_copy_object(x) for x in self._listings[full_path]]
+
+    def _retrieve_shortcut(self, shortcut_id):
         # Global search doesn't return target in the response.
         # Directly accessing target will always return None.
         # Call Object.retrieve() to get the full object.
-        shortcut_object = Object.retrieve(shortcut.id)
+        with self._lock:
+            if shortcut_id in self._shortcuts:
+                return self._shortcuts[shortcut_id]
+        shortcut_object = Object.retrieve(shortcut_id)
+        with self._lock:
+            self._shortcuts[shortcut_id] = shortcut_object
+        return shortcut_object
+
+    def get_target(self, shortcut_object):
+        """
+        Returns the target of a shortcut (see Object.get_target()),
+        or NOT_FOUND if it was moved, deleted or is not accessible.
+        """
+        target = shortcut_object.get("target")
+        if not target or target.get("object_type") == "url":
+            return shortcut_object.get_target()
+
+        key = (target["object_type"], target["id"])
+        with self._lock:
+            if key in self._targets:
+                return self._targets[key]
         try:
             target_object = shortcut_object.get_target()
         except NotFoundError:
-            print(
-                "[WARNING] The target object for shortcut: ({}) "
-                "has been moved, deleted or you don't have permissions to view it.".format(
-                    shortcut.full_path
-                )
+            target_object = self.NOT_FOUND
+        with self._lock:
+            self._targets[key] = target_object
+        return target_object
+
+    def get_targets(self, shortcut_objects):
+        """Returns the targets of the shortcuts, resolved concurrently"""
+        return self._map(self.get_target, shortcut_objects)
+
+    def _resolve_shortcut(self, shortcut_id):
+        shortcut_object = self._retrieve_shortcut(shortcut_id)
+        return shortcut_object, self.get_target(shortcut_object)
+
+    def resolve(self, full_path, download_path, _parents=()):
+        """
+        Returns the objects under full_path (including shortcuts and the
+        objects they lead to), with a path relative to download_path.
+        """
+        parents = _parents + (_path_key(full_path),)
+
+        files = []
+        for x in self._list(full_path):
+            x.path = download_path + _get_relative_download_path(
+                base_path=full_path, path_to_object=x.full_path, filename=x.name
             )
-            continue
+            files.append(x)
 
-        if not target_object:
-            print(
-                "Couldn't find target object for shortcut: {}".format(
-                    shortcut.full_path
+        shortcuts = [o for o in files if o.class_name() != "Vault" and o.is_shortcut]
+        resolved = self._map(self._resolve_shortcut, [o.id for o in shortcuts])
+
+        resolved_shortcuts = []
+        for shortcut, (shortcut_object, target_object) in zip(shortcuts, resolved):
+            if target_object is self.NOT_FOUND:
+                print(
+                    "[WARNING] The target object for shortcut: ({}) "
+                    "has been moved, deleted or you don't have permissions "
+                    "to view it.".format(shortcut.full_path)
                 )
-            )
-            continue
-        elif shortcut_object.target.object_type == "url":
-            print(
-                "Found URL shortcut at: ({}) skipping download.".format(
-                    shortcut_object.full_path
+                continue
+
+            if not target_object:
+                print(
+                    "Couldn't find target object for shortcut: {}".format(
+                        shortcut.full_path
+                    )
                 )
+                continue
+            elif shortcut_object.target.object_type == "url":
+                print(
+                    "Found URL shortcut at: ({}) skipping download.".format(
+                        shortcut_object.full_path
+                    )
+                )
+                continue
+
+            if shortcut_object.target.object_type == "vault":
+                target_path = target_object.full_path + ":/"
+                target_download_path = shortcut.path + "/" + target_object.name + "/"
+            elif target_object.is_folder:
+                target_path = target_object.full_path
+                target_download_path = shortcut.path + "/"
+            else:
+                # set filename and path for download - keep shortcut structure
+                target_object = _copy_object(target_object)
+                target_object.path = shortcut.path
+                resolved_shortcuts.append(target_object)
+                continue
+
+            # Following a shortcut into a folder that is being listed
+            # (or contains one) would list this shortcut again
+            target_key = _path_key(target_path)
+            if any(parent.startswith(target_key) for parent in parents):
+                print(
+                    "[WARNING] Skipping circular shortcut: ({}) to ({})".format(
+                        shortcut.full_path, target_path
+                    )
+                )
+                continue
+
+            if shortcut_object.target.object_type == "vault":
+                print("Following shortcut to vault: ({})".format(target_object.name))
+            resolved_shortcuts += self.resolve(
+                target_path, target_download_path, _parents=parents
             )
-            continue
-        elif shortcut_object.target.object_type == "vault":
-            print("Following shortcut to vault: ({})".format(target_object.name))
-            resolved_shortcuts += _resolve_shortcuts_and_get_files(
-                full_path=target_object.full_path + ":/",
-                download_path=shortcut.path + "/" + target_object.name + "/",
-                follow_shortcuts=follow_shortcuts,
-            )
-        elif target_object.is_folder:
-            # todo # implement circular shortcut avoiding
-            #      # note: it isn't as simple as skipping over already visited folders
-            resolved_shortcuts += _resolve_shortcuts_and_get_files(
-                full_path=target_object.full_path,
-                download_path=shortcut.path + "/",
-                follow_shortcuts=follow_shortcuts,
-            )
-        else:
-            # set filename and path for download - keep shortcut structure
-            target_object.path = shortcut.path
-            resolved_shortcuts.append(target_object)
 
-    return resolved_shortcuts + files
+        return resolved_shortcuts + files
 
 
 def _get_relative_download_path(base_path, path_to_object, filename):
@@ -1061,44 +1397,134 @@ def ls(args):
 
 
 def _ls(full_path, recursive=False, follow_shortcuts=False):
-    files = list(Object.all(glob=full_path, limit=1000))
-
-    for file_ in files:
-        if follow_shortcuts and file_.is_shortcut:
-            shortcut = file_.full_path
-            try:
-                resolved_file = file_.get_target()
-                print(
-                    "{}  {}  {}  from shortcut: {}".format(
-                        resolved_file.last_modified,
-                        resolved_file.object_type.ljust(8),
-                        resolved_file.full_path.ljust(50),
-                        shortcut,
-                    )
+    files = []
+    for file_, target in walk_objects(
+        full_path, recursive=recursive, follow_shortcuts=follow_shortcuts
+    ):
+        files.append(file_)
+        if target is ShortcutResolver.NOT_FOUND:
+            print(
+                "Shortcut {} could not be resolved: "
+                "the target may have been deleted or you may not have permission to access it".format(
+                    file_.full_path
                 )
-            except NotFoundError:
-                print(
-                    "Shortcut {} could not be resolved: "
-                    "the target may have been deleted or you may not have permission to access it".format(
-                        shortcut
-                    )
+            )
+        elif target is not None:
+            print(
+                "{}  {}  {}  from shortcut: {}".format(
+                    target.last_modified,
+                    target.object_type.ljust(8),
+                    target.full_path.ljust(50),
+                    file_.full_path,
                 )
+            )
         else:
-            resolved_file = file_
             print(
                 "{}  {}  {}".format(
-                    resolved_file.last_modified,
-                    resolved_file.object_type.ljust(8),
-                    resolved_file.full_path,
+                    file_.last_modified,
+                    file_.object_type.ljust(8),
+                    file_.full_path,
                 )
             )
 
-        if recursive and resolved_file.object_type == "folder":
-            _ls(resolved_file.full_path + "/*", recursive=True)
-
     return files
 
 
+def _list_pages(listing):
+    """Yields the pages of objects of a list response, following links.next"""
+    if not isinstance(listing, ListObject):
+        yield list(listing)
+        return
+
+    while True:
+        yield listing.quartzbio_objects()
+        next_page = listing.next_page()
+        if next_page is None:
+            return
+        listing.refresh_from(next_page)
+
+
+def walk_objects(
+    full_path,
+    recursive=False,
+    follow_shortcuts=False,
+    max_workers=METADATA_WORKERS,
+    resolver=None,
+    **params
+):
+    """
+    Lists the objects matching a glob full path (see Object.all) and,
+    if recursive, the objects in every folder below them.
+
+    Folders are listed breadth-first, with up to max_workers sibling
+    folders listed concurrently. Results are yielded as each page
+    arrives, as (object, target) tuples where target is the resolved
+    target of a shortcut (or ShortcutResolver.NOT_FOUND) if
+    follow_shortcuts is set, and None otherwise. Shortcuts to folders
+    are walked like folders, but no folder is listed twice.
+
+    Additional params (e.g. object_type or permission) filter each listing.
+    """
+    if follow_shortcuts:
+        resolver = resolver or ShortcutResolver(max_workers=max_workers)
+
+    pages = Queue()
+    stopped = threading.Event()
+    listed = set()
+
+    def _list(glob):
+        try:
+            listing = Object.all(glob=glob, limit=1000, **params)
+            for page in _list_pages(listing):
+                if stopped.is_set():
+                    break
+                pages.put((page, None))
+        except Exception as e:
+            pages.put((None, e))
+        finally:
+            pages.put((None, None))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    _size_connection_pool(max_workers)
+    futures = []
+    try:
+        futures.append(executor.submit(_list, full_path))
+        pending = 1
+        while pending:
+            page, error = pages.get()
+            if error is not None:
+                raise error
+            if page is None:
+                pending -= 1
+                continue
+
+            targets = [None] * len(page)
+            if follow_shortcuts:
+                shortcuts = [i for i, obj in enumerate(page) if obj.is_shortcut]
+                resolved = resolver.get_targets([page[i] for i in shortcuts])
+                for i, target in zip(shortcuts, resolved):
+                    targets[i] = target
+
+            for obj, target in zip(page, targets):
+                yield obj, target
+
+                folder = target if target is not None else obj
+                if (
+                    recursive
+                    and getattr(folder, "object_type", None) == "folder"
+                    and folder.full_path not in listed
+                ):
+                    listed.add(folder.full_path)
+                    futures.append(executor.submit(_list, folder.full_path + "/*"))
+                    pending += 1
+    finally:
+        # Stop listing if the caller stopped early or a listing failed
+        stopped.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
 def should_tag_by_object_type(args, object_):
     """Returns True if object matches object type requirements"""
     valid = True
@@ -1130,7 +1556,9 @@ def tag(args):
     for full_path in args.full_path:
         # API will determine depth based on number of "/" in the glob
         # Add */** to match in any vault (recursive)
-        objects.extend(list(Object.all(glob=full_path, permission="write", limit=1000)))
+        objects.extend(
+            obj for obj, _ in walk_objects(full_path, permission="write")
+        )
 
     seen_vaults = {}
     taggable_objects = []
@@ -14,6 +14,7 @@ from .tutorial import print_tutorial
 from .ipython import launch_ipython_shell
 from ..auth import validate_api_host_url
 from ..utils.files import get_home_dir
+from ..utils.throttle import parse_rate
 
 
 class TildeFixStoreAction(argparse._StoreAction):
@@ -286,6 +287,43 @@ class QuartzBioArgumentParser(argparse.ArgumentParser):
                     "default": 3,
                     "type": int,
                 },
+                {
+                    "flags": "--resumable",
+                    "help": "Save the progress of multipart uploads locally. "
+                    "Interrupted uploads are kept and resumed when the same "
+                    "command is run again.",
+                    "action": "store_true",
+                },
+                {
+                    "flags": "--engine",
+                    "help": "Upload folders with a pool of worker processes "
+                    "(default) or of threads. The thread engine avoids the "
+                    "per-process overhead when uploading many small files, "
+                    "and shares --num-processes between files and file parts.",
+                    "choices": ["process", "thread"],
+                    "default": "process",
+                },
+                {
+                    "flags": "--max-memory",
+                    "help": "Maximum MB of file parts being uploaded at once "
+                    "by the thread engine. Defaults to 1024.",
+                    "type": int,
+                },
+                {
+                    "flags": "--adaptive",
+                    "help": "Adapt the number of parts of multipart uploads "
+                    "sent at once to the measured throughput, up to "
+                    "--num-processes, and back off when storage throttles "
+                    "requests. Applies to single files and the thread engine.",
+                    "action": "store_true",
+                },
+                {
+                    "flags": "--limit-rate",
+                    "help": "Maximum bandwidth of the upload, in bytes per "
+                    "second, with an optional K, M or G suffix (e.g. 10M). "
+                    "The limit is shared by all the parallel uploads.",
+                    "type": parse_rate,
+                },
                 {
                     "name": "local_path",
                     "help": "The path to the local file or directory " "to upload",
@@ -390,6 +428,32 @@ class QuartzBioArgumentParser(argparse.ArgumentParser):
                     "default": None,
                     "type": int,
                 },
+                {
+                    "flags": "--num-connections",
+                    "help": "Number of connections used to download each "
+                    "large file, with parallel range requests. Defaults to 1.",
+                    "default": 1,
+                    "type": int,
+                },
+                {
+                    "flags": "--verify-md5",
+                    "help": "Check the MD5 of downloaded files against the "
+                    "MD5 of the remote files.",
+                    "action": "store_true",
+                },
+                {
+                    "flags": "--no-resume",
+                    "help": "Restart interrupted downloads from the beginning "
+                    "instead of resuming them from their .part files.",
+                    "action": "store_true",
+                },
+                {
+                    "flags": "--limit-rate",
+                    "help": "Maximum bandwidth of the download, in bytes per "
+                    "second, with an optional K, M or G suffix (e.g. 10M). "
+                    "The limit is shared by all the parallel downloads and connections.",
+                    "type": parse_rate,
+                },
             ],
         },
         "tag": {
@@ -11,16 +11,22 @@ import quartzbio
 from .version import VERSION
 from .errors import QuartzBioError
 from .auth import authenticate, QuartzBioTokenAuth
+from .utils.path_cache import DEFAULT_PATH_CACHE_TTL, OBJECT, USER, VAULT
+from .utils.path_cache import PathCache
+from .utils.request_limiter import RequestLimiter
+from .utils.single_flight import SingleFlight
+from .utils.throttle import RateLimiter, parse_rate
 
 import platform
 import requests
 import textwrap
+import threading
 import logging
 
 from requests import Session, codes, adapters
 from urllib3.util.retry import Retry
 
-from urllib.parse import urljoin
+from urllib.parse import urljoin, urlparse
 
 # Try using pyopenssl if available.
 # Requires: pip install pyopenssl ndg-httpsclient pyasn1
@@ -49,6 +55,12 @@ if not ssl.HAS_TLSv1_2:
 
 logger = logging.getLogger("quartzbio")
 
+# The default number of connections kept alive per host
+DEFAULT_POOL_MAXSIZE = 10
+
+# The resources whose writes invalidate the path cache
+_PATH_CACHE_URLS = ("/v2/objects", "/v2/vaults")
+
 
 def _handle_api_error(response):
     if response.status_code not in [400, 401, 403, 404]:
@@ -84,8 +96,21 @@ def _handle_request_error(e):
     raise QuartzBioError(message=msg)
 
 
+# Classes of the quartzbio package that are not bound to clients
+_UNBOUND_CLASSES = frozenset(
+    ["QuartzBioError", "QuartzBioClient", "AsyncQuartzBioClient"]
+)
+
+
 class QuartzBioClient(object):
-    """A requests-based HTTP client for QuartzBio API resources"""
+    """
+    A requests-based HTTP client for QuartzBio API resources.
+
+    With path_cache_ttl (or QUARTZBIO_PATH_CACHE_TTL) set, the lookups of
+    the user, vaults and objects by path are cached for that many seconds.
+    Vaults and objects created, moved or deleted by other clients or
+    processes may then be reported wrongly until their lookups expire.
+    """
 
     def __init__(
         self,
@@ -94,10 +119,33 @@ class QuartzBioClient(object):
         token_type: Literal["Bearer", "Token"] = "Bearer",
         include_resources=True,
         retry_all: bool = None,
+        pool_maxsize: int = None,
+        rate_limit: int = None,
+        path_cache_ttl: float = None,
+        coalesce_requests: bool = None,
     ):
         self._host: str = None
         self._auth: QuartzBioTokenAuth = None
         self._session: Session = None
+        self._transfer_session: Session = None
+        self._transfer_session_lock = threading.Lock()
+        self._retries: Retry = None
+
+        # Connections kept alive per host, shared by all threads using this client
+        self.pool_maxsize = int(
+            pool_maxsize
+            or os.environ.get("QUARTZBIO_POOL_MAXSIZE")
+            or DEFAULT_POOL_MAXSIZE
+        )
+
+        # Bandwidth limit (bytes/second) of the file transfers of all threads
+        self.rate_limiter: RateLimiter = None
+        self.set_rate_limit(
+            rate_limit or parse_rate(os.environ.get("QUARTZBIO_RATE_LIMIT") or 0)
+        )
+
+        # Pauses and paces the API requests of all threads after a 429
+        self.request_limiter = RequestLimiter()
 
         self._headers = {
             "Content-Type": "application/json",
@@ -108,21 +156,63 @@ class QuartzBioClient(object):
         if self.retry_all is None:
             self.retry_all = bool(os.environ.get("QUARTZBIO_RETRY_ALL"))
 
+        # Lookups of the user, vaults and objects made to resolve paths
+        if path_cache_ttl is None:
+            path_cache_ttl = float(
+                os.environ.get("QUARTZBIO_PATH_CACHE_TTL", DEFAULT_PATH_CACHE_TTL)
+            )
+        self.path_cache = PathCache(path_cache_ttl)
+
+        # Identical GET requests made at the same time by several threads
+        # are sent once, and share the response (off by default)
+        if coalesce_requests is None:
+            coalesce_requests = bool(os.environ.get("QUARTZBIO_COALESCE_REQUESTS"))
+        self.single_flight: SingleFlight = SingleFlight() if coalesce_requests else None
+
         # this class is created before any commands, so it shouldn't raise a missing host exception
         self.set_credentials(host, token, token_type, raise_on_missing=False)
         self.set_user_agent()
 
-        # Import all resources into the client
-        if include_resources:
-            skip = (
-                "QuartzBioError",
-                "QuartzBioClient",
+        # Resources are bound to the client on first access (see __getattr__)
+        self._include_resources = include_resources
+
+    def __getattr__(self, name):
+        """
+        Binds a resource class of the quartzbio package to this client
+        (e.g. client.Object), as a subclass created once per client.
+        """
+        # Private names (and probes like __deepcopy__ or __getstate__) and
+        # names that are not resources fail without importing anything
+        if (
+            name.startswith("_")
+            or name in _UNBOUND_CLASSES
+            or name not in quartzbio.__all__
+            or not self.__dict__.get("_include_resources")
+        ):
+            raise AttributeError(
+                "'{}' object has no attribute '{}'".format(type(self).__name__, name)
+            )
+
+        class_ = getattr(quartzbio, name)
+        if not inspect.isclass(class_):
+            raise AttributeError(
+                "'{}' object has no attribute '{}'".format(type(self).__name__, name)
             )
-            for name, class_ in inspect.getmembers(quartzbio, inspect.isclass):
-                if name in skip:
-                    continue
-                subclass = type(name, (class_,), {"_client": self})
-                setattr(self, name, subclass)
+
+        subclass = type(name, (class_,), {"_client": self})
+        # Concurrent first accesses all get the subclass stored first
+        return self.__dict__.setdefault(name, subclass)
+
+    def __dir__(self):
+        names = set(super(QuartzBioClient, self).__dir__())
+        if self.__dict__.get("_include_resources"):
+            names.update(
+                name
+                for name in getattr(quartzbio, "__all__", [])
+                if name not in _UNBOUND_CLASSES
+                and inspect.isclass(getattr(quartzbio, name, None))
+            )
+        return sorted(names)
 
     def set_user_agent(self, name=None, version=None):
         ua = "quartzbio-python-client/{} python-requests/{} {}/{}".format(
@@ -150,6 +240,8 @@ class QuartzBioClient(object):
         self._host, self._auth = authenticate(
             host, token, token_type, debug=debug, raise_on_missing=raise_on_missing
         )
+        # Cached lookups belong to the previous user
+        self.path_cache.invalidate()
 
         if self._host:
             retry_kwargs = {}
@@ -161,7 +253,7 @@ class QuartzBioClient(object):
             else:
                 logger.info("Retries enabled for read-only API requests")
 
-            retries = Retry(
+            self._retries = Retry(
                 total=5,
                 backoff_factor=2,
                 status_forcelist=[
@@ -174,9 +266,63 @@ class QuartzBioClient(object):
 
             # Use a session with a retry policy to handle
             # intermittent connection errors.
-            adapter = adapters.HTTPAdapter(max_retries=retries)
             self._session = Session()
-            self._session.mount(self._host, adapter)
+            self._session.mount(self._host, self._api_adapter())
+
+    def _api_adapter(self):
+        return adapters.HTTPAdapter(
+            max_retries=self._retries, pool_maxsize=self.pool_maxsize
+        )
+
+    def _transfer_adapter(self):
+        # Retries are handled by the upload and download code
+        return adapters.HTTPAdapter(pool_maxsize=self.pool_maxsize)
+
+    def set_pool_size(self, pool_maxsize):
+        """
+        Sets the number of connections kept alive per host, for API
+        requests and file transfers. Use at least as many connections
+        as threads making requests with this client.
+        """
+        pool_maxsize = int(pool_maxsize)
+        if pool_maxsize < 1:
+            raise Exception("'pool_maxsize' parameter must be >= 1")
+        if pool_maxsize == self.pool_maxsize:
+            return
+
+        self.pool_maxsize = pool_maxsize
+        if self._session is not None:
+            self._session.mount(self._host, self._api_adapter())
+        with self._transfer_session_lock:
+            if self._transfer_session is not None:
+                self._transfer_session.mount("https://", self._transfer_adapter())
+                self._transfer_session.mount("http://", self._transfer_adapter())
+
+    def set_rate_limit(self, rate_limit):
+        """
+        Limits the bandwidth of file uploads and downloads to rate_limit
+        bytes per second, shared by all threads using this client.
+        None (or 0) removes the limit.
+        """
+        if rate_limit and rate_limit < 0:
+            raise Exception("'rate_limit' parameter must be >= 0")
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+
+    @property
+    def transfer_session(self):
+        """
+        A shared session for requests to presigned file URLs (uploads
+        and downloads), without API authentication. Connections are kept
+        alive and reused across parts, files and threads.
+        """
+        if self._transfer_session is None:
+            with self._transfer_session_lock:
+                if self._transfer_session is None:
+                    session = Session()
+                    session.mount("https://", self._transfer_adapter())
+                    session.mount("http://", self._transfer_adapter())
+                    self._transfer_session = session
+        return self._transfer_session
 
     def is_logged_in(self):
         return bool(self._host and self._auth and self._session)
@@ -184,6 +330,10 @@ class QuartzBioClient(object):
     def whoami(self):
         return self.get("/v1/user", {})
 
+    def get_user(self):
+        """Returns the current user, from the path cache if possible"""
+        return self.path_cache.get(USER, None, self.whoami)
+
     def get(self, url, params, **kwargs):
         """Issues an HTTP GET across the wire via the Python requests
         library. See *request()* for information on keyword args."""
@@ -250,6 +400,20 @@ class QuartzBioClient(object):
         if not self.is_logged_in():
             raise QuartzBioError("HTTP request: client is not logged in!")
 
+        if (
+            self.single_flight is not None
+            and method.upper() == "GET"
+            and not kwargs.get("raw")
+            and not kwargs.get("debug")
+        ):
+            key = (url, json.dumps(kwargs, sort_keys=True, default=repr))
+            return self.single_flight.do(
+                key, lambda: self._request(method, url, **kwargs)
+            )
+
+        return self._request(method, url, **kwargs)
+
+    def _request(self, method, url, **kwargs):
         opts = {
             "allow_redirects": True,
             "auth": self._auth,
@@ -280,20 +444,35 @@ class QuartzBioClient(object):
         if debug:
             self._log_raw_request(method, url, **opts)
 
-        try:
-            response = self._session.request(method, url, **opts)
-        except Exception as e:
-            _handle_request_error(e)
+        retries = 0
+        while True:
+            # Wait for the pause after a 429 (shared by all threads) to end
+            delay = self.request_limiter.delay()
+            if delay > 0:
+                time.sleep(delay)
 
-        if 429 == response.status_code:
-            delay = int(response.headers["retry-after"]) + 1
-            logger.warn("Too many requests. Retrying in {0}s.".format(delay))
-            time.sleep(delay)
-            return self.request(method, url, **kwargs)
+            try:
+                response = self._session.request(method, url, **opts)
+            except Exception as e:
+                _handle_request_error(e)
+
+            # Learns the rate limits, and is None unless a 429 can be retried
+            delay = self.request_limiter.update(response, retries)
+            if delay is None:
+                break
+
+            retries += 1
+            logger.warning("Too many requests. Retrying in {0:g}s.".format(delay))
 
         if not (200 <= response.status_code < 400):
             _handle_api_error(response)
 
+        if method not in ("GET", "HEAD", "OPTIONS") and self._api_path(url).startswith(
+            _PATH_CACHE_URLS
+        ):
+            # Paths may have been created, moved or deleted
+            self.path_cache.invalidate(VAULT, OBJECT)
+
         # 204 is used on deletion. There is no JSON here.
         if raw or response.status_code in [204, 301, 302]:
             return response
@@ -337,6 +516,14 @@ class QuartzBioClient(object):
         logger.debug(prepped.headers)
         logger.debug(prepped.body)
 
+    def _api_path(self, url):
+        """The path of a URL relative to the path of the API host (if any)"""
+        path = urlparse(url).path
+        host_path = urlparse(self._host or "").path.rstrip("/")
+        if host_path and path.startswith(host_path + "/"):
+            path = path[len(host_path):]
+        return path
+
     def __repr__(self):
         return "<QuartzBioClient {0} {1}>".format(self._host, self._auth)
 
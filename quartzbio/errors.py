@@ -11,6 +11,10 @@ class FileUploadError(Exception):
     pass
 
 
+class FileDownloadError(Exception):
+    pass
+
+
 class QuartzBioError(Exception):
     """Exceptions tailored to the kinds of errors from a QuartzBio API
     request"""
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
 from abc import ABCMeta
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import json
 import uuid
 
@@ -11,10 +13,18 @@ from .errors import QuartzBioError
 
 import copy
 import logging
+import weakref
 
 logger = logging.getLogger("quartzbio")
 
 
+def _shutdown_prefetch(executor, queue):
+    """Cancels the pages not fetched yet and shuts the prefetch pool down"""
+    for _, future in queue:
+        future.cancel()
+    executor.shutdown(wait=False)
+
+
 class Filter(object):
     """
     Filter objects.
@@ -239,6 +249,12 @@ class QueryBase(object, metaclass=ABCMeta):
     # Special case for Query/QueryFile class to pre-set QuartzBioClient
     _client = None
 
+    # Number of pages kept in flight while iterating (0 disables prefetching)
+    _prefetch = 0
+    _prefetch_queue = None
+    _prefetch_executor = None
+    _prefetch_finalizer = None
+
     def limit(self, limit):
         """
         Returns a new Query/QueryFile instance with the new
@@ -424,7 +440,7 @@ class QueryBase(object, metaclass=ABCMeta):
         q = self._clone()
         q._limit = min(1, self._limit)  # Limit may be 0
         q.execute(key)
-        return q._buffer[0]
+        return q._record(q._buffer[0])
 
     def __iter__(self):
         # e.g. [r for r in results] will NOT call __getitem__ and
@@ -435,8 +451,94 @@ class QueryBase(object, metaclass=ABCMeta):
         self._cursor = 0  # Count the number of results returned
         self._buffer_idx = 0  # The current position within the buffer
 
+        self._start_prefetch()
         return self
 
+    def _start_prefetch(self):
+        """
+        Schedules requests for the following pages on a bounded thread pool.
+
+        The offset of every page is known once the first page (and the total)
+        has been fetched, so up to `prefetch` pages are requested ahead of
+        the iterator. Pages are still returned in order by next().
+        """
+        self._stop_prefetch()
+
+        if not self._prefetch or getattr(self, "_is_join", False):
+            return
+
+        try:
+            end = min(self._page_offset + len(self), self.count())
+        except TypeError:
+            # The total is unknown, so page sequentially
+            return
+
+        self._prefetch_offsets = iter(
+            range(self._page_offset + self._page_size, end, self._page_size)
+        )
+        self._prefetch_executor = ThreadPoolExecutor(max_workers=self._prefetch)
+        self._prefetch_queue = deque()
+        # Shuts the pool down if the iteration is abandoned (e.g. with break)
+        # and the query is garbage collected
+        self._prefetch_finalizer = weakref.finalize(
+            self, _shutdown_prefetch, self._prefetch_executor, self._prefetch_queue
+        )
+        for _ in range(self._prefetch):
+            self._submit_prefetch()
+
+    def _submit_prefetch(self):
+        offset = next(self._prefetch_offsets, None)
+        if offset is None:
+            return
+
+        logger.debug("prefetching page at offset %d" % offset)
+        # Pages are fetched by clones, so the pool does not keep this query alive
+        future = self._prefetch_executor.submit(self._clone()._fetch_page, offset)
+        self._prefetch_queue.append((offset, future))
+
+    def _fetch_page(self, offset):
+        """Fetches a single page (of a clone of the iterated query)."""
+        _, response = self.execute(offset)
+        return response
+
+    def _next_prefetched_page(self):
+        if not self._prefetch_queue:
+            # All the scheduled pages have been consumed
+            self._stop_prefetch()
+            self._response = dict(self._response, results=[])
+            return
+
+        offset, future = self._prefetch_queue.popleft()
+        try:
+            response = future.result()
+        except QuartzBioError as e:
+            self._error = e
+            self._stop_prefetch()
+            raise
+
+        self._page_offset = offset
+        self._response = response
+        self._submit_prefetch()
+
+    def _fetch_next_page(self):
+        """Fetches the page following the current buffer."""
+        self.execute(self._page_offset + self._buffer_idx)
+
+    def _stop_prefetch(self):
+        if self._prefetch_finalizer is not None:
+            # Cancels the pending pages and shuts the pool down (once)
+            self._prefetch_finalizer()
+            self._prefetch_finalizer = None
+        self._prefetch_queue = None
+        self._prefetch_executor = None
+
+    def close(self):
+        """
+        Stops prefetching pages, e.g. after breaking out of a loop
+        over the results before the end.
+        """
+        self._stop_prefetch()
+
     def __next__(self):
         """Python 3"""
         return self.next()
@@ -464,29 +566,86 @@ class QueryBase(object, metaclass=ABCMeta):
         # len(self) returns `min(limit, total)` results
         try:
             if not _is_join and self._cursor == len(self):
+                self._stop_prefetch()
                 raise StopIteration
         except TypeError:
             # len(self) is unknown so just continue normally
             pass
 
         if self._buffer_idx == len(self._buffer):
-            if _is_join:
-                if self._next_offset >= self._limit:
-                    # Since joins can return more results than we expect (due to `explode`)
-                    # manually ensure that we haven't gone above the requested limit (default inf)
-                    raise StopIteration
-                self.execute(self._next_offset)
-            else:
-                self.execute(self._page_offset + self._buffer_idx)
-            self._buffer_idx = 0
+            self._load_next_page()
 
         if not self._buffer:
+            self._stop_prefetch()
             raise StopIteration
 
         self._cursor += 1
         self._buffer_idx += 1
 
-        return self._buffer[self._buffer_idx - 1]
+        return self._record(self._buffer[self._buffer_idx - 1])
+
+    def _record(self, record):
+        """Returns a record of the buffer as it is given to the caller."""
+        return record
+
+    def _load_next_page(self):
+        """Replaces the buffer with the next page of results."""
+        if getattr(self, "_is_join", False):
+            if self._next_offset >= self._limit:
+                # Since joins can return more results than we expect (due to `explode`)
+                # manually ensure that we haven't gone above the requested limit (default inf)
+                raise StopIteration
+            self.execute(self._next_offset)
+        elif self._prefetch_queue is not None:
+            self._next_prefetched_page()
+        else:
+            self._fetch_next_page()
+        self._buffer_idx = 0
+
+    def pages(self):
+        """
+        Iterates through the results one page (a list of records) at a time,
+        respecting the limit and slice of the Query/QueryFile.
+
+        This avoids the per-record overhead of next() when the results
+        are consumed in bulk.
+        """
+        self.__iter__()
+        _is_join = getattr(self, "_is_join", False)
+        _cursor_only_field = getattr(self, "_cursor_only_field", None)
+
+        # The prefetching stops with the generator, even if it is not exhausted
+        try:
+            while True:
+                page = self._buffer[self._buffer_idx:]
+                try:
+                    if not _is_join:
+                        page = page[: len(self) - self._cursor]
+                except TypeError:
+                    # len(self) is unknown so just continue normally
+                    pass
+
+                if not page:
+                    return
+
+                self._cursor += len(page)
+                self._buffer_idx += len(page)
+                if _cursor_only_field:
+                    page = [self._record(r) for r in page]
+                yield page
+
+                try:
+                    if not _is_join and self._cursor >= len(self):
+                        return
+                except TypeError:
+                    pass
+
+                try:
+                    self._load_next_page()
+                except StopIteration:
+                    return
+        finally:
+            self._stop_prefetch()
 
     def filter(self, *filters, **kwargs):
         """
@@ -569,6 +728,8 @@ class Query(QueryBase):
         target_fields=None,
         annotator_params=None,
         debug=False,
+        prefetch=0,
+        cursor=None,
         **kwargs,
     ):
         """
@@ -589,6 +750,12 @@ class Query(QueryBase):
           - `target_fields` (optional): Add target fields to annotate the query results.
           - `annotator_params` (optional): For use with `target_fields` to adjust annotator parameters.
           - `debug` (optional): Sends debug information to the API.
+          - `prefetch` (optional): Number of pages to request ahead of
+            the iterator, in parallel (default: 0, disabled).
+          - `cursor` (optional): A unique field used to page through the
+            results (e.g. `_id`, or `-_id` for descending order). Pages after
+            the first one are requested with a filter on the last seen value
+            instead of an offset. Sets the ordering of the query.
         """
         self._dataset_id = dataset_id
         self._data_url = "/v2/datasets/{0}/data".format(dataset_id)
@@ -602,9 +769,26 @@ class Query(QueryBase):
         self._target_fields = target_fields
         self._annotator_params = annotator_params
         self._debug = debug
+        self._prefetch = int(prefetch)
+        self._cursor_field = cursor
+        self._cursor_only_field = None
         self._error = None
         self._is_join = False
 
+        if cursor:
+            if ordering is None:
+                self._ordering = [cursor]
+            elif ordering not in (cursor, [cursor]):
+                raise Exception(
+                    "'ordering' parameter must match the 'cursor' field"
+                )
+
+            # The cursor field is needed in every record to request the next page,
+            # it is requested but removed from the records if it was not selected
+            cursor_name = cursor.lstrip("-")
+            if fields is not None and cursor_name not in fields:
+                self._cursor_only_field = cursor_name
+
         if filters:
             if isinstance(filters, Filter):
                 filters = [filters]
@@ -638,6 +822,14 @@ class Query(QueryBase):
                 )
             )
 
+        if self._prefetch < 0:
+            raise Exception("'prefetch' parameter must be >= 0")
+
+        if self._prefetch and self._cursor_field:
+            raise Exception(
+                "'prefetch' and 'cursor' parameters cannot be used together"
+            )
+
         # Set up the QuartzBioClient
         # (kwargs overrides pre-set, which overrides global)
         self._client = kwargs.get("client") or self._client or client
@@ -657,6 +849,8 @@ class Query(QueryBase):
             target_fields=self._target_fields,
             annotator_params=self._annotator_params,
             debug=self._debug,
+            prefetch=self._prefetch,
+            cursor=self._cursor_field,
             client=self._client,
         )
         new._filters += self._filters
@@ -740,7 +934,9 @@ class Query(QueryBase):
                 q["filters"] = filters
 
         if self._fields is not None:
-            q["fields"] = self._fields
+            q["fields"] = list(self._fields)
+            if self._cursor_only_field:
+                q["fields"].append(self._cursor_only_field)
 
         if self._exclude_fields is not None:
             q["exclude_fields"] = self._exclude_fields
@@ -810,6 +1006,65 @@ class Query(QueryBase):
         )
         return _params, self._response
 
+    def _fetch_next_page(self):
+        """
+        Fetches the next page using the last seen value of the cursor field,
+        which keeps deep pages as fast as the first one and is not affected by
+        records being added to the dataset while it is being paged.
+
+        Falls back to offsets if the API rejects the cursor request or if the
+        results do not appear to be sorted by the cursor field.
+        """
+        position = self._page_offset + self._buffer_idx
+        if not self._cursor_field or self._is_join:
+            return self.execute(position)
+
+        name = self._cursor_field.lstrip("-")
+        descending = self._cursor_field.startswith("-")
+        values = [r.get(name) if isinstance(r, dict) else None for r in self._buffer]
+
+        if not values:
+            return self.execute(position)
+
+        if None in values:
+            return self._cursor_fallback(position, "missing values for '%s'" % name)
+
+        try:
+            in_order = values == sorted(values, reverse=descending)
+        except TypeError:
+            in_order = False
+        if not in_order:
+            return self._cursor_fallback(position, "results are not sorted by '%s'" % name)
+
+        op = "__lt" if descending else "__gt"
+        query = self._clone(filters=[Filter(**{name + op: values[-1]})])
+        try:
+            _, response = query.execute(0)
+        except QuartzBioError as e:
+            if e.status_code != 400:
+                self._error = e
+                raise
+            return self._cursor_fallback(position, e)
+
+        # The total of a cursor page only counts the remaining records
+        response["total"] = position + response["total"]
+        self._page_offset = position
+        self._response = response
+
+    def _record(self, record):
+        if self._cursor_only_field and isinstance(record, dict):
+            record = dict(record)
+            record.pop(self._cursor_only_field, None)
+        return record
+
+    def _cursor_fallback(self, position, reason):
+        logger.warning(
+            "Cursor pagination on '%s' is not available (%s), "
+            "falling back to offsets." % (self._cursor_field, reason)
+        )
+        self._cursor_field = None
+        return self.execute(position)
+
     def fields(self):
         """Returns all expected fields that will be found in the results."""
 
@@ -823,6 +1078,121 @@ class Query(QueryBase):
 
         return fields
 
+    def _column_fields(self):
+        return [(f.name, f.data_type, bool(f.is_list)) for f in self.fields()]
+
+    def _columns(self, column_class, **kwargs):
+        from .utils.columnar import decode_pages
+
+        return decode_pages(
+            self.pages(), self._column_fields(), column_class, **kwargs
+        )
+
+    def to_numpy(self):
+        """
+        Returns the results as a dict of NumPy arrays (one per field),
+        decoded page by page into buffers typed from the dataset fields.
+
+        Numeric and boolean fields with null values are returned as
+        masked arrays. Requires NumPy.
+        """
+        from .utils.columnar import NumpyColumn
+
+        try:
+            capacity = len(self)
+        except TypeError:
+            capacity = 0
+        if capacity == float("inf"):
+            capacity = 0
+
+        columns = self._columns(NumpyColumn, capacity=int(capacity))
+        return dict((c.name, c.to_array()) for c in columns)
+
+    def to_arrow(self):
+        """
+        Returns the results as a pyarrow.Table, decoded page by page
+        into columns typed from the dataset fields. Requires PyArrow.
+        """
+        from .utils.columnar import ArrowColumn, _import_pyarrow
+
+        pa = _import_pyarrow()
+        columns = self._columns(ArrowColumn)
+        return pa.table(
+            [c.to_array() for c in columns], names=[c.name for c in columns]
+        )
+
+    def to_pandas(self):
+        """
+        Returns the results as a pandas.DataFrame.
+
+        Uses PyArrow when it is installed and NumPy otherwise.
+        """
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError(
+                "pandas is required for DataFrame query results: pip install pandas"
+            )
+
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return pandas.DataFrame(self.to_numpy())
+
+        return self.to_arrow().to_pandas()
+
+    def stream_to(self, path, format="ndjson", max_pages=4, batch_pages=1):
+        """
+        Writes the results to a local file while they are fetched,
+        keeping at most `max_pages` pages in memory.
+
+        :Parameters:
+          - `path`: The output file path (NDJSON and CSV files are
+                    gzipped if the path ends in .gz).
+          - `format` (optional): One of "ndjson", "csv" or "parquet"
+                                 (requires PyArrow).
+          - `max_pages` (optional): Number of fetched pages that can wait
+                                    to be written (default 4).
+          - `batch_pages` (optional): Number of pages written in one go.
+                                      For Parquet, each batch is one row group.
+
+        The CSV header and the Parquet schema are set by the first batch:
+        a later record with a key that is not in them, or (for Parquet)
+        values that do not fit the column types, raise a ValueError.
+
+        :Returns:
+          The number of records written.
+        """
+        from .utils.streaming import STREAM_FORMATS, WRITERS, stream_pages
+
+        if format not in STREAM_FORMATS:
+            raise Exception(
+                "'format' parameter must be one of: {}".format(
+                    ", ".join(STREAM_FORMATS)
+                )
+            )
+        if max_pages < 1 or batch_pages < 1:
+            raise Exception(
+                "'max_pages' and 'batch_pages' parameters must be >= 1"
+            )
+
+        writer = WRITERS[format](path, self._column_fields())
+        try:
+            count = stream_pages(
+                self.pages(), writer, max_pages=max_pages, batch_pages=batch_pages
+            )
+        except BaseException:
+            # An error of close() must not replace the original one
+            try:
+                writer.close()
+            except Exception:
+                logger.warning("Could not close {}".format(path), exc_info=True)
+            raise
+        writer.close()
+
+        logger.info("Wrote {} records to {}".format(count, path))
+        return count
+
     def export(self, format="json", follow=True, limit=None, **kwargs):
         from quartzbio import DatasetExport
 
@@ -2,7 +2,6 @@
 from urllib.parse import unquote
 
 import os
-import requests
 import tempfile
 import shutil
 
@@ -14,9 +13,12 @@ except ImportError:
 from ..client import client, _handle_api_error, _handle_request_error
 from ..utils.tabulate import tabulate
 from ..utils.printing import pager
+from ..utils.download import RESUMABLE_DOWNLOAD_MIN_SIZE, ranged_download, verify_md5
+from ..utils.throttle import throttle
 
 # from quartzbio.errors import NotFoundError
 from ..errors import NotFoundError
+from ..errors import FileDownloadError
 
 from .util import class_to_api_name
 from .quartzbio_object import QuartzBioObject, convert_to_quartzbio_object
@@ -187,8 +189,23 @@ class DownloadableAPIResource(APIResource):
         Download the file to the specified directory or file path.
         Downloads to a temporary directory if no path is specified.
 
+        Set `num_connections` to download large files with parallel range
+        requests, and `verify_md5` to check the downloaded file against
+        the MD5 of the object.
+
+        Files of at least 64 MB (and any file with `resume=True`) are
+        written to `<path>.part` until they are complete, and interrupted
+        downloads are resumed from the byte ranges already written.
+        Set `resume=False` to always download files in one go.
+
+        The download shares the bandwidth limit of the client, if any
+        (see QuartzBioClient.set_rate_limit).
+
         Returns the absolute path to the file.
         """
+        num_connections = kwargs.pop("num_connections", 1)
+        check_md5 = kwargs.pop("verify_md5", False)
+        resume = kwargs.pop("resume", None)
         download_url = self.download_url(**kwargs)
         try:
             # For vault objects, use the object's filename
@@ -210,23 +227,52 @@ class DownloadableAPIResource(APIResource):
             # Create a temporary directory for the file
             path = os.path.join(tempfile.gettempdir(), filename)
 
+        _client = self._client or client
+        md5 = self.get("md5") if check_md5 else None
+        if resume is None:
+            resume = (self.get("size") or 0) >= RESUMABLE_DOWNLOAD_MIN_SIZE
+        # Empty files have no byte ranges to request
+        if (resume or num_connections > 1) and self.get("size") != 0:
+            return ranged_download(
+                _client.transfer_session,
+                download_url,
+                path,
+                num_connections=num_connections,
+                md5=md5,
+                resume=resume,
+                rate_limiter=_client.rate_limiter,
+            )
+
         try:
             # use streaming to prevent automatic decompression
-            response = requests.request(method='get', url=download_url, stream=True)
+            response = _client.transfer_session.get(download_url, stream=True)
         except Exception as e:
             _handle_request_error(e)
 
-        if not (200 <= response.status_code < 400):
-            _handle_api_error(response)
+        # Closing the response returns the connection to the pool
+        with response:
+            if not (200 <= response.status_code < 400):
+                _handle_api_error(response)
 
-        with open(path, "wb") as fileobj:
-            if filename.endswith('.gz'):
-                # Don't automatically decompress gzipped files
-                shutil.copyfileobj(response.raw, fileobj)
-            else:
-                for chunk in response.iter_content(chunk_size=1024 * 8):
-                    if chunk:
-                        fileobj.write(chunk)
+            with open(path, "wb") as fileobj:
+                if filename.endswith('.gz'):
+                    # Don't automatically decompress gzipped files
+                    shutil.copyfileobj(
+                        throttle(response.raw, _client.rate_limiter), fileobj
+                    )
+                else:
+                    for chunk in response.iter_content(chunk_size=1024 * 8):
+                        if chunk:
+                            if _client.rate_limiter:
+                                _client.rate_limiter.consume(len(chunk))
+                            fileobj.write(chunk)
+
+        if md5:
+            try:
+                verify_md5(path, md5)
+            except FileDownloadError:
+                os.remove(path)
+                raise
 
         return path
 
@@ -266,8 +312,19 @@ class ListableAPIResource(APIResource):
     @classmethod
     def _retrieve_helper(cls, model_name, field_name, error_value, **params):
         _client = params.pop("client", None) or cls._client or client
+        # Lookups by path can be served by the path cache of the client
+        cached = params.pop("cached", False)
         url = cls.class_url()
-        response = _client.get(url, params)
+        if cached:
+            response = _client.path_cache.get(
+                model_name,
+                (url, repr(sorted(params.items()))),
+                lambda: _client.get(url, params),
+                # Not found is not cached, as the path may be created elsewhere
+                cache_if=lambda response: bool(response.get("data")),
+            )
+        else:
+            response = _client.get(url, params)
         results = convert_to_quartzbio_object(response, client=_client)
         objects = results.data
         allow_multiple = params.pop("allow_multiple", None)
@@ -44,7 +44,7 @@ class Dataset(
         _client = kwargs.pop("client", None) or cls._client or client
 
         try:
-            user = _client.get("/v1/user", {})
+            user = _client.get_user()
             domain = user["account"]["domain"]
         except QuartzBioError as e:
             print("Error obtaining account domain: {0}".format(e))
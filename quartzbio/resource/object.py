@@ -7,16 +7,20 @@ import binascii
 import mimetypes
 import sys
 import time
+from contextlib import nullcontext
 from datetime import datetime
 
-import requests
-from urllib3.util.retry import Retry
-
 from quartzbio.errors import QuartzBioError
 from quartzbio.errors import NotFoundError
 from quartzbio.errors import FileUploadError
+from quartzbio.utils.adaptive_concurrency import AdaptiveConcurrency
+from quartzbio.utils.adaptive_concurrency import THROTTLE_STATUS_CODES
 from quartzbio.utils.md5sum import md5sum
+from quartzbio.utils.sync_index import get_sync_index
+from quartzbio.utils.throttle import throttle
+from quartzbio.utils.files import FileSlice
 from quartzbio.utils.files import separate_filename_extension
+from quartzbio.utils.upload_state import UploadState
 
 from ..client import client
 
@@ -30,6 +34,22 @@ from .apiresource import DeletableAPIResource
 from .apiresource import DownloadableAPIResource
 
 
+# Minimum size of the parts of a multipart upload (except the last one),
+# and maximum number of parts
+MIN_PART_SIZE = 5 * 1024 * 1024
+MAX_PARTS = 10000
+
+
+class _NoLimit(object):
+    """A TransferLimiter without limits"""
+
+    def transfer(self, nbytes=0):
+        return nullcontext()
+
+
+_NO_LIMIT = _NoLimit()
+
+
 class UploadProgressTracker:
     """Simple progress tracking for multipart uploads."""
 
@@ -237,7 +257,7 @@ class Object(
     def get_by_path(cls, path, **params):
         assert_type = params.pop("assert_type", None)
         params.update({"path": path})
-        obj = cls._retrieve_helper("object", "path", path, **params)
+        obj = cls._retrieve_helper("object", "path", path, cached=True, **params)
         if obj and assert_type and obj["object_type"] != assert_type:
             raise QuartzBioError(
                 "Expected a {} but found a {} at {}".format(
@@ -254,7 +274,9 @@ class Object(
         full_path, _ = cls.validate_full_path(full_path, client=_client)
         assert_type = params.pop("assert_type", None)
         params.update({"full_path": full_path})
-        obj = cls._retrieve_helper("object", "full_path", full_path, **params)
+        obj = cls._retrieve_helper(
+            "object", "full_path", full_path, cached=True, **params
+        )
         if obj and assert_type and obj["object_type"] != assert_type:
             raise QuartzBioError(
                 "Expected a {} but found a {} at {}".format(
@@ -433,6 +455,8 @@ class Object(
             vault (:class:`~quartzbio.resources.vault.Vault`): A Vault object.
             full_path (str): Full path including vault name.
             tags (list[str]): List of tags to put on folder.
+            parent_object_id (int): ID of the parent folder (None for the
+                vault root), if known, to avoid looking it up.
             client: QuartzBio client configuration to use.
         Returns:
             Object: New folder object
@@ -455,7 +479,9 @@ class Object(
                 )
         except NotFoundError:
             # Create the folder
-            if path_dict["parent_path"] == "/":
+            if "parent_object_id" in kwargs:
+                parent_object_id = kwargs["parent_object_id"]
+            elif path_dict["parent_path"] == "/":
                 parent_object_id = None
             else:
                 parent = Object.get_by_full_path(
@@ -532,13 +558,24 @@ class Object(
             vault_full_path (str): Full path of the target vault
             **kwargs: Additional options:
                 multipart_threshold (int): File size threshold for multipart upload (default: 64MB)
-                multipart_chunksize (int): Size of each upload part (default: 64MB)
+                multipart_chunksize (int): Size of each upload part (default: the
+                    part size chosen by the server)
                 num_processes (int): Number of parallel workers for multipart upload (default: 1)
+                adaptive (bool): Adapt the number of parts uploaded at once to the
+                    measured throughput, up to num_processes
                 max_retries (int): Maximum retries per part for multipart upload (default: 3)
                 archive_folder (str): Archive existing files to this folder before upload
                 follow_shortcuts (bool): Follow shortcuts when uploading
                 description (str): Description for the uploaded file
                 tags (list): Tags to apply to the uploaded file
+                resumable (bool): Save the progress of multipart uploads to a local
+                    state file, keep the partial upload on failure, and resume it
+                    when the same file is uploaded to the same path again
+                state_dir (str): Directory of the resumable upload state files
+                    (default: ~/.quartzbio/uploads)
+                vault (Vault): The target vault, if already retrieved
+                parent_object_id (int): ID of the remote parent folder (None
+                    for the vault root), if known, to avoid looking it up
                 client: QuartzBio client instance to use
 
         Returns:
@@ -556,9 +593,10 @@ class Object(
         local_path = os.path.expanduser(local_path)
 
         # Get vault
-        vault = Vault.get_by_full_path(vault_full_path, client=_client)
+        vault = kwargs.get("vault") or Vault.get_by_full_path(
+            vault_full_path, client=_client
+        )
 
-        local_md5, _ = md5sum(local_path, None)
         # Get a mimetype of file
         mime_tuple = mimetypes.guess_type(local_path)
         # If a file is compressed get a compression type, otherwise a file type
@@ -569,7 +607,6 @@ class Object(
             print("WARNING: skipping empty object: {}".format(local_path))
             return False
 
-        # Check if object exists already and compare md5sums
         full_path, path_dict = Object.validate_full_path(
             os.path.join(
                 "{}:{}".format(vault.full_path, remote_path),
@@ -577,6 +614,28 @@ class Object(
             ),
             client=_client,
         )
+
+        upload_state = None
+        if kwargs.get("resumable"):
+            upload_state = UploadState.load(
+                local_path, full_path, state_dir=kwargs.get("state_dir")
+            )
+            if upload_state:
+                obj = cls._resume_multipart(
+                    upload_state, local_path, client=_client, **kwargs
+                )
+                if obj:
+                    return obj
+            upload_state = UploadState(
+                local_path, full_path, state_dir=kwargs.get("state_dir")
+            )
+
+        # Hash the file and its (default-sized) multipart parts in one pass,
+        # so the upload itself is the only other read of the file.
+        # The MD5 of an unchanged file comes from the local sync index.
+        local_md5, part_md5s = get_sync_index().multipart_md5sum(local_path)
+
+        # Check if object exists already and compare md5sums
         try:
             obj = cls.get_by_full_path(full_path, client=_client)
             if not obj.is_file:
@@ -614,7 +673,9 @@ class Object(
         else:
             vault_id = vault.id
             filename = os.path.basename(local_path)
-            if path_dict["parent_path"] == "/":
+            if "parent_object_id" in kwargs:
+                parent_object_id = kwargs["parent_object_id"]
+            elif path_dict["parent_path"] == "/":
                 parent_object_id = None
             else:
                 parent_obj = Object.get_by_full_path(
@@ -642,12 +703,27 @@ class Object(
 
         # Check if multipart upload is needed
         if hasattr(obj, "is_multipart") and obj.is_multipart:
-            return cls._upload_multipart(obj, local_path, local_md5, **kwargs)
+            if kwargs.get("multipart_chunksize"):
+                cls._request_part_size(
+                    obj, kwargs["multipart_chunksize"], client=_client
+                )
+            if upload_state:
+                upload_state.start(obj, local_md5)
+            return cls._upload_multipart(
+                obj,
+                local_path,
+                local_md5,
+                part_md5s=part_md5s,
+                upload_state=upload_state,
+                **kwargs
+            )
         else:
-            return cls._upload_single_file(obj, local_path, **kwargs)
+            return cls._upload_single_file(
+                obj, local_path, local_md5=local_md5, **kwargs
+            )
 
     @classmethod
-    def _upload_single_file(cls, obj, local_path, **kwargs):
+    def _upload_single_file(cls, obj, local_path, local_md5=None, **kwargs):
         """Handle single-part upload for smaller files"""
         import mimetypes
 
@@ -658,8 +734,9 @@ class Object(
         # Get file size
         size = os.path.getsize(local_path)
 
-        # Get MD5 for single part upload
-        local_md5, _ = md5sum(local_path, multipart_threshold=None)
+        # Get MD5 for single part upload (unless already computed)
+        if not local_md5:
+            local_md5, _ = md5sum(local_path, multipart_threshold=None)
 
         upload_url = obj.upload_url
 
@@ -669,40 +746,46 @@ class Object(
             "Content-Length": str(size),
         }
 
-        # Use a session with a retry policy to handle connection errors.
-        session = requests.Session()
+        # Use the client's shared session to reuse connections across files.
+        _client = obj._client or client
+        session = _client.transfer_session
         max_retries = 5
-        retry = Retry(
-            total=max_retries,
-            read=max_retries,
-            connect=max_retries,
-            backoff_factor=2,
-            status_forcelist=(500, 502, 503, 504, 400),
-            allowed_methods=["HEAD", "OPTIONS", "GET", "PUT", "POST"],
-        )
-        session.mount("https://", requests.adapters.HTTPAdapter(max_retries=retry))
+        retry_statuses = (500, 502, 503, 504, 400)
 
         # Handle retries when upload fails due to an exception such as SSLError
+        # or a retryable status code
+        # The file is streamed from disk: it only needs a transfer slot
+        limiter = kwargs.get("limiter") or _NO_LIMIT
+
         n_retries = 0
         while True:
             try:
-                upload_resp = session.put(
-                    upload_url, data=open(local_path, "rb"), headers=headers
-                )
+                with limiter.transfer(), open(local_path, "rb") as f:
+                    upload_resp = session.put(
+                        upload_url,
+                        data=throttle(f, _client.rate_limiter),
+                        headers=headers,
+                    )
             except Exception as e:
                 if n_retries == max_retries:
                     obj.delete(force=True)
                     raise FileUploadError(str(e))
+                error = e
+            else:
+                if (
+                    upload_resp.status_code not in retry_statuses
+                    or n_retries == max_retries
+                ):
+                    break
+                error = "status code {}".format(upload_resp.status_code)
 
-                n_retries += 1
-                print(
-                    "WARNING: Retrying ({}/{}) failed upload for {}: {}".format(
-                        n_retries, max_retries, local_path, e
-                    )
+            n_retries += 1
+            print(
+                "WARNING: Retrying ({}/{}) failed upload for {}: {}".format(
+                    n_retries, max_retries, local_path, error
                 )
-                time.sleep(2 * n_retries)
-            else:
-                break
+            )
+            time.sleep(2 * n_retries)
 
         if upload_resp.status_code != 200:
             print(
@@ -729,7 +812,8 @@ class Object(
             key (str): The upload key/identifier
             total_size (int): Total size of the file being uploaded
             part_numbers (list[int]): List of part numbers to refresh URLs for
-            **kwargs: Additional parameters including client
+            **kwargs: Additional parameters including client, and part_size
+                to ask for the URLs of parts of a different size
 
         Returns:
             list: List of presigned URL objects with part information
@@ -742,6 +826,8 @@ class Object(
             "total_size": total_size,
             "part_numbers": part_numbers,
         }
+        if kwargs.get("part_size"):
+            payload["part_size"] = kwargs["part_size"]
 
         try:
             response = _client.post("/v2/presigned_urls", payload)
@@ -755,39 +841,185 @@ class Object(
         except Exception as e:
             raise FileUploadError(f"Failed to refresh presigned URLs: {str(e)}")
 
+    @classmethod
+    def _request_part_size(cls, obj, part_size, **kwargs):
+        """Ask for the presigned URLs of parts of part_size bytes.
+
+        The new layout replaces obj.presigned_urls only if it covers the
+        whole file; otherwise the server's layout is kept. Returns True
+        if the part size was changed.
+        """
+        layout = sorted(obj.presigned_urls, key=lambda p: p["part_number"])
+        if part_size < MIN_PART_SIZE or all(p["size"] == part_size for p in layout[:-1]):
+            return False
+
+        num_parts = -(-obj.size // part_size)
+        if num_parts > MAX_PARTS:
+            return False
+
+        try:
+            presigned_urls = cls.refresh_presigned_urls(
+                upload_id=obj.upload_id,
+                key=obj.upload_key,
+                total_size=obj.size,
+                part_numbers=list(range(1, num_parts + 1)),
+                part_size=part_size,
+                **kwargs
+            )
+        except FileUploadError as e:
+            print("WARNING: Could not change the part size: {}".format(e))
+            return False
+
+        presigned_urls = sorted(presigned_urls, key=lambda p: p["part_number"])
+        offset = 0
+        for part_number, part in enumerate(presigned_urls, 1):
+            if (
+                part["part_number"] != part_number
+                or part.get("start_byte") != offset
+                or not part.get("size")
+            ):
+                break
+            offset += part["size"]
+
+        if offset != obj.size:
+            print(
+                "WARNING: Parts of {} bytes are not supported, using the "
+                "default part size".format(part_size)
+            )
+            return False
+
+        obj.presigned_urls = presigned_urls
+        return True
+
+    @classmethod
+    def _resume_multipart(cls, upload_state, local_path, **kwargs):
+        """Resume an interrupted multipart upload from its saved state.
+
+        Returns the uploaded object, or None if the upload cannot be resumed
+        (in which case the partial upload is discarded).
+        """
+        from quartzbio import Object
+
+        _client = kwargs.get("client") or cls._client or client
+        missing = upload_state.missing_parts()
+        print(
+            "Notice: Resuming upload of {} to {} ({} of {} parts remaining)".format(
+                local_path,
+                upload_state.full_path,
+                len(missing),
+                len(upload_state.layout),
+            )
+        )
+
+        try:
+            obj = Object.retrieve(upload_state.object_id, client=_client)
+        except NotFoundError:
+            print(
+                "WARNING: The partial upload of {} no longer exists, "
+                "starting over".format(local_path)
+            )
+            upload_state.delete()
+            return None
+
+        # Only the response that created the upload has these
+        obj.upload_id = upload_state.upload_id
+        obj.upload_key = upload_state.upload_key
+
+        # Presigned URLs expire, so get fresh ones for the missing parts only
+        presigned_urls = []
+        if missing:
+            try:
+                presigned_urls = cls.refresh_presigned_urls(
+                    upload_id=upload_state.upload_id,
+                    key=upload_state.upload_key,
+                    total_size=upload_state.size,
+                    part_numbers=[p[0] for p in missing],
+                    client=_client,
+                )
+            except FileUploadError as e:
+                raise FileUploadError(
+                    "Could not resume upload of {}: {}. To start over, "
+                    "delete {} and {}".format(
+                        local_path, e, obj.full_path, upload_state.path
+                    )
+                )
+
+        urls = dict((p["part_number"], p["upload_url"]) for p in presigned_urls)
+        parts = [
+            {
+                "part_number": part_number,
+                "start_byte": start_byte,
+                "size": size,
+                "upload_url": urls.get(part_number),
+            }
+            for part_number, start_byte, size in missing
+        ]
+        return cls._upload_multipart(
+            obj,
+            local_path,
+            upload_state.md5,
+            presigned_urls=parts,
+            upload_state=upload_state,
+            **kwargs
+        )
+
     @classmethod
     def _upload_multipart(cls, obj, local_path, local_md5, **kwargs):
         """Enhanced multipart upload with parallel parts and presigned URL refresh"""
         _client = kwargs.get("client") or cls._client or client
         num_processes = kwargs.get("num_processes", 1)
         max_retries = kwargs.get("max_retries", 3)
+        adaptive = kwargs.get("adaptive") and num_processes > 1
+        # Part MD5s from multipart_md5sum(), keyed by (start_byte, size)
+        part_md5s = kwargs.get("part_md5s") or {}
+        # Saves the uploaded parts if the upload is resumable
+        upload_state = kwargs.get("upload_state")
 
         try:
-            # Get initial presigned URLs
-            presigned_urls = obj.presigned_urls
+            # Get initial presigned URLs (only the missing parts when resuming)
+            presigned_urls = kwargs.get("presigned_urls") or obj.presigned_urls
             total_parts = len(presigned_urls)
 
-            print(
-                f"Starting multipart upload with {total_parts} parts using {num_processes} worker(s)..."
-            )
+            if adaptive:
+                print(
+                    f"Starting multipart upload with {total_parts} parts using up to {num_processes} worker(s)..."
+                )
+            else:
+                print(
+                    f"Starting multipart upload with {total_parts} parts using {num_processes} worker(s)..."
+                )
 
             # Initialize progress tracker
-            progress_tracker = UploadProgressTracker(total_parts, obj.size)
+            progress_tracker = UploadProgressTracker(
+                total_parts, sum(p["size"] for p in presigned_urls)
+            )
+            # Adapts the number of parts in flight to the measured throughput
+            concurrency = (
+                AdaptiveConcurrency(progress_tracker, num_processes)
+                if adaptive
+                else None
+            )
 
             # Prepare part upload tasks
             part_tasks = []
             for i, part_info in enumerate(presigned_urls):
                 part_tasks.append(
                     {
-                        "part_number": part_info.part_number,
-                        "start_byte": part_info.start_byte,
-                        "end_byte": part_info.end_byte,
-                        "part_size": part_info.size,
-                        "upload_url": part_info.upload_url,
+                        "part_number": part_info["part_number"],
+                        "start_byte": part_info["start_byte"],
+                        "part_size": part_info["size"],
+                        "upload_url": part_info["upload_url"],
                         "part_index": i,
                         "max_retries": max_retries,
                         "upload_id": obj.upload_id,
                         "upload_key": obj.upload_key,
+                        # Only set if the part layout matches the hashed parts
+                        "md5": part_md5s.get(
+                            (part_info["start_byte"], part_info["size"])
+                        ),
+                        "upload_state": upload_state,
+                        "limiter": kwargs.get("limiter"),
+                        "concurrency": concurrency,
                     }
                 )
 
@@ -800,22 +1032,49 @@ class Object(
                     _client,
                     num_processes,
                     progress_tracker,
+                    concurrency=concurrency,
                 )
             else:
                 parts = cls._upload_parts_sequential(
                     local_path, part_tasks, obj, _client, progress_tracker
                 )
 
+            if upload_state:
+                # Include the parts uploaded before the upload was resumed
+                parts = [
+                    {"part_number": part_number, "etag": etag}
+                    for part_number, etag in sorted(upload_state.parts.items())
+                ]
+
             # Complete multipart upload
-            return cls._complete_multipart_upload(obj, parts, _client, local_path)
+            obj = cls._complete_multipart_upload(obj, parts, _client, local_path)
 
         except Exception as e:
+            if upload_state:
+                upload_state.save()
+                raise FileUploadError(
+                    "Multipart upload failed: {}. Upload the file again to "
+                    "resume ({} of {} parts uploaded).".format(
+                        str(e), len(upload_state.parts), len(upload_state.layout)
+                    )
+                )
             obj.delete(force=True)
             raise FileUploadError("Multipart upload failed: {}".format(str(e)))
 
+        if upload_state:
+            upload_state.delete()
+        return obj
+
     @classmethod
     def _upload_parts_parallel(
-        cls, local_path, part_tasks, obj, _client, num_processes, progress_tracker
+        cls,
+        local_path,
+        part_tasks,
+        obj,
+        _client,
+        num_processes,
+        progress_tracker,
+        concurrency=None,
     ):
         """Upload parts in parallel using ThreadPoolExecutor"""
 
@@ -829,6 +1088,7 @@ class Object(
             parts,
             progress_tracker,
             num_processes,
+            concurrency,
         )
 
         # Retry failed parts
@@ -844,6 +1104,7 @@ class Object(
                 parts,
                 progress_tracker,
                 num_processes,
+                concurrency,
             )
             if retry_failed:
                 raise Exception(
@@ -862,44 +1123,61 @@ class Object(
         parts,
         progress_tracker,
         num_processes,
+        concurrency=None,
     ):
-        """Common method for uploading parts with ThreadPoolExecutor"""
-        from concurrent.futures import ThreadPoolExecutor, as_completed
+        """Common method for uploading parts with ThreadPoolExecutor.
+
+        Parts are submitted as others complete, keeping up to num_processes
+        (or the current limit of the adaptive concurrency) in flight.
+        """
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
         failed_parts = []
+        pending_tasks = iter(enumerate(part_tasks))
 
         with ThreadPoolExecutor(max_workers=num_processes) as executor:
-            # Submit all part upload tasks with worker assignment
             future_to_part = {}
-            for i, task in enumerate(part_tasks):
-                # Assign worker ID to task
-                task["worker_id"] = f"Worker-{i % num_processes + 1}"
-                future_to_part[
-                    executor.submit(
-                        cls._upload_single_part,
-                        local_path,
-                        task,
-                        obj,
-                        _client,
-                        progress_tracker,
-                    )
-                ] = task
+            while True:
+                limit = concurrency.limit if concurrency else num_processes
+                while len(future_to_part) < limit:
+                    next_task = next(pending_tasks, None)
+                    if next_task is None:
+                        break
+                    i, task = next_task
+                    # Assign worker ID to task
+                    task["worker_id"] = f"Worker-{i % num_processes + 1}"
+                    future_to_part[
+                        executor.submit(
+                            cls._upload_single_part,
+                            local_path,
+                            task,
+                            obj,
+                            _client,
+                            progress_tracker,
+                        )
+                    ] = task
 
-            # Collect results as they complete
-            for future in as_completed(future_to_part):
-                task = future_to_part[future]
-                try:
-                    part_result = future.result()
-                    parts[task["part_index"]] = part_result
-                    # Update progress with part size
-                    progress_tracker.update_progress(task["part_size"])
-                except Exception as e:
-                    # Notify progress tracker about error and print error message
-                    progress_tracker.notify_error()
-                    print(
-                        f"ERROR: {task['worker_id']} failed part {task['part_number']}: {e}"
-                    )
-                    failed_parts.append(task)
+                if not future_to_part:
+                    break
+
+                # Collect results as they complete
+                done, _ = wait(future_to_part, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = future_to_part.pop(future)
+                    try:
+                        part_result = future.result()
+                        parts[task["part_index"]] = part_result
+                        # Update progress with part size
+                        progress_tracker.update_progress(task["part_size"])
+                        if concurrency:
+                            concurrency.part_completed()
+                    except Exception as e:
+                        # Notify progress tracker about error and print error message
+                        progress_tracker.notify_error()
+                        print(
+                            f"ERROR: {task['worker_id']} failed part {task['part_number']}: {e}"
+                        )
+                        failed_parts.append(task)
 
         return failed_parts
 
@@ -961,6 +1239,7 @@ class Object(
         upload_id = task["upload_id"]
         upload_key = task["upload_key"]
         worker_id = task.get("worker_id", "Sequential worker")
+        limiter = task.get("limiter") or _NO_LIMIT
 
         for attempt in range(max_retries):
             try:
@@ -981,49 +1260,59 @@ class Object(
                 else:
                     upload_url = task["upload_url"]
 
-                # Read part data
-                if file_handle:
-                    # Use provided file handle (sequential mode)
-                    file_handle.seek(start_byte)
-                    chunk_data = file_handle.read(part_size)
-                else:
-                    # Open file for this part (parallel mode)
-                    with open(local_path, "rb") as f:
-                        f.seek(start_byte)
-                        chunk_data = f.read(part_size)
-
-                if not chunk_data:
-                    break
-
-                # Upload without requests-level retry (let our custom retry handle it)
-                session = requests.Session()
-
-                headers = {"Content-Length": str(len(chunk_data))}
-
-                # Calculate timeout based on part size
-                part_size_mb = len(chunk_data) / (1024 * 1024)
-                # Timeout scaling for large parts
-                # Formula: 20min base + 30s per MB to handle very large parts
-                # This ensures adequate timeout even with slow connections
-                base_timeout = 1200  # 20 minutes base
-                scaling_factor = 30  # 30 seconds per 1MB
-                total_timeout = base_timeout + part_size_mb * scaling_factor
-
-                upload_resp = session.put(
-                    upload_url,
-                    data=chunk_data,
-                    headers=headers,
-                    timeout=total_timeout,
-                )
+                # Wait for a transfer slot and room for the part in the
+                # bytes in flight (shared with the other uploads of a
+                # threaded upload). The part is streamed from disk, and
+                # read again from disk if it is retried.
+                with limiter.transfer(part_size), FileSlice(
+                    local_path, start_byte, part_size, fileobj=file_handle
+                ) as part_data:
+                    if not len(part_data):
+                        break
+
+                    # Upload without requests-level retry (let our custom retry handle it),
+                    # reusing the pooled connections of the client
+                    session = _client.transfer_session
+
+                    headers = {"Content-Length": str(len(part_data))}
+                    if task.get("md5") and len(part_data) == part_size:
+                        # Let storage reject the part if the file changed since it was hashed
+                        headers["Content-MD5"] = base64.b64encode(
+                            binascii.unhexlify(task["md5"])
+                        )
 
-                if upload_resp.status_code == 200:
-                    etag = upload_resp.headers.get("ETag", "").strip('"')
-                    return {"part_number": part_number, "etag": etag}
-                else:
-                    raise FileUploadError(
-                        f"{worker_id} failed part {part_number}: {upload_resp.status_code} - {upload_resp.content}"
+                    # Calculate timeout based on part size
+                    part_size_mb = len(part_data) / (1024 * 1024)
+                    # Timeout scaling for large parts
+                    # Formula: 20min base + 30s per MB to handle very large parts
+                    # This ensures adequate timeout even with slow connections
+                    base_timeout = 1200  # 20 minutes base
+                    scaling_factor = 30  # 30 seconds per 1MB
+                    total_timeout = base_timeout + part_size_mb * scaling_factor
+
+                    upload_resp = session.put(
+                        upload_url,
+                        data=throttle(part_data, _client.rate_limiter),
+                        headers=headers,
+                        timeout=total_timeout,
                     )
 
+                    if upload_resp.status_code == 200:
+                        etag = upload_resp.headers.get("ETag", "").strip('"')
+                        if task.get("upload_state"):
+                            task["upload_state"].add_part(part_number, etag)
+                        return {"part_number": part_number, "etag": etag}
+                    else:
+                        if (
+                            upload_resp.status_code in THROTTLE_STATUS_CODES
+                            and task.get("concurrency")
+                        ):
+                            # Upload fewer parts at once
+                            task["concurrency"].throttled()
+                        raise FileUploadError(
+                            f"{worker_id} failed part {part_number}: {upload_resp.status_code} - {upload_resp.content}"
+                        )
+
             except Exception as e:
                 if attempt == max_retries - 1:  # Last attempt
                     raise FileUploadError(
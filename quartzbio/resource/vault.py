@@ -108,7 +108,7 @@ class Vault(
 
         # If any values are None, set defaults from the user.
         if None in path_parts.values():
-            user = _client.get("/v1/user", {})
+            user = _client.get_user()
             defaults = {
                 "domain": user["account"]["domain"],
                 "vault": "user-{0}".format(user["id"]),
@@ -207,6 +207,7 @@ class Vault(
             full_path,
             account_domain=parts["domain"],
             name=parts["vault"],
+            cached=True,
             client=_client,
         )
 
@@ -228,7 +229,7 @@ class Vault(
     @classmethod
     def get_personal_vault(cls, **kwargs):
         _client = kwargs.pop("client", None) or cls._client or client
-        user = _client.get("/v1/user", {})
+        user = _client.get_user()
         # TODO - this will have to change if the format of the personal vaults
         # changes.
         name = "user-{0}".format(user["id"])
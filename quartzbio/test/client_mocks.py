@@ -283,3 +283,43 @@ def fake_migration_create(*args, **kwargs):
 
 def fake_export_create(*args, **kwargs):
     return FakeExportResponse(kwargs).create()
+
+
+class FakeDataClient(object):
+    """Serves the dataset query endpoint from a list of in-memory records"""
+
+    def __init__(self, records):
+        self.records = records
+        self.requests = []
+
+    def post(self, url, data, **kwargs):
+        self.requests.append(data)
+        records = [r for r in self.records if self._match(r, data.get("filters"))]
+        for field in reversed(data.get("ordering") or []):
+            records.sort(key=lambda r: r[field.lstrip("-")], reverse=field[0] == "-")
+
+        offset = data.get("offset", 0)
+        limit = data.get("limit", 100)
+        return {
+            "results": records[offset:offset + limit],
+            "total": len(records),
+            "took": 1,
+        }
+
+    def _match(self, record, filters):
+        """Supports exact, __gt and __lt filters combined with AND"""
+        for f in filters or []:
+            if isinstance(f, dict):
+                if not self._match(record, f["and"]):
+                    return False
+                continue
+
+            key, value = f
+            field, _, op = key.partition("__")
+            if op == "gt" and not record[field] > value:
+                return False
+            if op == "lt" and not record[field] < value:
+                return False
+            if not op and record[field] != value:
+                return False
+        return True
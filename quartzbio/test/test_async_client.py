@@ -0,0 +1,176 @@
+import asyncio
+import json
+import unittest
+
+import mock
+
+from quartzbio import AsyncQuartzBioClient, QuartzBioError
+from quartzbio.errors import NotFoundError
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.url = "https://api.example.com/"
+        self.headers = headers or {}
+        self.content = json.dumps(body if body is not None else {}).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncClientTest(unittest.TestCase):
+    """Test the async client (no API access required)"""
+
+    def setUp(self):
+        self.client = AsyncQuartzBioClient(
+            host="https://api.example.com", token="abc"
+        )
+        self.sent = []
+        self.responses = []
+
+        async def _send(method, url, headers, params, data, timeout):
+            self.sent.append((method, url, params, json.loads(data)))
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        async def _sleep(delay):
+            self.sleeps.append(delay)
+
+        self.sleeps = []
+        patchers = [
+            mock.patch.object(self.client, "_send", _send),
+            mock.patch("quartzbio.async_client.asyncio.sleep", _sleep),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_request(self):
+        self.responses = [FakeResponse(body={"id": 1})]
+        response = self.run_async(self.client.get("/v1/user", {"a": [1, 2]}))
+        self.assertEqual(response, {"id": 1})
+        self.assertEqual(
+            self.sent, [("GET", "https://api.example.com/v1/user", [("a", "1"), ("a", "2")], {})]
+        )
+
+    def test_too_many_requests(self):
+        self.responses = [
+            FakeResponse(429, headers={"retry-after": "3"}),
+            FakeResponse(body={"id": 1}),
+        ]
+        response = self.run_async(self.client.post("/v2/objects", {"a": 1}))
+        self.assertEqual(response, {"id": 1})
+        # The pause is shared by the client, and waited for before the retry
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertAlmostEqual(self.sleeps[0], 4, places=1)
+        self.assertEqual(len(self.sent), 2)
+        self.assertIs(self.client.sync_client.request_limiter, self.client.request_limiter)
+
+    def test_too_many_requests_limit(self):
+        self.client.request_limiter.max_retries = 2
+        self.responses = [FakeResponse(429, headers={"retry-after": "0"})] * 3
+        with self.assertRaises(QuartzBioError) as ctx:
+            self.run_async(self.client.get("/v1/user", {}))
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertEqual(len(self.sent), 3)
+
+    def test_retries(self):
+        # GET requests are retried on 502/503/504 and connection errors
+        self.responses = [
+            FakeResponse(503),
+            ConnectionError("reset"),
+            FakeResponse(body={"id": 1}),
+        ]
+        self.assertEqual(self.run_async(self.client.get("/v1/user", {})), {"id": 1})
+        self.assertEqual(self.sleeps, [0, 4])
+
+        # POST requests are not (unless retry_all is set)
+        self.responses = [FakeResponse(503)]
+        with self.assertRaises(QuartzBioError) as ctx:
+            self.run_async(self.client.post("/v2/objects", {}))
+        self.assertEqual(ctx.exception.status_code, 503)
+
+        self.responses = [ConnectionError("reset")]
+        with self.assertRaises(QuartzBioError):
+            self.run_async(self.client.post("/v2/objects", {}))
+
+    def test_api_error(self):
+        self.responses = [FakeResponse(404, body={"detail": "Not found"})]
+        with self.assertRaises(QuartzBioError) as ctx:
+            self.run_async(self.client.get("/v2/objects/1", {}))
+        self.assertEqual(ctx.exception.status_code, 404)
+
+    def test_retrieve_object(self):
+        self.responses = [FakeResponse(body={"id": 1, "class_name": "Object"})]
+        obj = self.run_async(self.client.retrieve_object(1))
+        self.assertEqual(obj.id, 1)
+        self.assertEqual(self.sent[0][1], "https://api.example.com/v2/objects/1")
+        self.assertIs(obj._client, self.client.sync_client)
+
+    def test_get_object_by_full_path(self):
+        user = {"id": 5, "account": {"domain": "acme"}}
+        found = {"data": [{"id": 1, "class_name": "Object", "object_type": "file"}]}
+        self.responses = [
+            FakeResponse(body=user),
+            FakeResponse(body=found),
+            FakeResponse(body={"data": []}),
+        ]
+        obj = self.run_async(self.client.get_object_by_full_path("~/a/b.txt"))
+        self.assertEqual(obj.id, 1)
+        self.assertIn(("full_path", "acme:user-5:/a/b.txt"), self.sent[1][2])
+
+        # The user is cached
+        with self.assertRaises(NotFoundError):
+            self.run_async(self.client.get_object_by_full_path("~/c.txt"))
+        self.assertEqual(len(self.sent), 3)
+
+    def test_follow_task(self):
+        task = {"id": 3, "class_name": "Task"}
+        self.responses = [
+            FakeResponse(body=dict(task, status="queued")),
+            FakeResponse(body=dict(task, status="running")),
+            FakeResponse(body=dict(task, status="completed")),
+        ]
+        task = self.run_async(self.client.follow_task(3, sleep_seconds=1))
+        self.assertEqual(task.status, "completed")
+        self.assertEqual(self.sleeps, [1, 1])
+
+    def test_query(self):
+        records = [{"_id": i} for i in range(25)]
+
+        async def _send(method, url, headers, params, data, timeout):
+            data = json.loads(data)
+            self.sent.append(data)
+            results = records[data["offset"]:data["offset"] + data["limit"]]
+            return FakeResponse(body={"results": results, "total": len(records)})
+
+        async def _collect(query):
+            return [record async for record in query]
+
+        with mock.patch.object(self.client, "_send", _send):
+            query = self.client.query(1, page_size=10)
+            self.assertEqual(self.run_async(_collect(query)), records)
+            self.assertEqual([d["offset"] for d in self.sent], [0, 10, 20])
+
+            query = self.client.query(1, page_size=10, limit=15).filter(a=1)
+            self.assertEqual(self.run_async(_collect(query)), records[:15])
+            self.assertEqual(self.sent[-1]["limit"], 5)
+            self.assertEqual(self.sent[-1]["filters"], [["a", 1]])
+
+            # Records are instances of result_class
+            class Record(dict):
+                pass
+
+            query = self.client.query(1, page_size=10, limit=15, result_class=Record)
+            results = self.run_async(_collect(query))
+            self.assertEqual(results, records[:15])
+            self.assertTrue(all(isinstance(r, Record) for r in results))
+            # ...including after filter()
+            results = self.run_async(_collect(query.filter(a=1)))
+            self.assertTrue(all(isinstance(r, Record) for r in results))
@@ -1,5 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import mock
+
+from quartzbio.client import QuartzBioClient, DEFAULT_POOL_MAXSIZE
+from quartzbio.errors import NotFoundError, QuartzBioError
+
 from .helper import QuartzBioTestCase
 
 
@@ -33,3 +44,313 @@ class TestClient(QuartzBioTestCase):
             cls = getattr(self.client, r, None)
             self.assertTrue(cls)
             self.assertEqual(self.client, cls._client)
+
+
+class TestClientLazyResources(unittest.TestCase):
+    """Test the binding of resources to clients (no API access required)"""
+
+    def make_client(self, **kwargs):
+        return QuartzBioClient(host="https://api.example.com", token="abc", **kwargs)
+
+    def test_lazy_resources(self):
+        import quartzbio
+
+        client = self.make_client()
+        # Resources are bound on first access
+        self.assertNotIn("Object", vars(client))
+        Object = client.Object
+        self.assertIn("Object", vars(client))
+        self.assertTrue(issubclass(Object, quartzbio.Object))
+        self.assertIs(Object._client, client)
+        # ...once per client
+        self.assertIs(client.Object, Object)
+        self.assertIsNot(self.make_client().Object, Object)
+
+        self.assertIn("Vault", dir(client))
+        self.assertNotIn("QuartzBioClient", dir(client))
+        for name in ["QuartzBioClient", "login", "Missing", "_private"]:
+            with self.assertRaises(AttributeError):
+                getattr(client, name)
+
+        client = self.make_client(include_resources=False)
+        with self.assertRaises(AttributeError):
+            client.Object
+        self.assertNotIn("Object", dir(client))
+
+
+class TestLazyImport(unittest.TestCase):
+    SCRIPT = """
+import os, sys
+import quartzbio
+print(sorted(
+    name for name in ("requests", "urllib3", "quartzbio.client", "quartzbio.resource")
+    if name in sys.modules
+))
+print(os.path.exists(os.path.join(os.path.expanduser("~"), ".quartzbio")))
+print(type(quartzbio.client).__name__, quartzbio.Object.__name__)
+"""
+
+    CLIENT_SCRIPT = """
+import copy, sys
+from quartzbio.client import QuartzBioClient
+client = QuartzBioClient(host="https://api.example.com", token="abc")
+print(hasattr(client, "resource"), hasattr(client, "__deepcopy__"), hasattr(client, "Missing"))
+copy.copy(client)
+print("quartzbio.resource" in sys.modules)
+"""
+
+    def run_script(self, script):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        with tempfile.TemporaryDirectory() as home:
+            env = dict(os.environ, HOME=home, PYTHONPATH=root)
+            for name in list(env):
+                if name.startswith("QUARTZBIO_") or name.startswith("EDP_"):
+                    del env[name]
+            output = subprocess.check_output(
+                [sys.executable, "-c", script], env=env, cwd=home
+            )
+        return output.decode().strip().splitlines()
+
+    def test_import_is_lazy(self):
+        loaded, created_dir, types = self.run_script(self.SCRIPT)[-3:]
+        # Nothing heavy is imported and nothing is written to disk
+        self.assertEqual(loaded, "[]")
+        self.assertEqual(created_dir, "False")
+        # ...until the client or resources are used
+        self.assertEqual(types, "QuartzBioClient Object")
+
+    def test_client_probes_are_lazy(self):
+        # Missing and private attributes of a client do not import resources
+        probes, loaded = self.run_script(self.CLIENT_SCRIPT)[-2:]
+        self.assertEqual(probes, "False False False")
+        self.assertEqual(loaded, "False")
+
+
+class TestClientConnectionPool(unittest.TestCase):
+    """Test connection pool settings (no API access required)"""
+
+    def make_client(self, **kwargs):
+        return QuartzBioClient(
+            host="https://api.example.com",
+            token="abc",
+            include_resources=False,
+            **kwargs
+        )
+
+    def test_pool_size(self):
+        client = self.make_client()
+        self.assertEqual(client.pool_maxsize, DEFAULT_POOL_MAXSIZE)
+
+        with mock.patch.dict(os.environ, {"QUARTZBIO_POOL_MAXSIZE": "16"}):
+            self.assertEqual(self.make_client().pool_maxsize, 16)
+
+        client = self.make_client(pool_maxsize=32)
+        adapter = client._session.get_adapter("https://api.example.com/v1/user")
+        self.assertEqual(adapter._pool_maxsize, 32)
+        self.assertEqual(adapter.max_retries.total, 5)
+
+    def test_set_pool_size(self):
+        client = self.make_client()
+        session = client.transfer_session
+        client.set_pool_size(24)
+
+        for adapter in [
+            client._session.get_adapter("https://api.example.com/v2/objects"),
+            session.get_adapter("https://bucket.s3.amazonaws.com/key"),
+        ]:
+            self.assertEqual(adapter._pool_maxsize, 24)
+
+        with self.assertRaises(Exception):
+            client.set_pool_size(0)
+
+    def test_transfer_session(self):
+        client = self.make_client()
+        session = client.transfer_session
+        self.assertIs(client.transfer_session, session)
+        self.assertIsNot(session, client._session)
+        # Presigned URLs must not receive API credentials
+        self.assertIsNone(session.auth)
+
+
+class TestClientPathCache(unittest.TestCase):
+    """Test the cache of path lookups (no API access required)"""
+
+    def setUp(self):
+        self.client = QuartzBioClient(
+            host="https://api.example.com", token="abc", path_cache_ttl=60
+        )
+        self.requests = []
+        self.objects = [{"id": 7, "object_type": "folder", "parent_object_id": None}]
+
+        def request(method, url, **kwargs):
+            self.requests.append((method, url.split("/", 3)[3]))
+            if url.endswith("/v1/user"):
+                data = {"id": 1, "account": {"domain": "acme"}}
+            elif method == "GET":
+                data = {"data": list(self.objects)}
+            else:
+                data = {}
+            return mock.Mock(status_code=200, json=mock.Mock(return_value=data))
+
+        self.client._session = mock.Mock(request=mock.Mock(side_effect=request))
+
+    def test_path_cache(self):
+        Object = self.client.Object
+        for _ in range(3):
+            full_path, _ = Object.validate_full_path("~/folder")
+            self.assertEqual(full_path, "acme:user-1:/folder")
+            folder = Object.get_by_full_path("~/folder")
+            self.assertEqual(folder.id, 7)
+        # Cached objects are copies
+        folder.id = 8
+        self.assertEqual(Object.get_by_full_path("~/folder").id, 7)
+        self.assertEqual(
+            self.requests, [("GET", "v1/user"), ("GET", "v2/objects")]
+        )
+
+        # Writes invalidate vaults and objects, but not the user
+        Object.create(filename="new", object_type="folder")
+        self.objects = []
+        with self.assertRaises(NotFoundError):
+            Object.get_by_full_path("~/folder")
+        self.assertEqual(
+            self.requests[2:], [("POST", "v2/objects"), ("GET", "v2/objects")]
+        )
+
+        # Not found is not cached
+        self.objects = [{"id": 9, "object_type": "folder", "parent_object_id": None}]
+        self.assertEqual(Object.get_by_full_path("~/folder").id, 9)
+        # Other writes (e.g. queries) do not invalidate the cache
+        self.client.post("/v1/datasets/1/data", {})
+        self.assertEqual(Object.get_by_full_path("~/folder").id, 9)
+        self.assertEqual(
+            self.requests[4:], [("GET", "v2/objects"), ("POST", "v1/datasets/1/data")]
+        )
+
+    def test_path_cache_ttl(self):
+        with mock.patch("quartzbio.utils.path_cache.time.monotonic") as monotonic:
+            monotonic.return_value = 0
+            self.client.get_user()
+            monotonic.return_value = 59
+            self.client.get_user()
+            self.assertEqual(len(self.requests), 1)
+            monotonic.return_value = 61
+            self.client.get_user()
+            self.assertEqual(len(self.requests), 2)
+
+        # The cache is disabled by default
+        client = QuartzBioClient(
+            host="https://api.example.com", token="abc", include_resources=False
+        )
+        client._session = self.client._session
+        client.get_user()
+        client.get_user()
+        self.assertEqual(len(self.requests), 4)
+
+    def test_path_cache_host_path(self):
+        client = QuartzBioClient(
+            host="https://example.com/api", token="abc", path_cache_ttl=60
+        )
+        client._session = self.client._session
+        with mock.patch.object(client.path_cache, "invalidate") as invalidate:
+            client.post("https://example.com/api/v2/objects", {})
+            client.delete("https://example.com/api/v2/vaults/1", {})
+            self.assertEqual(invalidate.call_count, 2)
+            client.post("https://example.com/api/v1/datasets/1/data", {})
+            self.assertEqual(invalidate.call_count, 2)
+
+
+class TestClientTooManyRequests(unittest.TestCase):
+    """Test the retries of 429 responses (no API access required)"""
+
+    def setUp(self):
+        self.client = QuartzBioClient(host="https://api.example.com", token="abc")
+        self.client._session = mock.Mock()
+        patcher = mock.patch("time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def response(self, status_code, **headers):
+        return mock.Mock(
+            status_code=status_code,
+            headers=headers,
+            json=mock.Mock(return_value={"id": 1}),
+        )
+
+    def test_retry(self):
+        self.client._session.request.side_effect = [
+            self.response(429, **{"retry-after": "2"}),
+            self.response(200),
+        ]
+        self.assertEqual(self.client.get("/v1/user", {}), {"id": 1})
+        self.assertEqual(self.client._session.request.call_count, 2)
+        self.assertEqual(self.sleep.call_count, 1)
+        self.assertAlmostEqual(self.sleep.call_args[0][0], 3, places=1)
+
+    def test_max_retries(self):
+        self.client.request_limiter.max_retries = 3
+        self.client._session.request.return_value = self.response(429)
+        with self.assertRaises(QuartzBioError) as ctx:
+            self.client.get("/v1/user", {})
+        self.assertEqual(ctx.exception.status_code, 429)
+        self.assertEqual(self.client._session.request.call_count, 4)
+
+
+class TestClientCoalesceRequests(unittest.TestCase):
+    """Test the coalescing of concurrent GET requests (no API access required)"""
+
+    def test_coalesce_requests(self):
+        import threading
+
+        from quartzbio.utils import single_flight
+
+        client = QuartzBioClient(
+            host="https://api.example.com", token="abc", coalesce_requests=True
+        )
+        release = threading.Event()
+        joined = threading.Event()
+
+        class _Call(single_flight._Call):
+            # Signals when the other threads joined the request in flight
+            @property
+            def followers(self):
+                return self._followers
+
+            @followers.setter
+            def followers(self, value):
+                self._followers = value
+                if value == 3:
+                    joined.set()
+
+        def request(method, url, **kwargs):
+            release.wait(5)
+            return mock.Mock(status_code=200, json=mock.Mock(return_value={"id": 1}))
+
+        client._session = mock.Mock(request=mock.Mock(side_effect=request))
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(client.get("/v1/user", {})))
+            for _ in range(4)
+        ]
+        with mock.patch.object(single_flight, "_Call", _Call):
+            try:
+                for thread in threads:
+                    thread.start()
+                self.assertTrue(joined.wait(timeout=5))
+            finally:
+                release.set()
+                for thread in threads:
+                    thread.join(timeout=5)
+
+        self.assertEqual(client._session.request.call_count, 1)
+        self.assertEqual(results, [{"id": 1}] * 4)
+
+        # Other methods are never coalesced
+        client.post("/v2/objects", {})
+        client.get("/v1/user", {"a": 1})
+        self.assertEqual(client._session.request.call_count, 3)
+
+    def test_coalesce_requests_disabled(self):
+        client = QuartzBioClient(host="https://api.example.com", token="abc")
+        self.assertIsNone(client.single_flight)
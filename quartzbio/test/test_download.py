@@ -0,0 +1,323 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from quartzbio.errors import FileDownloadError, QuartzBioError
+from quartzbio.utils import download
+
+
+class FakeRaw(object):
+    def __init__(self, data, fail_after=None):
+        self.data = data
+        self.fail_after = fail_after
+
+    def stream(self, chunk_size, decode_content=True):
+        for i in range(0, len(self.data), 7):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise IOError("Connection reset")
+            yield self.data[i:i + 7]
+
+
+class FakeResponse(object):
+    def __init__(self, status_code, data=b"", headers=None, fail_after=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.raw = FakeRaw(data, fail_after)
+
+    def iter_content(self, chunk_size=1):
+        return self.raw.stream(chunk_size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeStorageSession(object):
+    """Serves a file with optional support for range requests"""
+
+    def __init__(self, data, ranges=True, etag='"abc"'):
+        self.data = data
+        self.ranges = ranges
+        self.etag = etag
+        self.requests = []
+        self.failures = 0
+        # Number of bytes sent before ranged responses are cut off
+        self.fail_after = None
+
+    def get(self, url, headers=None, stream=False):
+        byte_range = (headers or {}).get("Range")
+        self.requests.append(byte_range)
+        if not byte_range or not self.ranges:
+            return FakeResponse(200, self.data)
+
+        if self.failures and byte_range != "bytes=0-0":
+            self.failures -= 1
+            return FakeResponse(503)
+
+        start, end = [int(i) for i in re.match(r"bytes=(\d+)-(\d+)", byte_range).groups()]
+        return FakeResponse(
+            206,
+            self.data[start:end + 1],
+            {
+                "Content-Range": "bytes {}-{}/{}".format(start, end, len(self.data)),
+                "ETag": self.etag,
+            },
+            fail_after=None if byte_range == "bytes=0-0" else self.fail_after,
+        )
+
+
+class RangedDownloadTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.path = os.path.join(self.tempdir, "file.bin")
+        self.data = os.urandom(1000)
+
+        patchers = [
+            mock.patch.object(download, "MIN_DOWNLOAD_SEGMENT_SIZE", 10),
+            mock.patch("quartzbio.utils.download.time.sleep"),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def read(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def test_ranged_download(self):
+        session = FakeStorageSession(self.data)
+        download.ranged_download(
+            session, "url", self.path, num_connections=3, segment_size=128
+        )
+        self.assertEqual(self.read(), self.data)
+        # One probe, then 8 ranges of up to 128 bytes
+        self.assertEqual(len(session.requests), 9)
+        self.assertIn("bytes=896-999", session.requests)
+
+    def test_small_segments(self):
+        # Files smaller than segment_size * num_connections use smaller segments
+        session = FakeStorageSession(self.data)
+        download.ranged_download(session, "url", self.path, num_connections=4)
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(len(session.requests), 5)
+
+    def test_no_range_support(self):
+        session = FakeStorageSession(self.data, ranges=False)
+        download.ranged_download(session, "url", self.path, num_connections=4)
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(len(session.requests), 2)
+
+    def test_retry_segment(self):
+        session = FakeStorageSession(self.data)
+        session.failures = 2
+        download.ranged_download(
+            session, "url", self.path, num_connections=2, segment_size=500
+        )
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(len(session.requests), 5)
+
+    def test_failed_download(self):
+        session = FakeStorageSession(self.data)
+        session.failures = 100
+        with self.assertRaises(FileDownloadError):
+            download.ranged_download(
+                session, "url", self.path, num_connections=2, segment_size=500
+            )
+        self.assertFalse(os.path.exists(self.path))
+        # The partial file is kept to resume the download
+        self.assertTrue(os.path.exists(self.path + ".part"))
+
+    def test_resume(self):
+        session = FakeStorageSession(self.data)
+        session.fail_after = 300
+        with self.assertRaises(FileDownloadError):
+            download.ranged_download(
+                session, "url", self.path, num_connections=1, max_retries=0
+            )
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(session.requests, ["bytes=0-0", "bytes=0-999"])
+
+        # The next download only requests the missing bytes
+        session = FakeStorageSession(self.data)
+        download.ranged_download(session, "url", self.path, num_connections=1)
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(session.requests, ["bytes=0-0", "bytes=301-999"])
+        self.assertFalse(os.path.exists(self.path + ".part"))
+        self.assertFalse(os.path.exists(self.path + ".part.json"))
+
+    def test_resume_segments(self):
+        session = FakeStorageSession(self.data)
+        session.fail_after = 100
+        with self.assertRaises(FileDownloadError):
+            download.ranged_download(
+                session,
+                "url",
+                self.path,
+                num_connections=2,
+                segment_size=500,
+                max_retries=0,
+            )
+
+        session = FakeStorageSession(self.data)
+        download.ranged_download(
+            session, "url", self.path, num_connections=2, segment_size=500
+        )
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(
+            sorted(session.requests[1:]), ["bytes=105-499", "bytes=605-999"]
+        )
+
+    def test_resume_changed_file(self):
+        session = FakeStorageSession(self.data)
+        session.fail_after = 300
+        with self.assertRaises(FileDownloadError):
+            download.ranged_download(
+                session, "url", self.path, num_connections=1, max_retries=0
+            )
+
+        # The remote file changed: the download restarts
+        self.data = os.urandom(1000)
+        session = FakeStorageSession(self.data, etag='"def"')
+        download.ranged_download(session, "url", self.path, num_connections=1)
+        self.assertEqual(self.read(), self.data)
+        self.assertEqual(session.requests, ["bytes=0-0", "bytes=0-999"])
+
+    def test_no_resume(self):
+        session = FakeStorageSession(self.data)
+        session.fail_after = 300
+        with self.assertRaises(FileDownloadError):
+            download.ranged_download(
+                session, "url", self.path, num_connections=1, max_retries=0,
+                resume=False,
+            )
+        self.assertFalse(os.path.exists(self.path + ".part"))
+        self.assertFalse(os.path.exists(self.path + ".part.json"))
+
+    def test_partial_download_target(self):
+        self.assertEqual(download.partial_download_target("/a/b.txt.part"), "/a/b.txt")
+        self.assertEqual(
+            download.partial_download_target("/a/b.txt.part.json"), "/a/b.txt"
+        )
+        self.assertIsNone(download.partial_download_target("/a/b.txt"))
+
+    def test_verify_md5(self):
+        session = FakeStorageSession(self.data)
+        md5 = hashlib.md5(self.data).hexdigest()
+        download.ranged_download(session, "url", self.path, num_connections=2, md5=md5)
+        self.assertEqual(self.read(), self.data)
+
+        with self.assertRaises(FileDownloadError):
+            download.ranged_download(
+                session, "url", self.path, num_connections=2, md5="0" * 32
+            )
+        # The mismatched download is removed, the previous file is untouched
+        self.assertFalse(os.path.exists(self.path + ".part"))
+        self.assertEqual(self.read(), self.data)
+
+    def test_verify_multipart_md5(self):
+        with open(self.path, "wb") as f:
+            f.write(self.data)
+
+        parts = [self.data[:600], self.data[600:]]
+        md5 = hashlib.md5(
+            b"".join(hashlib.md5(p).digest() for p in parts)
+        ).hexdigest()
+        with mock.patch.object(download, "multipart_md5sum") as multipart_md5sum:
+            multipart_md5sum.return_value = (
+                hashlib.md5(self.data).hexdigest(),
+                {(0, 600): hashlib.md5(parts[0]).hexdigest(),
+                 (600, 400): hashlib.md5(parts[1]).hexdigest()},
+            )
+            download.verify_md5(self.path, md5)
+
+    def test_rate_limit(self):
+        session = FakeStorageSession(self.data)
+        rate_limiter = mock.Mock()
+        download.ranged_download(
+            session,
+            "url",
+            self.path,
+            num_connections=2,
+            segment_size=500,
+            rate_limiter=rate_limiter,
+        )
+        self.assertEqual(self.read(), self.data)
+        # All the bytes of all the connections go through the limiter
+        self.assertEqual(
+            sum(c[0][0] for c in rate_limiter.consume.call_args_list), len(self.data)
+        )
+
+    def test_http_errors(self):
+        # HTTP errors are API errors, as for single-stream downloads
+        session = mock.Mock()
+        session.get.return_value = mock.MagicMock(status_code=403, url="url")
+        with self.assertRaises(QuartzBioError) as ctx:
+            download.ranged_download(session, "url", self.path)
+        self.assertEqual(ctx.exception.status_code, 403)
+        with self.assertRaises(QuartzBioError):
+            download.download_stream(session, "url", self.path)
+
+    def test_empty_file(self):
+        # Storage answers 416 to the first byte of an empty file
+        session = mock.Mock()
+        session.get.return_value = mock.MagicMock(
+            status_code=416, headers={"Content-Range": "bytes */0"}
+        )
+        download.ranged_download(session, "url", self.path, num_connections=4)
+        self.assertEqual(self.read(), b"")
+        self.assertEqual(session.get.call_count, 1)
+        self.assertFalse(os.path.exists(self.path + ".part"))
+        self.assertFalse(os.path.exists(self.path + ".part.json"))
+
+
+class ObjectDownloadTests(unittest.TestCase):
+    def setUp(self):
+        from quartzbio import Object
+
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.data = os.urandom(1000)
+        self.session = FakeStorageSession(self.data)
+        self.client = mock.Mock(transfer_session=self.session, rate_limiter=None)
+
+        self.obj = Object(1, client=self.client)
+        self.obj.update(filename="file.bin", size=len(self.data))
+        patcher = mock.patch.object(Object, "download_url", return_value="url")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_small_file(self):
+        # Small files are downloaded in one go, without partial files
+        path = self.obj.download(self.tempdir)
+        self.assertEqual(self.session.requests, [None])
+        self.assertEqual(os.listdir(self.tempdir), ["file.bin"])
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_large_file(self):
+        from quartzbio.resource import apiresource
+
+        with mock.patch.object(apiresource, "RESUMABLE_DOWNLOAD_MIN_SIZE", 1000):
+            self.obj.download(self.tempdir)
+        # A probe, then the missing range
+        self.assertEqual(self.session.requests, ["bytes=0-0", "bytes=0-999"])
+
+        del self.session.requests[:]
+        self.obj.download(self.tempdir, resume=True)
+        self.assertEqual(len(self.session.requests), 2)
+
+    def test_empty_file(self):
+        # Empty files are downloaded in one go, even with several connections
+        self.session.data = b""
+        self.obj["size"] = 0
+        path = self.obj.download(self.tempdir, num_connections=4)
+        self.assertEqual(self.session.requests, [None])
+        self.assertEqual(os.path.getsize(path), 0)
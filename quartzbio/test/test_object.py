@@ -541,3 +541,283 @@ class ObjectUploadTests(QuartzBioTestCase):
         download_url = new_obj.download_url()
         response = requests.request(method="get", url=download_url)
         self.assertEqual(response.content.decode("utf-8"), "sample file updated")
+
+
+class ObjectTransferTests(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+
+        from quartzbio.client import QuartzBioClient
+
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+        self.local_path = os.path.join(self.tempdir, "file.txt")
+        with open(self.local_path, "w") as fp:
+            fp.write("sample file")
+
+        self.client = QuartzBioClient(
+            host="https://api.example.com", token="abc", include_resources=False
+        )
+        self.session = mock.Mock()
+        self.client._transfer_session = self.session
+
+        patcher = mock.patch("quartzbio.resource.object.time.sleep")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_object(self):
+        obj = mock.Mock(upload_url="https://bucket.example.com/file", path="/file.txt")
+        obj._client = self.client
+        return obj
+
+    def test_upload_single_file_retries(self):
+        from quartzbio import Object
+
+        bodies = []
+
+        def put(url, data, headers):
+            bodies.append(data.read())
+            return mock.Mock(status_code=503 if len(bodies) < 3 else 200)
+
+        self.session.put.side_effect = put
+        obj = self.make_object()
+        self.assertIs(Object._upload_single_file(obj, self.local_path), obj)
+        self.assertEqual(bodies, [b"sample file"] * 3)
+        obj.delete.assert_not_called()
+
+    def test_upload_single_file_md5(self):
+        from quartzbio import Object
+
+        self.session.put.return_value = mock.Mock(status_code=200)
+        with mock.patch("quartzbio.resource.object.md5sum") as md5sum:
+            Object._upload_single_file(
+                self.make_object(),
+                self.local_path,
+                local_md5="2c93a7eced4d9f4e02ea5fa6b69b790c",
+            )
+        # The file is not hashed again
+        md5sum.assert_not_called()
+        self.assertEqual(
+            self.session.put.call_args[1]["headers"]["Content-MD5"],
+            b"LJOn7O1Nn04C6l+mtpt5DA==",
+        )
+
+    def test_upload_single_file_failure(self):
+        from quartzbio import Object
+        from quartzbio.errors import FileUploadError
+
+        self.session.put.return_value = mock.Mock(status_code=403, content=b"denied")
+        obj = self.make_object()
+        with self.assertRaises(FileUploadError):
+            Object._upload_single_file(obj, self.local_path)
+        self.assertEqual(self.session.put.call_count, 1)
+        obj.delete.assert_called_once_with(force=True)
+
+    def test_upload_single_part(self):
+        from quartzbio import Object
+
+        bodies = []
+
+        def put(url, data, headers, timeout):
+            # Parts are streamed from the file
+            bodies.append(data.read())
+            return mock.Mock(status_code=200, headers={"ETag": '"abc"'})
+
+        self.session.put.side_effect = put
+        task = {
+            "part_number": 2,
+            "start_byte": 7,
+            "part_size": 4,
+            "max_retries": 3,
+            "upload_id": "upload",
+            "upload_key": "key",
+            "upload_url": "https://bucket.example.com/file?part=2",
+        }
+        part = Object._upload_single_part(
+            self.local_path, task, self.make_object(), self.client
+        )
+        self.assertEqual(part, {"part_number": 2, "etag": "abc"})
+        self.assertEqual(bodies, [b"file"])
+        self.assertNotIn("Content-MD5", self.session.put.call_args[1]["headers"])
+
+        # Part MD5s computed when hashing the file are sent with the part
+        task["md5"] = "8c7dd922ad47494fc02c388e12c00eac"
+        Object._upload_single_part(
+            self.local_path, task, self.make_object(), self.client
+        )
+        self.assertEqual(
+            self.session.put.call_args[1]["headers"]["Content-MD5"],
+            b"jH3ZIq1HSU/ALDiOEsAOrA==",
+        )
+
+    def test_resume_multipart(self):
+        from quartzbio import Object
+        from quartzbio.errors import FileUploadError
+        from quartzbio.utils.upload_state import UploadState
+
+        obj = self.make_object()
+        obj.configure_mock(
+            id=10,
+            upload_id="upload",
+            upload_key="key",
+            size=11,
+            full_path="acme:vault:/file.txt",
+            presigned_urls=[
+                {"part_number": 1, "start_byte": 0, "size": 6, "upload_url": "u1"},
+                {"part_number": 2, "start_byte": 6, "size": 5, "upload_url": "u2"},
+            ],
+        )
+        state = UploadState(self.local_path, obj.full_path, state_dir=self.tempdir)
+        state.start(obj, "2c93a7eced4d9f4e02ea5fa6b69b790c")
+
+        bodies = []
+
+        def put(url, data, headers, timeout):
+            bodies.append(data.read())
+            if url == "u2":
+                return mock.Mock(status_code=500, content=b"error")
+            return mock.Mock(status_code=200, headers={"ETag": '"etag-%s"' % url}, url=url)
+
+        self.session.put.side_effect = put
+        self.client.post = mock.Mock()
+        with self.assertRaises(FileUploadError):
+            Object._upload_multipart(
+                obj,
+                self.local_path,
+                state.md5,
+                upload_state=state,
+                max_retries=1,
+                client=self.client,
+            )
+        # The partial upload is kept
+        obj.delete.assert_not_called()
+
+        state = UploadState.load(self.local_path, obj.full_path, state_dir=self.tempdir)
+        self.assertEqual(state.parts, {1: "etag-u1"})
+
+        # Resume with fresh URLs for the missing part only
+        self.session.put.reset_mock()
+        del bodies[:]
+        self.client.post.return_value = {"message": "ok"}
+        refresh = [{"part_number": 2, "upload_url": "u3"}]
+        # A retrieved object has no upload_id or upload_key
+        retrieved = self.make_object()
+        retrieved.configure_mock(id=10, size=11, full_path=obj.full_path)
+        del retrieved.upload_id
+        del retrieved.upload_key
+        with mock.patch.object(Object, "retrieve", return_value=retrieved), mock.patch.object(
+            Object, "refresh_presigned_urls", return_value=refresh
+        ) as refresh_presigned_urls:
+            Object._resume_multipart(state, self.local_path, client=self.client)
+
+        self.assertEqual(refresh_presigned_urls.call_args[1]["part_numbers"], [2])
+        complete = self.client.post.call_args[0][1]
+        self.assertEqual(complete["upload_id"], "upload")
+        self.assertEqual(complete["physical_object_id"], "key")
+        self.assertEqual(self.session.put.call_count, 1)
+        self.assertEqual(bodies, [b" file"])
+        self.assertEqual(
+            self.client.post.call_args[0][1]["parts"],
+            [
+                {"part_number": 1, "etag": "etag-u1"},
+                {"part_number": 2, "etag": "etag-u3"},
+            ],
+        )
+        self.assertFalse(os.path.exists(state.path))
+
+    def test_adaptive_multipart(self):
+        from quartzbio import Object
+
+        with open(self.local_path, "w") as fp:
+            fp.write("0123456789" * 4)
+        obj = self.make_object()
+        obj.configure_mock(
+            upload_id="upload",
+            upload_key="key",
+            size=40,
+            presigned_urls=[
+                {
+                    "part_number": i + 1,
+                    "start_byte": i * 4,
+                    "size": 4,
+                    "upload_url": "u%d" % (i + 1),
+                }
+                for i in range(10)
+            ],
+        )
+
+        throttled = []
+
+        def put(url, data, headers, timeout):
+            if url == "u3" and not throttled:
+                throttled.append(url)
+                return mock.Mock(status_code=503, content=b"SlowDown")
+            return mock.Mock(status_code=200, headers={"ETag": '"%s"' % url})
+
+        self.session.put.side_effect = put
+        self.client.post = mock.Mock(return_value={"message": "ok"})
+        refresh = [{"part_number": 3, "upload_url": "u3"}]
+        with mock.patch.object(
+            Object, "refresh_presigned_urls", return_value=refresh
+        ), mock.patch(
+            "quartzbio.resource.object.AdaptiveConcurrency.throttled"
+        ) as throttled_mock:
+            Object._upload_multipart(
+                obj,
+                self.local_path,
+                "md5",
+                num_processes=4,
+                adaptive=True,
+                client=self.client,
+            )
+
+        # The throttled part slowed the upload down and was retried
+        throttled_mock.assert_called_once_with()
+        self.assertEqual(self.session.put.call_count, 11)
+        self.assertEqual(
+            [p["part_number"] for p in self.client.post.call_args[0][1]["parts"]],
+            list(range(1, 11)),
+        )
+
+    def test_request_part_size(self):
+        from quartzbio import Object
+
+        mb = 1024 * 1024
+        obj = self.make_object()
+        obj.configure_mock(
+            upload_id="upload",
+            upload_key="key",
+            size=20 * mb,
+            presigned_urls=[
+                {"part_number": 1, "start_byte": 0, "size": 16 * mb, "upload_url": "u1"},
+                {"part_number": 2, "start_byte": 16 * mb, "size": 4 * mb, "upload_url": "u2"},
+            ],
+        )
+        layout = [
+            {"part_number": i + 1, "start_byte": i * 5 * mb, "size": 5 * mb, "upload_url": "n"}
+            for i in range(4)
+        ]
+
+        with mock.patch.object(
+            Object, "refresh_presigned_urls", return_value=layout
+        ) as refresh_presigned_urls:
+            # Parts smaller than the storage minimum are not requested
+            self.assertFalse(Object._request_part_size(obj, mb))
+            refresh_presigned_urls.assert_not_called()
+
+            self.assertTrue(Object._request_part_size(obj, 5 * mb))
+            self.assertEqual(
+                refresh_presigned_urls.call_args[1]["part_numbers"], [1, 2, 3, 4]
+            )
+            self.assertEqual(refresh_presigned_urls.call_args[1]["part_size"], 5 * mb)
+            self.assertEqual(obj.presigned_urls, layout)
+
+        # URLs without a layout of the whole file are not used
+        obj.presigned_urls = layout
+        with mock.patch.object(
+            Object,
+            "refresh_presigned_urls",
+            return_value=[{"part_number": 1, "upload_url": "n"}],
+        ):
+            self.assertFalse(Object._request_part_size(obj, 10 * mb))
+        self.assertEqual(obj.presigned_urls, layout)
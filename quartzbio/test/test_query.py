@@ -1,8 +1,12 @@
 
+import os
 import unittest
 
-from quartzbio.query import Filter
+import mock
+
+from quartzbio.query import Filter, Query
 from quartzbio import QuartzBioError
+from quartzbio.test.client_mocks import FakeDataClient
 
 from .helper import QuartzBioTestCase
 
@@ -503,3 +507,410 @@ class BaseQueryTest(QuartzBioTestCase):
             self.fail("Exception {} was raised while querying large object".format(e))
         self.assertTrue(not dataframe.empty)
         self.assertEqual(expected_num_rows, len(dataframe))
+
+
+class QueryPrefetchTest(unittest.TestCase):
+    """Test parallel page prefetching (no API access required)"""
+
+    def setUp(self):
+        self.records = [{"_id": i, "value": "v{}".format(i)} for i in range(95)]
+        self.client = FakeDataClient(self.records)
+
+    def test_prefetch_returns_records_in_order(self):
+        for prefetch in [0, 1, 4]:
+            query = Query(1, page_size=10, prefetch=prefetch, client=self.client)
+            self.assertEqual(list(query), self.records)
+
+    def test_prefetch_with_limit_and_slice(self):
+        query = Query(1, page_size=10, limit=33, prefetch=3, client=self.client)
+        self.assertEqual(list(query), self.records[:33])
+
+        query = Query(1, page_size=10, prefetch=3, client=self.client)
+        self.assertEqual(list(query[25:61]), self.records[25:61])
+
+    def test_prefetch_requests_each_page_once(self):
+        query = Query(1, page_size=10, prefetch=4, client=self.client)
+        list(query)
+        offsets = sorted(r["offset"] for r in self.client.requests)
+        self.assertEqual(offsets, list(range(0, 95, 10)))
+
+    def test_prefetch_error(self):
+        class FailingClient(FakeDataClient):
+            def post(self, url, data, **kwargs):
+                if data["offset"] >= 20:
+                    raise QuartzBioError("fail")
+                return super(FailingClient, self).post(url, data, **kwargs)
+
+        query = Query(1, page_size=10, prefetch=2, client=FailingClient(self.records))
+        with self.assertRaises(QuartzBioError):
+            list(query)
+
+    def test_invalid_prefetch(self):
+        with self.assertRaises(Exception):
+            Query(1, prefetch=-1, client=self.client)
+
+    def test_prefetch_stops_on_break(self):
+        import gc
+
+        # Breaking out of pages() stops the prefetching right away
+        query = Query(1, page_size=10, prefetch=3, client=self.client)
+        pages = query.pages()
+        next(pages)
+        executor = query._prefetch_executor
+        pages.close()
+        self.assertTrue(executor._shutdown)
+        self.assertIsNone(query._prefetch_executor)
+
+        # ...and breaking out of the iterator once the query is collected
+        query = Query(1, page_size=10, prefetch=3, client=self.client)
+        for record in query:
+            break
+        executor = query._prefetch_executor
+        del query, record
+        gc.collect()
+        self.assertTrue(executor._shutdown)
+
+        # or when it is closed
+        query = Query(1, page_size=10, prefetch=3, client=self.client)
+        next(iter(query))
+        executor = query._prefetch_executor
+        query.close()
+        self.assertTrue(executor._shutdown)
+
+
+class QueryCursorTest(unittest.TestCase):
+    """Test cursor (search-after) pagination (no API access required)"""
+
+    def setUp(self):
+        self.records = [{"_id": i, "value": i % 7} for i in range(95)]
+        self.client = FakeDataClient(self.records)
+
+    def test_cursor_pages_with_last_seen_value(self):
+        query = Query(1, page_size=10, cursor="_id", client=self.client)
+        self.assertEqual(list(query), self.records)
+        self.assertEqual(len(self.client.requests), 10)
+        self.assertTrue(all(r["offset"] == 0 for r in self.client.requests))
+        self.assertEqual(self.client.requests[1]["filters"], [("_id__gt", 9)])
+        self.assertEqual(self.client.requests[0]["ordering"], ["_id"])
+
+    def test_cursor_descending_with_limit_and_filters(self):
+        query = Query(
+            1, page_size=10, limit=25, cursor="-_id", client=self.client
+        ).filter(value=3)
+        expected = sorted(
+            [r for r in self.records if r["value"] == 3],
+            key=lambda r: -r["_id"],
+        )
+        self.assertEqual(list(query), expected[:25])
+
+    def test_cursor_slice(self):
+        query = Query(1, page_size=10, cursor="_id", client=self.client)
+        self.assertEqual(list(query[15:42]), self.records[15:42])
+
+    def test_cursor_adds_field(self):
+        class FieldsClient(FakeDataClient):
+            def post(self, url, data, **kwargs):
+                response = super(FieldsClient, self).post(url, data, **kwargs)
+                response["results"] = [
+                    dict((k, r[k]) for k in data["fields"]) for r in response["results"]
+                ]
+                return response
+
+        self.client = FieldsClient(self.records)
+        query = Query(1, page_size=10, fields=["value"], cursor="_id", client=self.client)
+        expected = [{"value": r["value"]} for r in self.records]
+        self.assertEqual(list(query), expected)
+        self.assertEqual(list(query[15:42]), expected[15:42])
+        self.assertEqual(query[3], expected[3])
+        self.assertEqual(sum(query.pages(), []), expected)
+        self.assertEqual(self.client.requests[0]["fields"], ["value", "_id"])
+        self.assertEqual(self.client.requests[1]["filters"], [("_id__gt", 9)])
+        self.assertEqual(query._fields, ["value"])
+
+    def test_cursor_fallback_to_offsets(self):
+        class NoCursorClient(FakeDataClient):
+            def post(self, url, data, **kwargs):
+                if data.get("filters"):
+                    error = QuartzBioError("Bad Request")
+                    error.status_code = 400
+                    raise error
+                return super(NoCursorClient, self).post(url, data, **kwargs)
+
+        client = NoCursorClient(self.records)
+        query = Query(1, page_size=10, cursor="_id", client=client)
+        self.assertEqual(list(query), self.records)
+        self.assertEqual(client.requests[-1]["offset"], 90)
+
+    def test_invalid_cursor_parameters(self):
+        with self.assertRaises(Exception):
+            Query(1, cursor="_id", prefetch=2, client=self.client)
+        with self.assertRaises(Exception):
+            Query(1, cursor="_id", ordering=["value"], client=self.client)
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+class FieldsQueryTestCase(unittest.TestCase):
+    """Queries of records with typed fields (no API access required)"""
+
+    def setUp(self):
+        self.records = [
+            {
+                "_id": i,
+                "score": None if i % 10 == 0 else i / 2.0,
+                "count": i,
+                "gene": "G{}".format(i),
+                "tags": ["a"] * (i % 3),
+            }
+            for i in range(45)
+        ]
+        self.client = FakeDataClient(self.records)
+        self.fields = [
+            mock.Mock(data_type=data_type, is_list=is_list)
+            for data_type, is_list in [
+                ("long", False),
+                ("double", False),
+                ("integer", False),
+                ("string", False),
+                ("string", True),
+            ]
+        ]
+        for field, name in zip(self.fields, ["_id", "score", "count", "gene", "tags"]):
+            field.name = name
+        patcher = mock.patch.object(Query, "fields", return_value=self.fields)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def query(self, **kwargs):
+        return Query(1, page_size=10, client=self.client, **kwargs)
+
+
+class QueryColumnarTest(FieldsQueryTestCase):
+    """Test columnar materialization (no API access required)"""
+
+    def test_pages(self):
+        pages = list(self.query(limit=25).pages())
+        self.assertEqual([len(p) for p in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), self.records[:25])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_to_numpy(self):
+        columns = self.query().to_numpy()
+        self.assertEqual(columns["_id"].dtype, numpy.int64)
+        self.assertEqual(columns["count"].dtype, numpy.int32)
+        self.assertEqual(columns["_id"].tolist(), list(range(45)))
+        self.assertEqual(columns["gene"][3], "G3")
+        self.assertEqual(columns["tags"][2], ["a", "a"])
+
+        score = columns["score"]
+        self.assertTrue(isinstance(score, numpy.ma.MaskedArray))
+        self.assertEqual(score.tolist(), [r["score"] for r in self.records])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_to_numpy_slice(self):
+        columns = self.query()[12:27].to_numpy()
+        self.assertEqual(columns["_id"].tolist(), list(range(12, 27)))
+
+    @unittest.skipIf(pyarrow is None, "PyArrow is not installed")
+    def test_to_arrow(self):
+        table = self.query().to_arrow()
+        self.assertEqual(table.num_rows, 45)
+        self.assertEqual(table.schema.field("count").type, pyarrow.int32())
+        self.assertEqual(
+            table.schema.field("tags").type, pyarrow.list_(pyarrow.string())
+        )
+        self.assertEqual(table.to_pylist(), self.records)
+
+    @unittest.skipIf(pyarrow is None, "PyArrow is not installed")
+    def test_to_arrow_mismatched_type(self):
+        self.records[15]["count"] = "n/a"
+        table = self.query().to_arrow()
+        self.assertEqual(table.schema.field("count").type, pyarrow.string())
+        self.assertEqual(table.column("count").to_pylist()[14:16], ["14", "n/a"])
+
+    @unittest.skipIf(pyarrow is None, "PyArrow is not installed")
+    def test_to_arrow_incompatible_chunks(self):
+        from quartzbio.utils.columnar import ArrowColumn
+
+        # Earlier chunks that cannot be cast to the type of a later page
+        column = ArrowColumn("x")
+        column.extend([None])
+        column.chunks = [
+            mock.Mock(
+                cast=mock.Mock(side_effect=pyarrow.ArrowNotImplementedError("cast")),
+                to_pylist=mock.Mock(return_value=[{"a": 1}]),
+            )
+        ]
+        column.extend([5])
+        self.assertEqual(column.type, pyarrow.string())
+        self.assertEqual(column.to_array().to_pylist(), ['{"a": 1}', "5"])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_to_numpy_int_then_float(self):
+        # Floats after the first page of an integer column are not truncated
+        self.records[15]["count"] = 15.5
+        self.records[16]["count"] = 16.0
+        columns = self.query().to_numpy()
+        self.assertEqual(columns["count"].dtype, numpy.float64)
+        self.assertEqual(columns["count"].tolist()[14:17], [14, 15.5, 16])
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_to_numpy_non_boolean(self):
+        from quartzbio.utils.columnar import NumpyColumn
+
+        column = NumpyColumn("flag", "boolean")
+        column.extend([True, None, False])
+        self.assertEqual(column.to_array().dtype, numpy.bool_)
+        # Values that are not booleans are kept as they are
+        column.extend(["false", 0.5])
+        array = column.to_array()
+        self.assertEqual(array.dtype, object)
+        self.assertEqual(array.tolist(), [True, None, False, "false", 0.5])
+
+    @unittest.skipIf(pyarrow is None, "PyArrow is not installed")
+    def test_to_arrow_int_then_float(self):
+        # Floats after the first page of an integer column are not truncated
+        self.records[15]["count"] = 15.5
+        self.records[16]["count"] = 16.0
+        table = self.query().to_arrow()
+        self.assertEqual(table.schema.field("count").type, pyarrow.float64())
+        self.assertEqual(table.column("count").to_pylist()[14:17], [14, 15.5, 16])
+
+
+class QueryStreamToTest(FieldsQueryTestCase):
+    """Test streaming results to files (no API access required)"""
+
+    def test_stream_to_ndjson(self):
+        import json
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.ndjson")
+            count = self.query(limit=33).stream_to(path, max_pages=1)
+            with open(path) as f:
+                records = [json.loads(line) for line in f]
+
+        self.assertEqual(count, 33)
+        self.assertEqual(records, self.records[:33])
+
+    def test_stream_to_csv(self):
+        import csv
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.csv")
+            self.query().stream_to(path, format="csv")
+            with open(path) as f:
+                rows = list(csv.reader(f))
+
+        self.assertEqual(rows[0], ["_id", "score", "count", "gene", "tags"])
+        self.assertEqual(len(rows), 46)
+        self.assertEqual(rows[11], ["10", "", "10", "G10", '["a"]'])
+
+    def test_stream_to_csv_extra_keys(self):
+        import csv
+        import tempfile
+
+        # Keys of the first batch that are not fields are added to the header
+        self.records[3]["target"] = "t3"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.csv")
+            self.query().stream_to(path, format="csv")
+            with open(path) as f:
+                rows = list(csv.reader(f))
+
+            self.assertEqual(rows[0], ["_id", "score", "count", "gene", "tags", "target"])
+            self.assertEqual(rows[4][-1], "t3")
+            self.assertEqual(rows[5][-1], "")
+
+            # They cannot be added to the header after the first batch
+            self.records[25]["other"] = 1
+            with self.assertRaises(ValueError):
+                self.query().stream_to(path, format="csv")
+
+    @unittest.skipIf(pyarrow is None, "PyArrow is not installed")
+    def test_stream_to_parquet(self):
+        import tempfile
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.parquet")
+            self.query().stream_to(path, format="parquet", batch_pages=2)
+            parquet = pq.ParquetFile(path)
+            self.assertEqual(parquet.metadata.num_row_groups, 3)
+            self.assertEqual(parquet.read().to_pylist(), self.records)
+
+    @unittest.skipIf(pyarrow is None, "PyArrow is not installed")
+    def test_stream_to_parquet_later_types(self):
+        import tempfile
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "out.parquet")
+            # Whole floats are cast to the integer column of the first batch
+            self.records[25]["count"] = 25.0
+            self.query().stream_to(path, format="parquet")
+            table = pq.read_table(path)
+            self.assertEqual(table.schema.field("count").type, pyarrow.int32())
+            self.assertEqual(table.column("count").to_pylist()[25], 25)
+
+            self.records[25]["count"] = 25.5
+            with self.assertRaises(ValueError):
+                self.query().stream_to(path, format="parquet")
+
+            # All the values are in the first batch
+            self.query().stream_to(path, format="parquet", batch_pages=5)
+            table = pq.read_table(path)
+            self.assertEqual(table.schema.field("count").type, pyarrow.float64())
+            self.assertEqual(table.column("count").to_pylist()[25], 25.5)
+
+    def test_stream_to_error(self):
+        import tempfile
+
+        class FailingClient(FakeDataClient):
+            def post(self, url, data, **kwargs):
+                if data["offset"] >= 20:
+                    raise QuartzBioError("Server Error")
+                return super(FailingClient, self).post(url, data, **kwargs)
+
+        query = Query(1, page_size=10, client=FailingClient(self.records))
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(QuartzBioError):
+                query.stream_to(os.path.join(tmp, "out.ndjson"))
+
+        with self.assertRaises(Exception):
+            query.stream_to("out.xml", format="xml")
+
+    def test_stream_to_close_error(self):
+        import tempfile
+
+        from quartzbio.utils import streaming
+
+        class FailingClient(FakeDataClient):
+            def post(self, url, data, **kwargs):
+                if data["offset"] >= 20:
+                    raise QuartzBioError("Server Error")
+                return super(FailingClient, self).post(url, data, **kwargs)
+
+        writer = mock.Mock()
+        writer.close.side_effect = IOError("close")
+        query = Query(1, page_size=10, client=FailingClient(self.records))
+        with mock.patch.dict(streaming.WRITERS, {"ndjson": mock.Mock(return_value=writer)}):
+            with tempfile.TemporaryDirectory() as tmp:
+                # The error of the query is raised, not the one of close()
+                with self.assertRaises(QuartzBioError):
+                    query.stream_to(os.path.join(tmp, "out.ndjson"))
+                writer.close.assert_called_once_with()
+
+                # Without another error, close() errors are raised
+                with self.assertRaises(IOError):
+                    self.query(limit=5).stream_to(os.path.join(tmp, "out.ndjson"))
@@ -3,6 +3,9 @@ import sys
 import os
 import json
 import tempfile
+import threading
+import time
+import unittest
 
 import mock
 
@@ -11,6 +14,7 @@ from .helper import QuartzBioTestCase
 from quartzbio.cli import main
 from quartzbio import DatasetTemplate
 from quartzbio import Vault
+from quartzbio.resource import ListObject
 from quartzbio.resource.object import Object
 from quartzbio.errors import NotFoundError
 from quartzbio.cli.data import should_exclude
@@ -33,6 +37,29 @@ def upload_path(*args, **kwargs):
     return "/"
 
 
+CLIENT_AUTH = ("https://api.example.com", "abc", "Token")
+
+
+def fake_object(full_path, object_type, target=None, id=None):
+    """An object of a fake vault (its ID is its path by default)"""
+    return {
+        "id": full_path if id is None else id,
+        "class_name": "Object",
+        "object_type": object_type,
+        "full_path": full_path,
+        "name": full_path.rsplit("/", 1)[1],
+        "target": target,
+    }
+
+
+def upload_files(count):
+    """Arguments of the uploads of count files to acme:v:/a"""
+    return [
+        ("file-%d" % i, "acme:v:/a", "acme:v", False, None, CLIENT_AUTH, False, 3, False)
+        for i in range(count)
+    ]
+
+
 class CLITests(QuartzBioTestCase):
     def setUp(self):
         super(CLITests, self).setUp()
@@ -700,3 +727,273 @@ class QueueTests(CLITests):
     def test_show_queue(self):
         """Simple test to print the queue"""
         main.main(["queue"])
+
+
+class RetrieveObjectsTests(unittest.TestCase):
+    @mock.patch("quartzbio.cli.data.global_client")
+    @mock.patch("quartzbio.resource.object.Object.retrieve")
+    def test_retrieve_objects(self, ObjectRetrieve, GlobalClient):
+        from quartzbio.cli.data import _retrieve_objects
+
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def retrieve(object_id):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return {"id": object_id}
+
+        ObjectRetrieve.side_effect = retrieve
+        objects = _retrieve_objects(list(range(20)), max_workers=4)
+        self.assertEqual(objects, [{"id": i} for i in range(20)])
+        self.assertEqual(ObjectRetrieve.call_count, 20)
+        self.assertTrue(1 < running[1] <= 4)
+
+        self.assertEqual(_retrieve_objects([]), [])
+
+
+class ShortcutResolverTests(unittest.TestCase):
+    def setUp(self):
+        a = {"id": 1, "object_type": "folder"}
+        b = {"id": 5, "object_type": "folder"}
+        self.objects = [
+            Object.construct_from(fake_object(*args))
+            for args in [
+                ("acme:v:/a", "folder", None, 1),
+                ("acme:v:/a/f.txt", "file", None, 2),
+                ("acme:v:/a/loop", "shortcut", a, 3),
+                ("acme:v:/a/b1", "shortcut", b, 4),
+                ("acme:v:/a/b2", "shortcut", b, 8),
+                ("acme:v:/b", "folder", None, 5),
+                ("acme:v:/b/g.txt", "file", None, 6),
+                ("acme:v:/b/back", "shortcut", a, 7),
+            ]
+        ]
+        self.searches = []
+
+        def search(path__prefix):
+            self.searches.append(path__prefix)
+            return [o for o in self.objects if o.full_path.startswith(path__prefix)]
+
+        def retrieve(id, **kwargs):
+            return [o for o in self.objects if o.id == id][0]
+
+        patchers = [
+            mock.patch("quartzbio.cli.data.global_client"),
+            mock.patch("quartzbio.global_search.GlobalSearch.filter", side_effect=search),
+            mock.patch(
+                "quartzbio.resource.object.Object.retrieve", side_effect=retrieve
+            ),
+        ]
+        for patcher in patchers:
+            self.retrieve = patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @mock.patch("builtins.print")
+    def test_resolve(self, Print):
+        from quartzbio.cli.data import ShortcutResolver
+
+        results = ShortcutResolver().resolve("acme:v:/a", "local/a/")
+        paths = sorted(r.path for r in results if r.is_file)
+        self.assertEqual(
+            paths, ["local/a/b1/g.txt", "local/a/b2/g.txt", "local/a/f.txt"]
+        )
+
+        # Each folder is listed once, each shortcut and target retrieved once
+        self.assertEqual(self.searches, ["acme:v:/a", "acme:v:/b"])
+        retrieved = sorted(c[0][0] for c in self.retrieve.call_args_list)
+        self.assertEqual(retrieved, [1, 3, 4, 5, 7, 8])
+
+        # Shortcuts back into the folders being listed are skipped
+        warnings = [c[0][0] for c in Print.call_args_list if "circular" in c[0][0]]
+        self.assertEqual(len(warnings), 3)
+
+
+class WalkObjectsTests(unittest.TestCase):
+    def setUp(self):
+        self.objects = [
+            fake_object("acme:v:/a", "folder"),
+            fake_object("acme:v:/a/b", "folder"),
+            fake_object("acme:v:/a/c", "folder"),
+            fake_object("acme:v:/a/b/f1", "file"),
+            fake_object("acme:v:/a/c/f2", "file"),
+            fake_object("acme:v:/a/c/f3", "file"),
+            fake_object("acme:v:/a/c/up", "shortcut", {"object_type": "folder", "id": "a"}),
+        ]
+        self.globs = []
+
+        def all(glob, limit, **params):
+            self.globs.append(glob)
+            parent = glob[:-2]
+            data = [o for o in self.objects if o["full_path"].rsplit("/", 1)[0] == parent]
+            # Two objects per page
+            pages = [data[i:i + 2] for i in range(0, len(data), 2)] or [[]]
+            responses = [
+                {
+                    "class_name": "list",
+                    "data": page,
+                    "links": {"next": "page-%d" % (i + 1) if i + 1 < len(pages) else None},
+                }
+                for i, page in enumerate(pages)
+            ]
+            client = mock.Mock()
+            client.request.side_effect = lambda method, url, **kwargs: responses[
+                int(url.split("-")[1])
+            ]
+            return ListObject.construct_from(responses[0], client=client)
+
+        patchers = [
+            mock.patch("quartzbio.cli.data.global_client"),
+            mock.patch("quartzbio.resource.object.Object.all", side_effect=all),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_walk_objects(self):
+        from quartzbio.cli.data import walk_objects
+
+        results = list(walk_objects("acme:v:/*", recursive=True, max_workers=1))
+        self.assertEqual(
+            [obj.full_path for obj, _ in results],
+            [o["full_path"] for o in self.objects],
+        )
+        self.assertEqual(
+            self.globs, ["acme:v:/*", "acme:v:/a/*", "acme:v:/a/b/*", "acme:v:/a/c/*"]
+        )
+
+        # Not recursive: only the first level, with all pages
+        self.assertEqual(len(list(walk_objects("acme:v:/a/*"))), 2)
+        self.assertEqual(len(list(walk_objects("acme:v:/a/c/*"))), 3)
+
+    def test_walk_objects_shortcuts(self):
+        from quartzbio.cli.data import ShortcutResolver, walk_objects
+
+        resolver = ShortcutResolver()
+        folder = Object.construct_from(self.objects[0])
+        with mock.patch.object(resolver, "get_target", return_value=folder):
+            results = list(
+                walk_objects(
+                    "acme:v:/*", recursive=True, follow_shortcuts=True, resolver=resolver
+                )
+            )
+        self.assertEqual(len(results), 7)
+        self.assertEqual(
+            [target for obj, target in results if obj.is_shortcut], [folder]
+        )
+        # The shortcut leads to a folder that was already listed
+        self.assertEqual(len(self.globs), 4)
+
+
+class CreateFoldersTests(unittest.TestCase):
+    @mock.patch("builtins.print")
+    @mock.patch("quartzbio.cli.data.global_client")
+    @mock.patch("quartzbio.resource.object.Object.create")
+    @mock.patch("quartzbio.resource.object.Object.get_by_full_path")
+    def test_create_folders(self, GetByFullPath, ObjectCreate, GlobalClient, Print):
+        from quartzbio.cli.data import _create_folders
+
+        GetByFullPath.side_effect = NotFoundError
+        ids = {"a": 1, "b": 2, "c": 3, "d": 4}
+        ObjectCreate.side_effect = lambda **kwargs: mock.Mock(
+            id=ids[kwargs["filename"]], path=kwargs["filename"]
+        )
+
+        vault = mock.Mock(id=10)
+        folder_ids = _create_folders(
+            vault,
+            ["acme:v:/a/b/d", "acme:v:/a", "acme:v:/a/c", "acme:v:/a/b"],
+            max_workers=2,
+        )
+        self.assertEqual(
+            folder_ids,
+            {"acme:v:/a": 1, "acme:v:/a/b": 2, "acme:v:/a/c": 3, "acme:v:/a/b/d": 4},
+        )
+
+        parents = dict(
+            (c[1]["filename"], c[1]["parent_object_id"]) for c in ObjectCreate.call_args_list
+        )
+        self.assertEqual(parents, {"a": None, "b": 1, "c": 1, "d": 2})
+        # Parents are not looked up: one existence check per folder
+        self.assertEqual(GetByFullPath.call_count, 4)
+
+
+class UploadWorkerTests(unittest.TestCase):
+    @mock.patch("quartzbio.resource.vault.Vault.get_by_full_path")
+    @mock.patch("quartzbio.resource.object.Object.get_by_full_path")
+    def test_get_folder(self, GetByFullPath, VaultGetByFullPath):
+        from quartzbio.cli import data
+
+        data._init_upload_worker(CLIENT_AUTH, {"acme:v:/a": 1, "acme:v:/a/b": 2})
+        worker = data._get_upload_worker(CLIENT_AUTH)
+
+        vault = mock.Mock(full_path="acme:v")
+        VaultGetByFullPath.return_value = vault
+        self.assertEqual(worker.get_folder("acme:v:/a"), ("/a", vault, 1))
+        self.assertEqual(worker.get_folder("acme:v:/a/b"), ("/a/b", vault, 2))
+        self.assertEqual(VaultGetByFullPath.call_count, 1)
+        GetByFullPath.assert_not_called()
+
+        # Folders that were not created by the upload are looked up once
+        GetByFullPath.return_value = mock.Mock(path="/c", id=3, vault_id=5)
+        for _ in range(3):
+            folder = worker.get_folder("acme:v:/c")
+        self.assertEqual(folder, ("/c", GetByFullPath.return_value.vault, 3))
+        self.assertEqual(GetByFullPath.call_count, 1)
+
+        # The worker is the same for all the files
+        self.assertIs(data._get_upload_worker(CLIENT_AUTH), worker)
+        self.assertIsNot(data._get_upload_worker(("https://other", "x", "Token")), worker)
+
+
+class ThreadedUploadTests(unittest.TestCase):
+    @mock.patch("quartzbio.cli.data._UploadWorker.get_folder")
+    @mock.patch("quartzbio.resource.object.Object.upload_file")
+    def test_upload_files_threaded(self, UploadFile, GetFolder):
+        from quartzbio.cli.data import _upload_files_threaded
+
+        vault = mock.Mock(full_path="acme:v")
+        GetFolder.return_value = ("/a", vault, 1)
+        all_files = upload_files(10)
+        _upload_files_threaded(all_files, 4, CLIENT_AUTH, {"acme:v:/a": 1})
+
+        self.assertEqual(
+            sorted(c[0][0] for c in UploadFile.call_args_list),
+            sorted("file-%d" % i for i in range(10)),
+        )
+        kwargs = UploadFile.call_args[1]
+        self.assertEqual(kwargs["parent_object_id"], 1)
+        # With 4 files at once, each file uploads its parts with one thread
+        self.assertEqual(kwargs["num_processes"], 1)
+        self.assertEqual(kwargs["limiter"].max_concurrency, 4)
+
+        # A single file uploads its parts with all the threads
+        _upload_files_threaded(all_files[:1], 4, CLIENT_AUTH, {"acme:v:/a": 1})
+        self.assertEqual(UploadFile.call_args[1]["num_processes"], 4)
+
+        # Errors stop the upload
+        UploadFile.side_effect = Exception("Upload failed")
+        with self.assertRaises(Exception):
+            _upload_files_threaded(all_files, 4, CLIENT_AUTH, {})
+
+    @mock.patch("quartzbio.cli.data._UploadWorker.get_folder")
+    @mock.patch("quartzbio.resource.object.Object.upload_file")
+    def test_upload_files_threaded_interrupt(self, UploadFile, GetFolder):
+        from concurrent.futures import ThreadPoolExecutor
+
+        from quartzbio.cli.data import _upload_files_threaded
+
+        GetFolder.return_value = ("/a", mock.Mock(full_path="acme:v"), 1)
+        UploadFile.side_effect = KeyboardInterrupt
+        shutdown = ThreadPoolExecutor.shutdown
+        with mock.patch.object(
+            ThreadPoolExecutor, "shutdown", autospec=True, side_effect=shutdown
+        ) as Shutdown:
+            with self.assertRaises(KeyboardInterrupt):
+                _upload_files_threaded(upload_files(10), 4, CLIENT_AUTH, {})
+        # Ctrl-C does not wait for the uploads in flight
+        self.assertFalse(Shutdown.call_args[1]["wait"])
@@ -2,7 +2,9 @@ import os
 
 from .helper import QuartzBioTestCase
 from unittest import TestCase
+from quartzbio.utils.files import FileSlice
 from quartzbio.utils.files import check_gzip_path, separate_filename_extension
+from quartzbio.utils.md5sum import md5sum, multipart_md5sum
 
 FILENAME_PARAMS = [
     {"filename": "test.txt", "base": "test", "ext": ".txt", "compression": ""},
@@ -40,3 +42,414 @@ class GzipTest(QuartzBioTestCase):
         ]:
             path = os.path.join(path, non_gzip)
             self.assertFalse(check_gzip_path(path), path)
+
+
+class Md5sumTests(TestCase):
+    def test_multipart_md5sum(self):
+        import hashlib
+        import shutil
+        import tempfile
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        path = os.path.join(tempdir, "file.bin")
+        data = os.urandom(2500)
+        with open(path, "wb") as f:
+            f.write(data)
+
+        file_md5, part_md5s = multipart_md5sum(path, part_size=1000, block_size=300)
+        self.assertEqual(file_md5, md5sum(path, multipart_threshold=None)[0])
+        self.assertEqual(
+            part_md5s,
+            {
+                (0, 1000): hashlib.md5(data[:1000]).hexdigest(),
+                (1000, 1000): hashlib.md5(data[1000:2000]).hexdigest(),
+                (2000, 500): hashlib.md5(data[2000:]).hexdigest(),
+            },
+        )
+
+
+class UploadStateTests(TestCase):
+    def test_upload_state(self):
+        import shutil
+        import tempfile
+
+        from quartzbio.utils.upload_state import UploadState
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        path = os.path.join(tempdir, "file.bin")
+        with open(path, "wb") as f:
+            f.write(b"0123456789")
+
+        self.assertIsNone(UploadState.load(path, "acme:vault:/file.bin", tempdir))
+
+        state = UploadState(path, "acme:vault:/file.bin", state_dir=tempdir)
+        state.md5 = "md5"
+        state.object_id = 1
+        state.layout = [(1, 0, 5), (2, 5, 5)]
+        state.add_part(2, "etag")
+        state.save()
+
+        loaded = UploadState.load(path, "acme:vault:/file.bin", state_dir=tempdir)
+        self.assertEqual(loaded.parts, {2: "etag"})
+        self.assertEqual(loaded.missing_parts(), [(1, 0, 5)])
+        # States are specific to the remote path
+        self.assertIsNone(UploadState.load(path, "acme:vault:/other.bin", tempdir))
+
+        # A modified file cannot be resumed
+        os.utime(path, (0, 0))
+        self.assertIsNone(UploadState.load(path, "acme:vault:/file.bin", tempdir))
+        self.assertFalse(os.path.exists(state.path))
+
+
+class SyncIndexTests(TestCase):
+    def test_sync_index(self):
+        import shutil
+        import tempfile
+
+        import mock
+
+        from quartzbio.utils import sync_index
+        from quartzbio.utils.sync_index import SyncIndex
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        path = os.path.join(tempdir, "file.bin")
+        with open(path, "wb") as f:
+            f.write(b"0123456789")
+
+        index = SyncIndex(os.path.join(tempdir, "index", "sync.sqlite3"))
+        expected = md5sum(path)[0]
+        self.assertEqual(index.md5sum(path), expected)
+        file_md5, part_md5s = index.multipart_md5sum(path)
+        self.assertEqual(file_md5, expected)
+        self.assertEqual(part_md5s, {(0, 10): expected})
+
+        # Unchanged files are not hashed again, by any process using the index
+        index = SyncIndex(index.path)
+        with mock.patch.object(sync_index, "md5sum") as _md5sum:
+            self.assertEqual(index.md5sum(path), expected)
+            _md5sum.assert_not_called()
+        self.assertEqual(index.multipart_md5sum(path), (expected, None))
+
+        # Modified files are hashed again
+        with open(path, "wb") as f:
+            f.write(b"abcdefghijk")
+        self.assertEqual(index.md5sum(path), md5sum(path)[0])
+
+    def test_sync_index_unavailable(self):
+        import tempfile
+
+        from quartzbio.utils.sync_index import SyncIndex
+
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b"0123456789")
+            f.flush()
+            # The index cannot be created inside a file
+            index = SyncIndex(os.path.join(f.name, "sync.sqlite3"))
+            self.assertEqual(index.md5sum(f.name), md5sum(f.name)[0])
+            self.assertTrue(index._disabled)
+
+
+class TransferLimiterTests(TestCase):
+    def test_transfer_limits(self):
+        import threading
+        import time
+
+        from quartzbio.utils.transfer_limiter import TransferLimiter
+
+        limiter = TransferLimiter(max_concurrency=3, max_bytes_in_flight=1000)
+        lock = threading.Lock()
+        running = []
+        peaks = {"transfers": 0, "bytes": 0}
+
+        def transfer(nbytes):
+            with limiter.transfer(nbytes):
+                with lock:
+                    running.append(nbytes)
+                    peaks["transfers"] = max(peaks["transfers"], len(running))
+                    peaks["bytes"] = max(peaks["bytes"], limiter.bytes_in_flight)
+                time.sleep(0.01)
+                with lock:
+                    running.remove(nbytes)
+
+        # Transfers are limited by the memory budget...
+        threads = [threading.Thread(target=transfer, args=(400,)) for _ in range(6)]
+        # ...or by the number of slots
+        threads += [threading.Thread(target=transfer, args=(0,)) for _ in range(6)]
+        # A transfer larger than the budget runs alone
+        threads.append(threading.Thread(target=transfer, args=(5000,)))
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertLessEqual(peaks["transfers"], 3)
+        self.assertLessEqual(peaks["bytes"], 1000)
+        self.assertEqual(limiter.bytes_in_flight, 0)
+
+
+class AdaptiveConcurrencyTests(TestCase):
+    def sample(self, concurrency, tracker, clock, speed):
+        # Complete a window of parts at the given speed (bytes/second)
+        for _ in range(concurrency.limit):
+            clock["now"] += 1
+            tracker.completed_bytes += speed
+            concurrency.part_completed()
+
+    def test_adaptive_concurrency(self):
+        import mock
+
+        from quartzbio.utils.adaptive_concurrency import AdaptiveConcurrency
+
+        clock = {"now": 0}
+        tracker = mock.Mock(completed_bytes=0)
+        with mock.patch(
+            "quartzbio.utils.adaptive_concurrency.time.time",
+            side_effect=lambda: clock["now"],
+        ):
+            concurrency = AdaptiveConcurrency(tracker, max_concurrency=16)
+            self.assertEqual(concurrency.limit, 2)
+
+            # The limit doubles while the throughput improves
+            self.sample(concurrency, tracker, clock, 100)
+            self.assertEqual(concurrency.limit, 4)
+            self.sample(concurrency, tracker, clock, 200)
+            self.assertEqual(concurrency.limit, 8)
+
+            # The link is saturated: back off, then grow one part at a time
+            self.sample(concurrency, tracker, clock, 200)
+            self.assertEqual(concurrency.limit, 7)
+            self.assertFalse(concurrency.slow_start)
+            self.sample(concurrency, tracker, clock, 300)
+            self.assertEqual(concurrency.limit, 8)
+            self.sample(concurrency, tracker, clock, 300)
+            self.assertEqual(concurrency.limit, 7)
+            self.sample(concurrency, tracker, clock, 300)
+            self.assertEqual(concurrency.limit, 7)
+
+            # Throttling halves the limit
+            concurrency.throttled()
+            self.assertEqual(concurrency.limit, 3)
+
+            # The limit stays within bounds
+            for _ in range(5):
+                concurrency.throttled()
+            self.assertEqual(concurrency.limit, 1)
+            for i in range(20):
+                self.sample(concurrency, tracker, clock, 1000 * 2**i)
+            self.assertEqual(concurrency.limit, 16)
+
+
+class FileSliceTests(TestCase):
+    def test_file_slice(self):
+        import io
+        import shutil
+        import tempfile
+
+        tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempdir)
+        path = os.path.join(tempdir, "file.bin")
+        with open(path, "wb") as f:
+            f.write(b"0123456789")
+
+        with FileSlice(path, 2, 5) as part:
+            self.assertEqual(len(part), 5)
+            self.assertEqual(part.read(3), b"234")
+            self.assertEqual(part.read(), b"56")
+            self.assertEqual(part.read(), b"")
+            # Retries read the slice again from the start
+            part.seek(0)
+            self.assertEqual(part.read(), b"23456")
+            self.assertEqual(part.seek(-2, io.SEEK_END), 3)
+            self.assertEqual(part.read(10), b"56")
+        self.assertTrue(part.closed)
+
+        # The last slice is cut at the end of the file
+        with FileSlice(path, 8, 5) as part:
+            self.assertEqual(len(part), 2)
+            self.assertEqual(part.read(), b"89")
+
+        # A file object is shared, not closed
+        with open(path, "rb") as f:
+            with FileSlice(path, 0, 4, fileobj=f) as part:
+                self.assertEqual(part.read(), b"0123")
+            self.assertFalse(f.closed)
+
+
+class RateLimiterTests(TestCase):
+    def test_parse_rate(self):
+        from quartzbio.utils.throttle import parse_rate
+
+        self.assertEqual(parse_rate("1000"), 1000)
+        self.assertEqual(parse_rate("500K"), 500 * 1024)
+        self.assertEqual(parse_rate("1.5M"), int(1.5 * 1024 * 1024))
+        self.assertEqual(parse_rate("2GB/s"), 2 * 1024**3)
+        self.assertIsNone(parse_rate("0"))
+        with self.assertRaises(ValueError):
+            parse_rate("fast")
+
+    def test_rate_limiter(self):
+        import mock
+
+        from quartzbio.utils import throttle
+
+        clock = {"now": 100.0}
+
+        def sleep(seconds):
+            clock["now"] += seconds
+
+        with mock.patch.object(
+            throttle.time, "monotonic", side_effect=lambda: clock["now"]
+        ), mock.patch.object(throttle.time, "sleep", side_effect=sleep):
+            limiter = throttle.RateLimiter(1000, burst=1000)
+
+            # A burst is sent at once after the limiter was idle...
+            limiter.consume(1000)
+            self.assertEqual(clock["now"], 100.0)
+            # ...then transfers wait for the rate
+            limiter.consume(3000)
+            self.assertAlmostEqual(clock["now"], 103.0)
+
+            reader = throttle.ThrottledReader(mock.Mock(), limiter)
+            reader._f.read.return_value = b"x" * 500
+            self.assertEqual(reader.read(500), b"x" * 500)
+            self.assertAlmostEqual(clock["now"], 103.5)
+
+        # No limiter, no wrapper
+        fileobj = object()
+        self.assertIs(throttle.throttle(fileobj, None), fileobj)
+
+    def test_rate_limiter_threads(self):
+        import threading
+        import time
+
+        from quartzbio.utils.throttle import RateLimiter
+
+        limiter = RateLimiter(100 * 1024, burst=1)
+        start = time.monotonic()
+        threads = [
+            threading.Thread(target=limiter.consume, args=(5 * 1024,))
+            for _ in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 20 KB shared by all threads at 100 KB/s
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+
+class RequestLimiterTests(TestCase):
+    def response(self, status_code=200, **headers):
+        import mock
+        from requests.structures import CaseInsensitiveDict
+
+        return mock.Mock(status_code=status_code, headers=CaseInsensitiveDict(headers))
+
+    def test_parse_retry_after(self):
+        from quartzbio.utils.request_limiter import parse_retry_after
+
+        self.assertEqual(parse_retry_after("3"), 3)
+        self.assertEqual(parse_retry_after("-1"), 0)
+        self.assertEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+    def test_request_limiter(self):
+        import mock
+
+        from quartzbio.utils import request_limiter
+
+        clock = {"now": 100.0}
+        with mock.patch.object(
+            request_limiter.time, "monotonic", side_effect=lambda: clock["now"]
+        ):
+            limiter = request_limiter.RequestLimiter(max_retries=2)
+            self.assertEqual(limiter.delay(), 0)
+            self.assertIsNone(limiter.update(self.response()))
+
+            # A 429 pauses all callers, then releases them one at a time
+            self.assertEqual(limiter.update(self.response(429, **{"Retry-After": "2"})), 3)
+            self.assertEqual(limiter.delay(), 3)
+            self.assertAlmostEqual(limiter.delay(), 3 + limiter.interval)
+
+            # Without retry-after, the delay backs off with the retries
+            self.assertEqual(limiter.update(self.response(429), retries=1), 2)
+            # ...and requests are not retried forever
+            self.assertIsNone(limiter.update(self.response(429), retries=2))
+
+            # Successful responses decay the spacing of requests
+            clock["now"] += 10
+            for _ in range(20):
+                limiter.update(self.response())
+            self.assertEqual(limiter.interval, 0)
+            self.assertEqual(limiter.delay(), 0)
+
+            # Rate limit headers spread the remaining requests over the window
+            limiter.update(
+                self.response(**{"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": "5"})
+            )
+            self.assertEqual(limiter.interval, 0.5)
+            limiter.update(
+                self.response(**{"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "5"})
+            )
+            self.assertAlmostEqual(limiter.delay(), 5)
+
+
+class SingleFlightTests(TestCase):
+    def test_single_flight(self):
+        import threading
+
+        from quartzbio.utils.single_flight import SingleFlight
+
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {"id": 1}
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("a", fetch)))
+        leader.start()
+        started.wait(5)
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do("a", fetch)))
+            for _ in range(3)
+        ]
+        for thread in followers:
+            thread.start()
+        # Wait for the followers to join the call in flight
+        while flight._calls["a"].followers < 3:
+            pass
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{"id": 1}] * 4)
+        # Each caller gets its own copy
+        self.assertEqual(len(set(id(result) for result in results)), 4)
+
+        # Nothing is cached once the call returned
+        release.set()
+        flight.do("a", fetch)
+        self.assertEqual(len(calls), 2)
+
+    def test_single_flight_error(self):
+        from quartzbio.utils.single_flight import SingleFlight
+
+        flight = SingleFlight()
+
+        def fail():
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            flight.do("a", fail)
+        self.assertEqual(flight._calls, {})
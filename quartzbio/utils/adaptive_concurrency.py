@@ -0,0 +1,92 @@
+"""Adaptive concurrency of the parts of a multipart upload"""
+
+import threading
+import time
+
+# HTTP status codes returned by storage when it throttles requests
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+class AdaptiveConcurrency(object):
+    """
+    Chooses how many parts of a multipart upload are uploaded at once,
+    from the throughput measured by an UploadProgressTracker.
+
+    The throughput is sampled each time as many parts complete as the
+    current limit. Like TCP congestion control, the limit starts low and
+    doubles while the throughput keeps improving ("slow start"), then
+    grows by one part at a time while it still improves and shrinks by
+    one when it falls. If storage throttles requests, the limit is halved.
+
+    Usage:
+
+        concurrency = AdaptiveConcurrency(progress_tracker, max_concurrency=16)
+        # submit up to concurrency.limit parts, and after each one:
+        progress_tracker.update_progress(part_size)
+        concurrency.part_completed()
+    """
+
+    # Minimum relative change in throughput that is not noise
+    THRESHOLD = 0.1
+
+    def __init__(self, progress_tracker, max_concurrency, initial=2, min_concurrency=1):
+        self.progress_tracker = progress_tracker
+        self.max_concurrency = max(max_concurrency, 1)
+        self.min_concurrency = min(min_concurrency, self.max_concurrency)
+        self.limit = max(self.min_concurrency, min(initial, self.max_concurrency))
+        self.slow_start = True
+
+        self._lock = threading.Lock()
+        self._last_speed = None
+        # Whether the last change of the limit was an increase
+        self._grew = False
+        self._start_window()
+
+    def _start_window(self):
+        self._window_start = time.time()
+        self._window_bytes = self.progress_tracker.completed_bytes
+        self._window_parts = 0
+
+    def part_completed(self):
+        """Samples the throughput once enough parts completed at the current limit"""
+        with self._lock:
+            self._window_parts += 1
+            if self._window_parts < self.limit:
+                return
+
+            elapsed = time.time() - self._window_start
+            if elapsed <= 0:
+                return
+            speed = (
+                self.progress_tracker.completed_bytes - self._window_bytes
+            ) / elapsed
+            self._adjust(speed)
+            self._start_window()
+
+    def _adjust(self, speed):
+        last_speed = self._last_speed
+        self._last_speed = speed
+        limit = self.limit
+
+        if last_speed is None or speed > last_speed * (1 + self.THRESHOLD):
+            # More parts at once still use more of the link
+            limit = limit * 2 if self.slow_start else limit + 1
+        else:
+            self.slow_start = False
+            if speed < last_speed * (1 - self.THRESHOLD) or self._grew:
+                # Fewer parts did as well (or the last one added did not help)
+                limit -= 1
+
+        limit = max(self.min_concurrency, min(limit, self.max_concurrency))
+        self._grew = limit > self.limit
+        self.limit = limit
+
+    def throttled(self):
+        """Halves the limit when storage throttles a part (thread-safe)"""
+        with self._lock:
+            self.slow_start = False
+            self._grew = False
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            # The throughput of the new limit is measured from scratch
+            self._last_speed = None
+            self._start_window()
@@ -0,0 +1,256 @@
+"""Decoding of query result pages into typed columns (NumPy or Arrow)"""
+
+import json
+
+# NumPy dtypes for dataset field data types.
+# Other data types (string, text, blob, date, object) are stored as objects.
+NUMPY_DTYPES = {
+    "boolean": "bool",
+    "double": "float64",
+    "float": "float32",
+    "integer": "int32",
+    "long": "int64",
+}
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "NumPy is required for columnar query results: pip install numpy"
+        )
+    return numpy
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "PyArrow is required for Arrow query results: pip install pyarrow"
+        )
+    return pyarrow
+
+
+def arrow_type(data_type, is_list=False):
+    """Returns the Arrow type for a dataset field data type"""
+    pa = _import_pyarrow()
+
+    types = {
+        "boolean": pa.bool_(),
+        "double": pa.float64(),
+        "float": pa.float32(),
+        "integer": pa.int32(),
+        "long": pa.int64(),
+        "string": pa.string(),
+        "text": pa.string(),
+        "blob": pa.string(),
+        "date": pa.string(),
+    }
+    # Objects (and unknown types) are inferred from the values
+    type_ = types.get(data_type)
+    if type_ is not None and is_list:
+        type_ = pa.list_(type_)
+    return type_
+
+
+def _has_fraction(values):
+    """Whether any value is a float that an integer column would truncate"""
+    return any(isinstance(v, float) and not v.is_integer() for v in values)
+
+
+def _to_json(value):
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+class NumpyColumn(object):
+    """
+    A growable typed column backed by a NumPy array and a null mask.
+
+    Non-integral numbers in an integer column convert it to a float
+    column. Non-boolean values in a boolean column, and other values that
+    cannot be stored with the dtype of the field, convert the column to
+    an object column.
+    """
+
+    def __init__(self, name, data_type=None, is_list=False, capacity=0):
+        self._np = _import_numpy()
+        self.name = name
+        dtype = None if is_list else NUMPY_DTYPES.get(data_type)
+        self.dtype = self._np.dtype(dtype or object)
+        self.size = 0
+        self.data = self._np.empty(capacity, dtype=self.dtype)
+        self.mask = self._np.zeros(capacity, dtype=bool)
+
+    def _reserve(self, n):
+        capacity = len(self.data)
+        if self.size + n <= capacity:
+            return
+
+        capacity = max(self.size + n, capacity * 2)
+        data = self._np.empty(capacity, dtype=self.dtype)
+        data[: self.size] = self.data[: self.size]
+        mask = self._np.zeros(capacity, dtype=bool)
+        mask[: self.size] = self.mask[: self.size]
+        self.data, self.mask = data, mask
+
+    def _as_objects(self):
+        self.dtype = self._np.dtype(object)
+        self.data = self.data.astype(object)
+        # Object columns store nulls as None rather than masked zeros
+        self.data[: self.size][self.mask[: self.size]] = None
+
+    def _as_floats(self):
+        self.dtype = self._np.dtype("float64")
+        self.data = self.data.astype(self.dtype)
+
+    def extend(self, values):
+        n = len(values)
+        self._reserve(n)
+        start, end = self.size, self.size + n
+
+        nulls = [v is None for v in values]
+        self.mask[start:end] = nulls
+
+        if self.dtype.kind in "iu" and _has_fraction(values):
+            # NumPy would truncate them
+            self._as_floats()
+        elif self.dtype.kind == "b" and any(
+            not (v is None or isinstance(v, (bool, self._np.bool_))) for v in values
+        ):
+            # NumPy would convert "false" or 0.5 to True
+            self._as_objects()
+
+        if self.dtype != object:
+            if any(nulls):
+                values = [self.dtype.type(0) if v is None else v for v in values]
+            try:
+                self.data[start:end] = self._np.asarray(values, dtype=self.dtype)
+            except (TypeError, ValueError, OverflowError):
+                self._as_objects()
+
+        if self.dtype == object:
+            # Element-wise assignment keeps lists and dicts as single values
+            chunk = self._np.empty(n, dtype=object)
+            chunk[:] = [None if null else v for v, null in zip(values, nulls)]
+            self.data[start:end] = chunk
+
+        self.size = end
+
+    def to_array(self):
+        """Returns a NumPy array, or a masked array if there are nulls."""
+        data = self.data[: self.size]
+        mask = self.mask[: self.size]
+        if self.dtype != object and mask.any():
+            return self._np.ma.MaskedArray(data, mask=mask)
+        return data
+
+
+class ArrowColumn(object):
+    """
+    A column of Arrow arrays, one chunk per page of results.
+
+    Values that cannot be stored with the type of the field
+    convert the column to a string column (lists and objects as JSON).
+    """
+
+    def __init__(self, name, data_type=None, is_list=False):
+        self._pa = _import_pyarrow()
+        self.name = name
+        self.type = arrow_type(data_type, is_list=is_list)
+        self.chunks = []
+        self.size = 0
+
+    def _as_strings(self):
+        string = self._pa.string()
+        chunks = []
+        for chunk in self.chunks:
+            try:
+                chunks.append(chunk.cast(string))
+            except (self._pa.ArrowInvalid, self._pa.ArrowNotImplementedError):
+                chunks.append(self._pa.array(
+                    [_to_json(v) for v in chunk.to_pylist()], type=string
+                ))
+        self.chunks = chunks
+        self.type = string
+
+    def extend(self, values):
+        if self.size and len(values) == 0:
+            return
+
+        if self.type == self._pa.string():
+            values = [_to_json(v) for v in values]
+
+        type_ = self.type
+        if type_ == self._pa.null():
+            # Only nulls so far: infer the type from this page
+            type_ = None
+        elif type_ is not None and self._pa.types.is_integer(type_) and _has_fraction(values):
+            # Arrow would truncate them: the earlier chunks are cast below
+            type_ = self._pa.float64()
+
+        try:
+            chunk = self._pa.array(values, type=type_)
+        except (self._pa.ArrowInvalid, self._pa.ArrowTypeError):
+            self._as_strings()
+            chunk = self._pa.array([_to_json(v) for v in values], type=self.type)
+
+        if self.type is None or self.type != chunk.type:
+            # The first non-null chunk of an object column sets its type
+            try:
+                chunks = [c.cast(chunk.type) for c in self.chunks]
+            except (
+                self._pa.ArrowInvalid,
+                self._pa.ArrowNotImplementedError,
+                self._pa.ArrowTypeError,
+            ):
+                self._as_strings()
+                chunk = self._pa.array([_to_json(v) for v in values], type=self.type)
+            else:
+                self.chunks = chunks
+                self.type = chunk.type
+        self.chunks.append(chunk)
+        self.size += len(values)
+
+    def to_array(self):
+        if not self.chunks:
+            return self._pa.chunked_array([], type=self.type or self._pa.null())
+        return self._pa.chunked_array(self.chunks, type=self.type)
+
+
+def decode_pages(pages, fields, column_class, **kwargs):
+    """
+    Decodes pages of records into columns.
+
+    Args:
+        pages: An iterable of lists of records (dicts).
+        fields: A list of (name, data_type, is_list) tuples. Record keys
+            that are not in the list are decoded as objects.
+        column_class: NumpyColumn or ArrowColumn.
+
+    Returns:
+        list: The columns, in the order of the fields.
+    """
+    columns = [column_class(name, data_type, is_list, **kwargs)
+               for name, data_type, is_list in fields]
+    by_name = dict((c.name, c) for c in columns)
+    size = 0
+
+    for page in pages:
+        # Unexpected keys (e.g. target fields) become additional columns
+        for record in page:
+            for key in record:
+                if key not in by_name:
+                    column = column_class(key, **kwargs)
+                    column.extend([None] * size)
+                    columns.append(column)
+                    by_name[key] = column
+
+        for column in columns:
+            column.extend([record.get(column.name) for record in page])
+        size += len(page)
+
+    return columns
@@ -0,0 +1,427 @@
+"""Parallel, resumable ranged downloads of presigned file URLs"""
+
+import binascii
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ..client import _handle_api_error
+from ..errors import FileDownloadError
+from .md5sum import multipart_md5sum
+from .throttle import MAX_CHUNK_SIZE
+
+logger = logging.getLogger("quartzbio")
+
+# Maximum and minimum size of the byte ranges requested by each connection
+DOWNLOAD_SEGMENT_SIZE = 64 * 1024 * 1024
+MIN_DOWNLOAD_SEGMENT_SIZE = 8 * 1024 * 1024
+# Size of the chunks read from a response and written to the file
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Downloads are written to <path>.part, with the completed byte ranges
+# saved in <path>.part.json, and renamed to <path> once complete
+PART_SUFFIX = ".part"
+PART_STATE_SUFFIX = ".part.json"
+# Files smaller than this are downloaded through a single stream by default,
+# without a probe request or partial files
+RESUMABLE_DOWNLOAD_MIN_SIZE = 64 * 1024 * 1024
+
+
+def _stream(response, rate_limiter=None):
+    # Read the raw bytes so that gzipped files are not decompressed
+    if rate_limiter is None:
+        return response.raw.stream(DOWNLOAD_CHUNK_SIZE, decode_content=False)
+    return _throttled_stream(response, rate_limiter)
+
+
+def _throttled_stream(response, rate_limiter):
+    # Small chunks, so that the connections sharing the limit take turns
+    for chunk in response.raw.stream(MAX_CHUNK_SIZE, decode_content=False):
+        rate_limiter.consume(len(chunk))
+        yield chunk
+
+
+def probe_download(session, url):
+    """
+    Requests the first byte of the URL.
+
+    Returns the total size of the file (or None if the server does not
+    support range requests) and its ETag.
+    """
+    response = session.get(url, headers={"Range": "bytes=0-0"}, stream=True)
+    with response:
+        if (
+            response.status_code == 416
+            and response.headers.get("Content-Range", "").strip() == "bytes */0"
+        ):
+            # The first byte of an empty file is not satisfiable
+            return 0, response.headers.get("ETag")
+        if not (200 <= response.status_code < 400):
+            _handle_api_error(response)
+        if response.status_code != 206:
+            return None, None
+        etag = response.headers.get("ETag")
+        # Content-Range: bytes 0-0/<size>
+        content_range = response.headers.get("Content-Range", "")
+        try:
+            return int(content_range.rsplit("/", 1)[1]), etag
+        except (IndexError, ValueError):
+            return None, None
+
+
+def probe_range_support(session, url):
+    """
+    Returns the total size of the file if the server supports
+    range requests, otherwise None.
+    """
+    return probe_download(session, url)[0]
+
+
+def partial_download_target(path):
+    """
+    Returns the path of the file being downloaded if path is the
+    partial file (or state file) of a download, otherwise None.
+    """
+    for suffix in (PART_STATE_SUFFIX, PART_SUFFIX):
+        if path.endswith(suffix):
+            return path[: -len(suffix)]
+    return None
+
+
+def verify_md5(path, expected_md5):
+    """
+    Checks the MD5 of a downloaded file against the MD5 of the object,
+    which is either a plain MD5 or a multipart MD5 (of the part MD5s).
+    """
+    file_md5, part_md5s = multipart_md5sum(path)
+    candidates = set([file_md5])
+    if len(part_md5s) > 1:
+        digests = "".join(md5 for _, md5 in sorted(part_md5s.items()))
+        candidates.add(hashlib.md5(binascii.unhexlify(digests)).hexdigest())
+
+    if expected_md5 not in candidates:
+        raise FileDownloadError(
+            "MD5 mismatch for {}: expected {}, got {}".format(
+                path, expected_md5, file_md5
+            )
+        )
+
+
+class _FileWriter(object):
+    """Positional writes into a file, safe to use from several threads"""
+
+    def __init__(self, path, size):
+        self._f = open(path, "r+b" if os.path.exists(path) else "w+b")
+        # Preallocate the file so that segments can be written in any order
+        self._f.truncate(size)
+        self._lock = threading.Lock()
+
+    def write(self, data, offset):
+        if hasattr(os, "pwrite"):
+            written = 0
+            while written < len(data):
+                written += os.pwrite(
+                    self._f.fileno(), data[written:], offset + written
+                )
+        else:
+            with self._lock:
+                self._f.seek(offset)
+                self._f.write(data)
+
+    def close(self):
+        self._f.close()
+
+
+class DownloadState(object):
+    """
+    The byte ranges of a download that have been written to the
+    partial file, saved to a JSON file next to it so that an
+    interrupted download can be resumed.
+
+    A state file is only valid for the same size and ETag of the
+    remote file, and while the partial file exists with that size.
+    """
+
+    # Minimum number of seconds between saves when chunks are written
+    SAVE_INTERVAL = 2.0
+
+    def __init__(self, path, size, etag=None):
+        self.part_path = path + PART_SUFFIX
+        self.path = path + PART_STATE_SUFFIX
+        self.size = size
+        self.etag = etag
+        # Sorted, non-overlapping list of completed [start, end) ranges
+        self.completed = []
+
+        self._lock = threading.Lock()
+        self._saved_at = 0
+
+    def load(self):
+        """
+        Loads the completed ranges of a previous download of the same
+        file. Returns the number of bytes already downloaded.
+        """
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return 0
+
+        try:
+            part_size = os.path.getsize(self.part_path)
+        except OSError:
+            part_size = None
+
+        if (
+            data.get("size") != self.size
+            or data.get("etag") != self.etag
+            or part_size != self.size
+        ):
+            # The remote file changed or the partial file is gone
+            self.delete()
+            return 0
+
+        self.completed = _merge_ranges(data["completed"])
+        return self.downloaded()
+
+    def downloaded(self):
+        return sum(end - start for start, end in self.completed)
+
+    def add(self, start, end):
+        """Records the written range [start, end) (thread-safe)"""
+        with self._lock:
+            self.completed = _merge_ranges(self.completed + [[start, end]])
+            if time.time() - self._saved_at >= self.SAVE_INTERVAL:
+                self._save()
+
+    def missing(self):
+        """Returns the [start, end) ranges that remain to be downloaded"""
+        missing = []
+        offset = 0
+        for start, end in self.completed:
+            if start > offset:
+                missing.append((offset, start))
+            offset = max(offset, end)
+        if offset < self.size:
+            missing.append((offset, self.size))
+        return missing
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        data = {"size": self.size, "etag": self.etag, "completed": self.completed}
+
+        # Write atomically so that a killed process leaves a valid file
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.time()
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _download_segment(
+    session, url, writer, start, end, max_retries=3, state=None, rate_limiter=None
+):
+    """
+    Downloads the bytes [start, end] of the URL, with retries.
+    Retries continue from the last byte received.
+    """
+    offset = start
+    for attempt in range(max_retries + 1):
+        try:
+            response = session.get(
+                url, headers={"Range": "bytes={}-{}".format(offset, end)}, stream=True
+            )
+            with response:
+                if response.status_code != 206:
+                    raise FileDownloadError(
+                        "Unexpected status code {} for range {}-{}".format(
+                            response.status_code, offset, end
+                        )
+                    )
+                for chunk in _stream(response, rate_limiter):
+                    writer.write(chunk, offset)
+                    if state is not None:
+                        state.add(offset, offset + len(chunk))
+                    offset += len(chunk)
+
+            if offset != end + 1:
+                raise FileDownloadError(
+                    "Incomplete range {}-{}: received {} bytes".format(
+                        start, end, offset - start
+                    )
+                )
+            return end - start + 1
+        except Exception as e:
+            if attempt == max_retries:
+                raise FileDownloadError(
+                    "Failed to download range {}-{}: {}".format(start, end, e)
+                )
+            wait_time = 2**attempt
+            logger.warning(
+                "Range {}-{} failed ({}), retrying in {}s".format(
+                    start, end, e, wait_time
+                )
+            )
+            time.sleep(wait_time)
+
+
+def download_stream(session, url, path, rate_limiter=None):
+    """Downloads the URL through one connection"""
+    response = session.get(url, stream=True)
+    with response:
+        if not (200 <= response.status_code < 400):
+            _handle_api_error(response)
+        with open(path, "wb") as fileobj:
+            for chunk in _stream(response, rate_limiter):
+                fileobj.write(chunk)
+
+
+def ranged_download(
+    session,
+    url,
+    path,
+    num_connections=4,
+    segment_size=DOWNLOAD_SEGMENT_SIZE,
+    md5=None,
+    max_retries=3,
+    resume=True,
+    rate_limiter=None,
+):
+    """
+    Downloads a URL into path with HTTP range requests over
+    num_connections parallel connections. Falls back to a single
+    stream if ranges are not supported.
+
+    The file is written to `<path>.part` and renamed to path once
+    complete. With resume, the byte ranges written so far are saved to
+    `<path>.part.json`, and a later download of the same remote file
+    only requests the missing ranges.
+
+    If md5 is set, the downloaded file is checked against it
+    (and removed if it does not match). All the connections share
+    the bandwidth of the rate_limiter, if set.
+
+    Returns the path to the file.
+    """
+    part_path = path + PART_SUFFIX
+    size, etag = probe_download(session, url)
+
+    if size is None:
+        try:
+            download_stream(session, url, part_path, rate_limiter)
+            if md5:
+                verify_md5(part_path, md5)
+        except BaseException:
+            _remove(part_path)
+            raise
+        os.replace(part_path, path)
+        return path
+
+    state = DownloadState(path, size, etag)
+    if resume:
+        downloaded = state.load()
+        if downloaded:
+            logger.info(
+                "Resuming download of {} ({} of {} bytes done)".format(
+                    path, downloaded, size
+                )
+            )
+    else:
+        state.delete()
+
+    missing = state.missing()
+    remaining = sum(end - start for start, end in missing)
+    if num_connections > 1:
+        # Spread smaller files over all the connections
+        segment_size = max(
+            MIN_DOWNLOAD_SEGMENT_SIZE,
+            min(segment_size, -(-remaining // num_connections)),
+        )
+    else:
+        # Request each missing range in one go
+        segment_size = max(remaining, 1)
+
+    # Inclusive byte ranges, as in the Range header
+    segments = [
+        (offset, min(offset + segment_size, end) - 1)
+        for start, end in missing
+        for offset in range(start, end, segment_size)
+    ]
+
+    try:
+        writer = _FileWriter(part_path, size)
+        try:
+            if segments:
+                with ThreadPoolExecutor(
+                    max_workers=min(num_connections, len(segments))
+                ) as executor:
+                    futures = [
+                        executor.submit(
+                            _download_segment,
+                            session,
+                            url,
+                            writer,
+                            start,
+                            end,
+                            max_retries,
+                            state if resume else None,
+                            rate_limiter,
+                        )
+                        for start, end in segments
+                    ]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except BaseException:
+                        for future in futures:
+                            future.cancel()
+                        raise
+        finally:
+            writer.close()
+    except BaseException:
+        if resume:
+            # Keep the partial file for the next attempt
+            state.save()
+        else:
+            _remove(part_path)
+        raise
+
+    state.delete()
+    if md5:
+        try:
+            verify_md5(part_path, md5)
+        except FileDownloadError:
+            _remove(part_path)
+            raise
+
+    os.replace(part_path, path)
+    return path
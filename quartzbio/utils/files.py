@@ -1,3 +1,4 @@
+import io
 import mimetypes
 import os
 import pathlib
@@ -63,3 +64,70 @@ def edp_path(path: str):
     win_path = pathlib.PureWindowsPath(path)
     posix_path = pathlib.PurePosixPath('/', *win_path.parts)
     return posix_path.as_posix().removeprefix("/")
+
+
+class FileSlice(io.RawIOBase):
+    """A read-only file object of the bytes [start, start + size) of a file.
+
+    Bytes are read from disk as they are consumed (e.g. streamed by
+    requests), with positional reads, so memory does not grow with the
+    size of the slice and several slices of one file can be read at once.
+    If fileobj is given, it is read instead of opening path (and is not
+    closed with the slice).
+    """
+
+    def __init__(self, path, start, size, fileobj=None):
+        super(FileSlice, self).__init__()
+        self._owns_file = fileobj is None
+        self._f = open(path, "rb") if fileobj is None else fileobj
+        file_size = os.fstat(self._f.fileno()).st_size
+        self.start = start
+        # The last part of a file may be shorter than the requested size
+        self.size = max(0, min(size, file_size - start))
+        self._pos = 0
+
+    def __len__(self):
+        return self.size
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._pos = max(0, min(offset, self.size))
+        return self._pos
+
+    def read(self, n=-1):
+        remaining = self.size - self._pos
+        if n is None or n < 0 or n > remaining:
+            n = remaining
+        if n == 0:
+            return b""
+
+        offset = self.start + self._pos
+        if hasattr(os, "pread"):
+            data = os.pread(self._f.fileno(), n, offset)
+        else:
+            self._f.seek(offset)
+            data = self._f.read(n)
+        self._pos += len(data)
+        return data
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[: len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed and self._owns_file:
+            self._f.close()
+        super(FileSlice, self).close()
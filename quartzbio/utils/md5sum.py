@@ -39,3 +39,38 @@ def md5sum(
                 md5.update(block)
 
     return md5.hexdigest(), block_count
+
+
+def multipart_md5sum(path, part_size=MULTIPART_CHUNKSIZE, block_size=8 * 1024 * 1024):
+    """
+    Computes the MD5 of a file and the MD5 of each of its parts
+    (of part_size bytes), reading the file only once.
+
+    Returns a tuple containing:
+
+        * The MD5 hex digest of the whole file
+        * A dict of part MD5 hex digests, keyed by (start_byte, size)
+    """
+    block_size = min(block_size, part_size)
+    file_md5 = hashlib.md5()
+    part_md5s = {}
+
+    with open(path, "rb") as f:
+        start = 0
+        while True:
+            part_md5 = hashlib.md5()
+            size = 0
+            while size < part_size:
+                block = f.read(min(block_size, part_size - size))
+                if not block:
+                    break
+                file_md5.update(block)
+                part_md5.update(block)
+                size += len(block)
+
+            if not size:
+                break
+            part_md5s[(start, size)] = part_md5.hexdigest()
+            start += size
+
+    return file_md5.hexdigest(), part_md5s
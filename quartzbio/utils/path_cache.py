@@ -0,0 +1,65 @@
+"""A cache of the API lookups made to resolve vault and object paths"""
+
+import copy
+import threading
+import time
+
+# Number of seconds lookups are cached for by default (disabled)
+DEFAULT_PATH_CACHE_TTL = 0
+
+# Kinds of cached lookups
+USER = "user"  # The current user (for the account domain and personal vault)
+VAULT = "vault"  # Vaults by full path
+OBJECT = "object"  # Objects by full path (or vault and path)
+
+
+class PathCache(object):
+    """
+    Caches the responses of the lookups that resolve paths (the current
+    user, vaults and objects by path) for `ttl` seconds.
+
+    Each client has its own cache, shared by its threads. Vault and
+    object lookups are invalidated when the client creates, updates
+    (e.g. moves) or deletes a vault or object; the user only expires.
+    Changes made by other clients are only seen once lookups expire.
+    A ttl of 0 disables the cache.
+    """
+
+    def __init__(self, ttl=DEFAULT_PATH_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        # Incremented by invalidate(), so that a lookup which was sent
+        # before an invalidation is not cached after it
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, kind, key, fetch, cache_if=None):
+        """
+        Returns a copy of the cached response of a lookup, or fetches
+        it with fetch() and caches it (if cache_if(response) is true).
+        """
+        if not self.ttl:
+            return fetch()
+
+        with self._lock:
+            entry = self._entries.get((kind, key))
+            generation = self._generation
+        if entry and entry[0] > time.monotonic():
+            return copy.deepcopy(entry[1])
+
+        value = fetch()
+        with self._lock:
+            if generation == self._generation and (cache_if is None or cache_if(value)):
+                self._entries[(kind, key)] = (time.monotonic() + self.ttl, value)
+        return copy.deepcopy(value)
+
+    def invalidate(self, *kinds):
+        """Removes the cached lookups of the given kinds (or all of them)"""
+        with self._lock:
+            self._generation += 1
+            if not kinds:
+                self._entries.clear()
+                return
+            for entry_key in list(self._entries):
+                if entry_key[0] in kinds:
+                    del self._entries[entry_key]
@@ -0,0 +1,135 @@
+"""A client-wide limiter of API requests, driven by 429 responses"""
+
+import email.utils
+import threading
+import time
+
+# Maximum number of times a request is retried after a 429 response
+DEFAULT_MAX_RETRIES = 10
+
+# Delay before retrying a 429 response without a retry-after header,
+# doubled for each retry of the request (up to MAX_BACKOFF)
+DEFAULT_BACKOFF = 1
+MAX_BACKOFF = 60
+
+# Bounds of the spacing of requests while recovering from a 429
+MIN_INTERVAL = 0.01
+MAX_INTERVAL = 5.0
+
+
+def _header(headers, *names):
+    """The first of the headers found (headers are case-insensitive)"""
+    for name in names:
+        value = headers.get(name)
+        if isinstance(value, (str, int, float)):
+            return value
+    return None
+
+
+def parse_retry_after(value):
+    """
+    Parses a retry-after header (a number of seconds, or an HTTP date)
+    into a number of seconds. Returns None if it is invalid.
+    """
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return max(date.timestamp() - time.time(), 0)
+
+
+class RequestLimiter(object):
+    """
+    Paces the API requests of all the threads that share a client,
+    from the rate limits the API reports.
+
+    A 429 response pauses all callers until its retry-after has elapsed,
+    instead of each thread sleeping on its own. Once the pause is over,
+    callers are released one at a time, spaced by an interval that
+    doubles with each 429 and decays with each successful response.
+    Rate limit headers (remaining requests and seconds until the limit
+    resets) spread the remaining requests over the rest of the window.
+
+    Usage:
+
+        time.sleep(limiter.delay())
+        response = session.request(...)
+        retry_in = limiter.update(response, retries)
+    """
+
+    # Factor applied to the interval after each response that is not a 429
+    DECAY = 0.8
+
+    def __init__(self, max_retries=DEFAULT_MAX_RETRIES):
+        self.max_retries = max_retries
+        self.interval = 0.0
+        self._lock = threading.Lock()
+        # No requests are released before this time
+        self._paused_until = 0.0
+        # The time of the next request released while pacing
+        self._next_slot = 0.0
+
+    def delay(self):
+        """
+        Returns how long the caller must wait before sending a request,
+        and books its place among the waiting callers.
+        """
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._paused_until, self._next_slot)
+            if self.interval:
+                self._next_slot = start + self.interval
+            return start - now
+
+    def update(self, response, retries=0):
+        """
+        Learns from the headers of a response. For a 429 response that
+        can be retried, returns the number of seconds until the retry,
+        otherwise returns None.
+        """
+        headers = response.headers
+        now = time.monotonic()
+
+        if response.status_code == 429:
+            retry_after = parse_retry_after(_header(headers, "retry-after"))
+            if retry_after is None:
+                wait = min(DEFAULT_BACKOFF * 2**retries, MAX_BACKOFF)
+            else:
+                wait = retry_after + 1
+            with self._lock:
+                self._paused_until = max(self._paused_until, now + wait)
+                self.interval = min(max(self.interval * 2, MIN_INTERVAL), MAX_INTERVAL)
+            if retries >= self.max_retries:
+                return None
+            return wait
+
+        remaining = _header(headers, "x-ratelimit-remaining", "ratelimit-remaining")
+        reset = _header(headers, "x-ratelimit-reset", "ratelimit-reset")
+        spread = 0.0
+        try:
+            remaining = int(remaining) if remaining is not None else None
+            reset = float(reset) if reset is not None else None
+        except ValueError:
+            remaining = reset = None
+        if reset is not None and reset > 1e9:
+            # An epoch timestamp rather than a number of seconds
+            reset = max(reset - time.time(), 0)
+
+        with self._lock:
+            if remaining is not None and reset is not None:
+                if remaining <= 0:
+                    self._paused_until = max(self._paused_until, now + reset)
+                else:
+                    spread = reset / remaining
+
+            interval = max(self.interval * self.DECAY, spread)
+            self.interval = min(interval, MAX_INTERVAL) if interval >= MIN_INTERVAL else 0.0
+        return None
@@ -0,0 +1,70 @@
+"""Coalescing of identical concurrent calls (single-flight)"""
+
+import copy
+import threading
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Runs only one of the identical calls made at the same time by
+    several threads: the callers that arrive while a call with the same
+    key is in flight wait for it and share its result (or exception).
+
+    Nothing is cached: a call made after the previous one returned runs
+    again. Each waiting caller gets a deep copy of the result, so callers
+    can modify what they get.
+
+    Usage:
+
+        flight = SingleFlight()
+        user = flight.do(("GET", "/v1/user"), lambda: client.whoami())
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Returns fn(), or the result of the call in flight with the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                call.followers += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                followers = call.followers
+            try:
+                if followers and call.error is None:
+                    # A snapshot for the followers, as the caller may modify result
+                    call.result = copy.deepcopy(result)
+            except Exception as error:
+                call.error = error
+            finally:
+                call.done.set()
+        return result
@@ -0,0 +1,228 @@
+"""Streaming writers for query results (NDJSON, CSV and Parquet)"""
+
+import csv
+import gzip
+import json
+import queue
+import threading
+
+from .files import check_gzip_path
+
+STREAM_FORMATS = ("ndjson", "csv", "parquet")
+
+# Marks the end of the page queue
+_DONE = object()
+
+
+def _open_text(path):
+    if check_gzip_path(path):
+        return gzip.open(path, "wt", newline="")
+    return open(path, "w", newline="")
+
+
+def _to_cell(value):
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+class NDJSONWriter(object):
+    """Writes one JSON record per line."""
+
+    def __init__(self, path, fields):
+        self._f = _open_text(path)
+
+    def write(self, records):
+        self._f.write("".join(json.dumps(r) + "\n" for r in records))
+
+    def close(self):
+        self._f.close()
+
+
+class CSVWriter(object):
+    """
+    Writes records as CSV with a header row of the query fields,
+    followed by the other keys of the first batch of records
+    (e.g. target fields). List and object values are encoded as JSON.
+
+    The header cannot change once written: a ValueError is raised
+    if a later record has a key that is not in the header.
+    """
+
+    def __init__(self, path, fields):
+        self._f = _open_text(path)
+        self._fields = [name for name, _, _ in fields]
+        self._writer = None
+
+    def write(self, records):
+        if self._writer is None:
+            names = list(self._fields)
+            seen = set(names)
+            for record in records:
+                for key in record:
+                    if key not in seen:
+                        names.append(key)
+                        seen.add(key)
+            self._writer = csv.DictWriter(
+                self._f, names, restval="", extrasaction="raise"
+            )
+            self._writer.writeheader()
+            self._fields = names
+
+        self._writer.writerows(
+            dict((k, _to_cell(v)) for k, v in r.items()) for r in records
+        )
+
+    def close(self):
+        if self._writer is None:
+            self.write([])
+        self._f.close()
+
+
+class ParquetWriter(object):
+    """
+    Writes one Parquet row group per batch of pages.
+
+    The schema is set by the first batch (see quartzbio.utils.columnar).
+    The values of later batches are cast to it where this loses nothing
+    (e.g. whole floats in an integer column), otherwise a ValueError is
+    raised, after the previous batches have been written: a larger
+    batch_pages gives the first batch more records to infer types from.
+    """
+
+    def __init__(self, path, fields):
+        from .columnar import _import_pyarrow
+
+        self._pa = _import_pyarrow()
+        import pyarrow.parquet
+
+        self._pq = pyarrow.parquet
+        self._path = path
+        self._fields = fields
+        self._writer = None
+
+    def _table(self, records):
+        from .columnar import ArrowColumn, decode_pages
+
+        if self._writer is None:
+            columns = decode_pages([records], self._fields, ArrowColumn)
+            arrays = []
+            for column in columns:
+                array = column.to_array()
+                if array.type == self._pa.null():
+                    # The type is unknown when all values are null
+                    array = array.cast(self._pa.string())
+                arrays.append(array)
+            return self._pa.table(arrays, names=[c.name for c in columns])
+
+        schema = self._writer.schema
+        extra = set().union(*records).difference(schema.names)
+        if extra:
+            raise ValueError(
+                "Fields not in the Parquet schema: {}".format(", ".join(sorted(extra)))
+            )
+
+        arrays = []
+        for field in schema:
+            column = ArrowColumn(field.name)
+            column.type = field.type
+            column.extend([r.get(field.name) for r in records])
+            array = column.to_array()
+            if array.type != field.type:
+                try:
+                    array = array.cast(field.type)
+                except (self._pa.ArrowInvalid, self._pa.ArrowNotImplementedError):
+                    raise ValueError(
+                        "Values of field '{}' do not match the Parquet column "
+                        "type: {}".format(field.name, field.type)
+                    )
+            arrays.append(array)
+        return self._pa.Table.from_arrays(arrays, schema=schema)
+
+    def write(self, records):
+        table = self._table(records)
+        if self._writer is None:
+            self._writer = self._pq.ParquetWriter(self._path, table.schema)
+        self._writer.write_table(table, row_group_size=max(table.num_rows, 1))
+
+    def close(self):
+        if self._writer is None:
+            self.write([])
+        self._writer.close()
+
+
+WRITERS = {
+    "ndjson": NDJSONWriter,
+    "csv": CSVWriter,
+    "parquet": ParquetWriter,
+}
+
+
+def stream_pages(pages, writer, max_pages=4, batch_pages=1):
+    """
+    Writes pages of records with a writer while the next pages are
+    fetched in a background thread.
+
+    Args:
+        pages: An iterable of lists of records.
+        writer: A writer instance (see WRITERS).
+        max_pages (int): The maximum number of fetched pages waiting
+            to be written.
+        batch_pages (int): The number of pages written in one go
+            (for Parquet, one row group).
+
+    Returns:
+        int: The number of records written.
+    """
+    pending = queue.Queue(maxsize=max_pages)
+    stopped = threading.Event()
+
+    def _put(item):
+        while not stopped.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _fetch():
+        try:
+            for page in pages:
+                if stopped.is_set():
+                    return
+                _put(page)
+        except BaseException as e:
+            _put(e)
+        else:
+            _put(_DONE)
+
+    fetcher = threading.Thread(target=_fetch, name="quartzbio-stream")
+    fetcher.daemon = True
+    fetcher.start()
+
+    count = 0
+    batch = []
+    batched = 0
+    try:
+        while True:
+            page = pending.get()
+            if page is _DONE:
+                break
+            if isinstance(page, BaseException):
+                raise page
+
+            batch.extend(page)
+            batched += 1
+            if batched >= batch_pages:
+                writer.write(batch)
+                count += len(batch)
+                batch, batched = [], 0
+
+        if batch:
+            writer.write(batch)
+            count += len(batch)
+    finally:
+        stopped.set()
+        fetcher.join()
+
+    return count
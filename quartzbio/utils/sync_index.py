@@ -0,0 +1,145 @@
+"""A local index of file MD5s, so that unchanged files are not hashed again"""
+
+import logging
+import os
+import threading
+
+try:
+    import sqlite3
+except ImportError:
+    # Some Python builds do not include sqlite3: files are always hashed
+    sqlite3 = None
+
+from .files import get_home_dir
+from .md5sum import md5sum, multipart_md5sum
+
+logger = logging.getLogger("quartzbio")
+
+# SQLite database of the MD5s of local files
+SYNC_INDEX_PATH = os.environ.get("QUARTZBIO_SYNC_INDEX") or os.path.join(
+    get_home_dir(), ".quartzbio", "sync_index.sqlite3"
+)
+
+# Types of hashes stored in the index
+MD5 = "md5"  # The MD5 of the whole file
+MULTIPART_MD5 = "md5sum"  # md5sum() with the default multipart thresholds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT NOT NULL,
+    hash_type TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (path, hash_type)
+)
+"""
+
+
+def _stat_key(stat):
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_ino)
+
+
+class SyncIndex(object):
+    """
+    Caches the hashes of local files in a SQLite database, keyed by the
+    absolute path of the file and the type of hash.
+
+    A cached hash is only used while the size, modification time,
+    change time and inode of the file are unchanged. The index can be
+    shared by threads and processes; if it cannot be used (e.g. on a
+    read-only home directory) files are simply hashed every time.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or SYNC_INDEX_PATH
+        self._local = threading.local()
+        self._disabled = sqlite3 is None
+
+    def _connection(self):
+        # One connection per thread, and none inherited from a parent process
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            index_dir = os.path.dirname(self.path)
+            if index_dir and not os.path.isdir(index_dir):
+                os.makedirs(index_dir, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _execute(self, sql, params):
+        if self._disabled:
+            return None
+        try:
+            conn = self._connection()
+            with conn:
+                return conn.execute(sql, params).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(
+                "Sync index {} is not available ({}), files will be "
+                "hashed again".format(self.path, e)
+            )
+            self._disabled = True
+            return None
+
+    def get(self, local_path, hash_type, stat=None):
+        """Returns the cached hash of an unchanged file, or None"""
+        local_path = os.path.abspath(local_path)
+        stat = stat or os.stat(local_path)
+        row = self._execute(
+            "SELECT size, mtime_ns, ctime_ns, inode, digest FROM files "
+            "WHERE path = ? AND hash_type = ?",
+            (local_path, hash_type),
+        )
+        if row and tuple(row[:4]) == _stat_key(stat):
+            return row[4]
+        return None
+
+    def set(self, local_path, hash_type, digest, stat):
+        """Stores the hash of a file, computed while it had the given stat"""
+        self._execute(
+            "INSERT OR REPLACE INTO files "
+            "(path, hash_type, size, mtime_ns, ctime_ns, inode, digest) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (os.path.abspath(local_path), hash_type) + _stat_key(stat) + (digest,),
+        )
+
+    def _hash(self, local_path, hash_type, hash_func):
+        stat = os.stat(local_path)
+        digest = self.get(local_path, hash_type, stat=stat)
+        if digest:
+            return digest, None
+
+        digest, extra = hash_func(local_path)
+        # Don't index a hash of a file that changed while it was read
+        if _stat_key(os.stat(local_path)) == _stat_key(stat):
+            self.set(local_path, hash_type, digest, stat)
+        return digest, extra
+
+    def md5sum(self, local_path):
+        """Returns md5sum(local_path)[0], from the index if possible"""
+        return self._hash(local_path, MULTIPART_MD5, md5sum)[0]
+
+    def multipart_md5sum(self, local_path):
+        """
+        Returns the MD5 of the file and its part MD5s like
+        multipart_md5sum(). The part MD5s are None if the MD5
+        was found in the index (and the file was not read).
+        """
+        return self._hash(local_path, MD5, multipart_md5sum)
+
+
+_sync_index = None
+
+
+def get_sync_index():
+    """Returns the shared SyncIndex at SYNC_INDEX_PATH"""
+    global _sync_index
+    if _sync_index is None:
+        _sync_index = SyncIndex()
+    return _sync_index
@@ -0,0 +1,91 @@
+"""Bandwidth limits for file uploads and downloads"""
+
+import re
+import threading
+import time
+
+from requests.utils import super_len
+
+# Maximum number of bytes a transfer waits for at once, so that the
+# threads sharing a limit take turns with small chunks
+MAX_CHUNK_SIZE = 64 * 1024
+
+_RATE_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_rate(value):
+    """
+    Parses a rate in bytes per second, with an optional K, M or G
+    suffix (e.g. "500K", "10M"). Returns None for 0 (no limit).
+    """
+    match = re.match(r"^\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?(?:/s)?\s*$", str(value), re.I)
+    if not match:
+        raise ValueError("Invalid rate: {}".format(value))
+    rate = int(float(match.group(1)) * _RATE_UNITS[match.group(2).upper()])
+    return rate or None
+
+
+class RateLimiter(object):
+    """
+    A token bucket limiting the bytes per second of the transfers of
+    all the threads that share it.
+
+    Each call to consume() books its bytes after the ones booked
+    before it, so threads are served in the order they ask and share
+    the rate fairly. Up to `burst` bytes (one second of transfers by
+    default) can be sent at once after the limiter was idle.
+    """
+
+    def __init__(self, rate, burst=None):
+        if rate <= 0:
+            raise ValueError("'rate' must be > 0")
+        self.rate = float(rate)
+        self.burst = float(burst or rate)
+        self._lock = threading.Lock()
+        # The time at which the bytes booked so far have all been sent
+        self._booked_until = time.monotonic()
+
+    def consume(self, nbytes):
+        """Waits until nbytes can be transferred within the rate"""
+        while nbytes > 0:
+            chunk = min(nbytes, MAX_CHUNK_SIZE)
+            nbytes -= chunk
+            with self._lock:
+                now = time.monotonic()
+                self._booked_until = max(self._booked_until, now) + chunk / self.rate
+                # Bytes booked up to `burst` ahead of time are sent now
+                wait = self._booked_until - now - self.burst / self.rate
+            if wait > 0:
+                time.sleep(wait)
+
+
+class ThrottledReader(object):
+    """
+    Wraps a file object (e.g. a file uploaded by requests, or the raw
+    response of a download) so that reading it consumes a RateLimiter.
+    """
+
+    def __init__(self, fileobj, rate_limiter):
+        self._f = fileobj
+        self._rate_limiter = rate_limiter
+
+    def __len__(self):
+        # The remaining length, as requests would compute it for the file
+        return super_len(self._f)
+
+    def read(self, n=-1):
+        if n is not None and n > MAX_CHUNK_SIZE:
+            n = MAX_CHUNK_SIZE
+        data = self._f.read(n)
+        self._rate_limiter.consume(len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def throttle(fileobj, rate_limiter):
+    """Returns fileobj, throttled if there is a RateLimiter"""
+    if rate_limiter is None:
+        return fileobj
+    return ThrottledReader(fileobj, rate_limiter)
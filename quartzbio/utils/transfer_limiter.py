@@ -0,0 +1,48 @@
+"""Limits on the transfers shared by the threads of an upload"""
+
+import threading
+from contextlib import contextmanager
+
+# Default maximum number of bytes in flight in concurrent transfers
+DEFAULT_MAX_BYTES_IN_FLIGHT = 1024 * 1024 * 1024
+
+
+class TransferLimiter(object):
+    """
+    Limits the number of concurrent transfers and the number of bytes
+    they have in flight, across all the threads of an upload, so that
+    whole files and the parts of multipart files share the same limits.
+
+    Usage:
+
+        limiter = TransferLimiter(max_concurrency=8)
+        with limiter.transfer(part_size):
+            session.put(url, data=FileSlice(path, start, part_size))
+    """
+
+    def __init__(self, max_concurrency, max_bytes_in_flight=None):
+        self.max_concurrency = max_concurrency
+        self.max_bytes_in_flight = max_bytes_in_flight or DEFAULT_MAX_BYTES_IN_FLIGHT
+        self.bytes_in_flight = 0
+        self._slots = threading.Semaphore(max_concurrency)
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def transfer(self, nbytes=0):
+        """
+        Waits for a transfer slot and for nbytes to fit in the budget
+        of bytes in flight, and holds them until the block exits. A transfer larger
+        than the whole budget runs once no other bytes are in flight.
+        """
+        nbytes = min(nbytes, self.max_bytes_in_flight)
+        with self._slots:
+            with self._condition:
+                while self.bytes_in_flight + nbytes > self.max_bytes_in_flight:
+                    self._condition.wait()
+                self.bytes_in_flight += nbytes
+            try:
+                yield
+            finally:
+                with self._condition:
+                    self.bytes_in_flight -= nbytes
+                    self._condition.notify_all()
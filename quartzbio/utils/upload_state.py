@@ -0,0 +1,139 @@
+"""Checkpoint state for resumable multipart uploads"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .files import get_home_dir
+
+# Directory containing the state files of interrupted uploads
+UPLOAD_STATE_DIR = os.environ.get("QUARTZBIO_UPLOAD_STATE_DIR") or os.path.join(
+    get_home_dir(), ".quartzbio", "uploads"
+)
+
+
+class UploadState(object):
+    """
+    The state of a multipart upload, saved to a local JSON file so that
+    an interrupted upload can be resumed.
+
+    A state file is identified by the local file and the remote full path,
+    and is only valid while the size and modification time of the local
+    file are unchanged.
+    """
+
+    # Minimum number of seconds between saves when parts complete
+    SAVE_INTERVAL = 2.0
+
+    def __init__(self, local_path, full_path, state_dir=None):
+        self.local_path = os.path.abspath(local_path)
+        self.full_path = full_path
+        stat = os.stat(self.local_path)
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+
+        key = hashlib.sha1(
+            "{}\n{}".format(self.local_path, full_path).encode("utf-8")
+        ).hexdigest()
+        self.path = os.path.join(state_dir or UPLOAD_STATE_DIR, key + ".json")
+
+        self.md5 = None
+        self.object_id = None
+        self.upload_id = None
+        self.upload_key = None
+        # Part layout, as a list of (part_number, start_byte, size)
+        self.layout = []
+        # ETags of the uploaded parts, by part number
+        self.parts = {}
+
+        self._lock = threading.Lock()
+        self._saved_at = 0
+
+    @classmethod
+    def load(cls, local_path, full_path, state_dir=None):
+        """
+        Returns the saved state for the upload of local_path to full_path,
+        or None if there is no valid saved state.
+        """
+        state = cls(local_path, full_path, state_dir=state_dir)
+        try:
+            with open(state.path) as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+        if (
+            data.get("local_path") != state.local_path
+            or data.get("size") != state.size
+            or data.get("mtime") != state.mtime
+        ):
+            # The file changed since the upload started
+            state.delete()
+            return None
+
+        state.md5 = data["md5"]
+        state.object_id = data["object_id"]
+        state.upload_id = data["upload_id"]
+        state.upload_key = data["upload_key"]
+        state.layout = [tuple(p) for p in data["layout"]]
+        state.parts = dict((int(k), v) for k, v in data["parts"].items())
+        return state
+
+    def start(self, obj, md5):
+        """Starts the state of a new multipart upload of obj"""
+        self.md5 = md5
+        self.object_id = obj.id
+        self.upload_id = obj.upload_id
+        self.upload_key = obj.upload_key
+        self.layout = [
+            (p["part_number"], p["start_byte"], p["size"]) for p in obj.presigned_urls
+        ]
+        self.parts = {}
+        self.save()
+
+    def add_part(self, part_number, etag):
+        """Records an uploaded part (thread-safe)"""
+        with self._lock:
+            self.parts[part_number] = etag
+            if time.time() - self._saved_at >= self.SAVE_INTERVAL:
+                self._save()
+
+    def missing_parts(self):
+        return [p for p in self.layout if p[0] not in self.parts]
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        data = {
+            "local_path": self.local_path,
+            "full_path": self.full_path,
+            "size": self.size,
+            "mtime": self.mtime,
+            "md5": self.md5,
+            "object_id": self.object_id,
+            "upload_id": self.upload_id,
+            "upload_key": self.upload_key,
+            "layout": self.layout,
+            "parts": self.parts,
+        }
+
+        state_dir = os.path.dirname(self.path)
+        if not os.path.isdir(state_dir):
+            os.makedirs(state_dir, exist_ok=True)
+
+        # Write atomically so that a killed process leaves a valid file
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        self._saved_at = time.time()
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
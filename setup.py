@@ -19,8 +19,17 @@ recipes_requires = [
     'click==7.1.2',
     'ruamel.yaml==0.16.12'
 ]
+# Query.to_numpy() / to_arrow() / to_pandas()
+columnar_requires = [
+    'numpy',
+    'pandas',
+    'pyarrow'
+]
 extras_requires = {
-    "recipes": recipes_requires
+    "recipes": recipes_requires,
+    "columnar": columnar_requires,
+    # AsyncQuartzBioClient
+    "async": ['aiohttp>=3.8']
 }
 
 with open('README.md') as f: